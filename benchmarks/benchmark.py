@@ -0,0 +1,211 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import main
+from readers_bay import operaciones
+from readers_bay.busqueda import IndiceBusqueda, tokenizar
+from readers_bay.instrumentacion import percentil
+from readers_bay.repositorio import abrir_repositorio
+
+# --- Benchmarks de los caminos críticos ---
+# Mide, sin UI, las operaciones que usan main.py e interfaz.py sobre un
+# conjunto de datos (ver generar_datos.py): importación de las entradas,
+# arranque, búsqueda, reseñas de un libro, promedio, vista de detalle y
+# guardado de una reseña. Llama a las mismas funciones que las entradas
+# (main.py, readers_bay.operaciones), que se importan sin cargar datos.
+#
+# Uso:
+#   python -m benchmarks.benchmark --datos /tmp/club_1m --guardar-base base.json
+#   python -m benchmarks.benchmark --datos /tmp/club_1m --comparar base.json
+#
+# Por defecto trabaja sobre una copia de los datos, porque el caso
+# guardar_reseña escribe en el almacén.
+
+REPETICIONES = 1000
+REPETICIONES_ARRANQUE = 3
+REPETICIONES_IMPORTACION = 10
+CANTIDAD_POPULARES = 50
+REPETICIONES_MEMORIA = 50
+TOLERANCIA = 0.25   # 25% peor que la base cuenta como regresión
+
+
+def medir(operacion, argumentos):
+    """Corre operacion(arg) para cada argumento y devuelve latencias, rendimiento y pico de memoria."""
+    latencias = []
+    inicio_total = time.perf_counter()
+    for argumento in argumentos:
+        inicio = time.perf_counter()
+        operacion(argumento)
+        latencias.append(time.perf_counter() - inicio)
+    total = time.perf_counter() - inicio_total
+
+    # La memoria se mide aparte: tracemalloc distorsiona los tiempos
+    tracemalloc.start()
+    for argumento in argumentos[:REPETICIONES_MEMORIA]:
+        operacion(argumento)
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencias.sort()
+    return {
+        'operaciones': len(latencias),
+        'ops_s': len(latencias) / total if total else 0.0,
+        'p50_ms': percentil(latencias, 50) * 1000,
+        'p95_ms': percentil(latencias, 95) * 1000,
+        'p99_ms': percentil(latencias, 99) * 1000,
+        'pico_mb': pico / 1e6,
+    }
+
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _importar(modulo):
+    # Proceso nuevo: mide el costo en frío (intérprete + imports), como al abrir la app
+    subprocess.run([sys.executable, '-c', f'import {modulo}' if modulo else 'pass'], cwd=RAIZ, check=True)
+
+
+def _consultas(rng, libros, cantidad):
+    """Prefijos de palabras reales del catálogo, como los que se teclean."""
+    consultas = []
+    for _ in range(cantidad):
+        libro = rng.choice(libros)
+        palabras = tokenizar(libro.get('autor', '')) or ['a']
+        palabra = rng.choice(palabras)
+        consultas.append(palabra[:rng.randint(3, max(3, len(palabra)))])
+    return consultas
+
+
+def ejecutar(ruta_datos, backend='json', repeticiones=REPETICIONES, semilla=1):
+    """Corre todos los casos y devuelve {caso: métricas}."""
+    rng = random.Random(semilla)
+    resultados = {}
+
+    # "interprete" es la referencia: lo que cuesta Python sin importar nada
+    for caso, modulo in (('interprete', None), ('importar_main', 'main'),
+                         ('importar_interfaz', 'interfaz'), ('importar_servidor', 'servidor')):
+        resultados[caso] = medir(lambda _, m=modulo: _importar(m), range(REPETICIONES_IMPORTACION))
+
+    def arrancar(_):
+        repo = abrir_repositorio(ruta_datos, backend)
+        IndiceBusqueda(repo.libros())
+        repo.cerrar()
+
+    resultados['arranque'] = medir(arrancar, range(REPETICIONES_ARRANQUE))
+
+    repo = abrir_repositorio(ruta_datos, backend)
+    try:
+        libros = repo.libros()
+        indice_busqueda = IndiceBusqueda(libros)
+        ids = [rng.choice(libros)['id'] for _ in range(repeticiones)]
+        consultas = _consultas(rng, libros, repeticiones)
+
+        # filtrar_libros de main.py (por autor) y filtrar() de interfaz.py (todos los campos)
+        resultados['filtrar_libros'] = medir(
+            lambda q: main.filtrar_libros(indice_busqueda, 'autor', q), consultas)
+        resultados['filtrar_ui'] = medir(
+            lambda q: operaciones.buscar_libros(indice_busqueda, q, limite=30), consultas)
+        resultados['buscar_reseñas_por_libro'] = medir(
+            lambda i: main.buscar_reseñas_por_libro(repo, i), ids)
+        resultados['calcular_promedio'] = medir(lambda i: main.calcular_promedio(repo, i), ids)
+        # Vecinos ya calculados (archivo del lote o cálculo de fondo): solo O(K)
+        motor = repo.preparar_recomendaciones()
+        while not motor.listo:
+            time.sleep(0.05)
+        resultados['tambien_gustaron'] = medir(lambda i: operaciones.tambien_gustaron(repo, i), ids)
+        # Libro + rating + reseñas, recomendaciones con nombres y "también les
+        # gustó" (vista de detalle y API). Primero sin caché; después los
+        # libros populares, que se abren una y otra vez y salen de la caché.
+        cache, repo.cache_detalles = repo.cache_detalles, None
+        resultados['detalle_libro'] = medir(lambda i: operaciones.detalle_libro(repo, i), ids)
+        repo.cache_detalles = cache
+        populares = [rng.choice(ids[:CANTIDAD_POPULARES]) for _ in ids]
+        resultados['detalle_libro_cache'] = medir(lambda i: operaciones.detalle_libro(repo, i), populares)
+
+        usuarios = [u['id'] for u in repo.usuarios()] or [1]
+
+        def guardar(libro_id):
+            # Camino de guardado de gestionar_reseña: edita si existe, si no crea
+            operaciones.guardar_reseña(repo, libro_id, rng.choice(usuarios), rng.randint(1, 5),
+                                       "benchmark", "2026-01-01")
+
+        resultados['guardar_reseña'] = medir(guardar, ids)
+    finally:
+        repo.cerrar()
+    return resultados
+
+
+def comparar(resultados, base, tolerancia=TOLERANCIA):
+    """Lista de regresiones respecto de una base guardada."""
+    regresiones = []
+    for caso, actual in resultados.items():
+        anterior = base.get(caso)
+        if not anterior:
+            continue
+        if actual['p95_ms'] > anterior['p95_ms'] * (1 + tolerancia):
+            regresiones.append(f"{caso}: p95 {anterior['p95_ms']:.3f} -> {actual['p95_ms']:.3f} ms")
+        if actual['ops_s'] < anterior['ops_s'] / (1 + tolerancia):
+            regresiones.append(f"{caso}: {anterior['ops_s']:.0f} -> {actual['ops_s']:.0f} ops/s")
+        if actual['pico_mb'] > anterior['pico_mb'] * (1 + tolerancia) + 1:
+            regresiones.append(f"{caso}: pico {anterior['pico_mb']:.1f} -> {actual['pico_mb']:.1f} MB")
+    return regresiones
+
+
+def imprimir(resultados):
+    print(f"{'caso':<26}{'ops/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'pico MB':>10}")
+    for caso, m in resultados.items():
+        print(f"{caso:<26}{m['ops_s']:>12.1f}{m['p50_ms']:>10.3f}{m['p95_ms']:>10.3f}"
+              f"{m['p99_ms']:>10.3f}{m['pico_mb']:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks del club de libros.")
+    parser.add_argument('--datos', default='data', help="Carpeta con los JSON (ver generar_datos.py)")
+    parser.add_argument('--backend', default='json', choices=('json', 'sqlite'))
+    parser.add_argument('--repeticiones', type=int, default=REPETICIONES)
+    parser.add_argument('--en-sitio', action='store_true',
+                        help="Usar la carpeta de datos directamente, sin copiarla")
+    parser.add_argument('--salida', help="Guardar los resultados en este JSON")
+    parser.add_argument('--guardar-base', help="Guardar los resultados como base de comparación")
+    parser.add_argument('--comparar', help="Base contra la que detectar regresiones")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA)
+    args = parser.parse_args()
+
+    ruta = args.datos
+    temporal = None
+    if not args.en_sitio:
+        temporal = tempfile.mkdtemp(prefix='readers_bay_bench_')
+        ruta = os.path.join(temporal, 'data')
+        shutil.copytree(args.datos, ruta)
+    try:
+        if args.backend == 'sqlite' and not os.path.exists(os.path.join(ruta, 'club.db')):
+            from readers_bay.repositorio import migrar_json_a_sqlite
+            migrar_json_a_sqlite(ruta)
+        resultados = ejecutar(ruta, args.backend, args.repeticiones)
+    finally:
+        if temporal:
+            shutil.rmtree(temporal, ignore_errors=True)
+
+    imprimir(resultados)
+    for destino in (args.salida, args.guardar_base):
+        if destino:
+            with open(destino, 'w', encoding='utf-8') as f:
+                json.dump(resultados, f, indent=4, ensure_ascii=False)
+
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            regresiones = comparar(resultados, json.load(f), args.tolerancia)
+        if regresiones:
+            print("\nRegresiones:")
+            for regresion in regresiones:
+                print(f"  * {regresion}")
+            sys.exit(1)
+        print("\nSin regresiones respecto de la base.")
@@ -0,0 +1,167 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from readers_bay.instrumentacion import percentil
+
+# --- Prueba de carga del servidor HTTP ---
+# Muchos clientes concurrentes contra servidor.py en localhost, cada uno con
+# su conexión persistente (keep-alive). Mezcla búsquedas, detalles y
+# reseñas; con --lote N agrupa N operaciones por pedido en POST /lote.
+#
+# Uso:
+#   python -m benchmarks.carga_http --datos /tmp/club_1m --clientes 200 --pedidos 100
+#   python -m benchmarks.carga_http --puerto 8080 --sin-servidor   (servidor ya corriendo)
+
+CLIENTES = 100
+PEDIDOS = 100
+MEZCLA = (('buscar', 70), ('detalle', 20), ('reseña', 10))
+PREFIJOS = ("gar", "mar", "amor", "no", "la", "sol", "ciu", "tie", "ro", "sue")
+
+
+class Cliente:
+    """Una conexión HTTP/1.1 keep-alive con pedidos JSON."""
+
+    def __init__(self, host, puerto):
+        self.host = host
+        self.puerto = puerto
+        self._lector = self._escritor = None
+
+    async def conectar(self):
+        self._lector, self._escritor = await asyncio.open_connection(self.host, self.puerto)
+
+    async def pedir(self, metodo, ruta, cuerpo=None):
+        datos = json.dumps(cuerpo).encode('utf-8') if cuerpo is not None else b''
+        self._escritor.write(
+            f"{metodo} {ruta} HTTP/1.1\r\nHost: {self.host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(datos)}\r\n\r\n".encode('latin-1')
+            + datos)
+        await self._escritor.drain()
+        cabecera = await self._lector.readuntil(b'\r\n\r\n')
+        lineas = cabecera.decode('latin-1').split('\r\n')
+        estado = int(lineas[0].split(' ')[1])
+        largo = next(int(l.split(':', 1)[1]) for l in lineas if l.lower().startswith('content-length'))
+        return estado, json.loads(await self._lector.readexactly(largo))
+
+    def cerrar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+
+
+def _operacion(rng, libros, usuarios):
+    tipo = rng.choices([t for t, _ in MEZCLA], [p for _, p in MEZCLA])[0]
+    if tipo == 'buscar':
+        return tipo, 'GET', f"/libros?q={rng.choice(PREFIJOS)}&limite=30", None
+    libro_id = rng.randint(1, libros)
+    if tipo == 'detalle':
+        return tipo, 'GET', f"/libros/{libro_id}", None
+    return tipo, 'PUT', "/resenas", {"libro_id": libro_id, "usuario_id": rng.randint(1, usuarios),
+                                     "rating": rng.randint(1, 5), "texto": "carga"}
+
+
+async def _cliente(numero, host, puerto, pedidos, lote, libros, usuarios, latencias, errores):
+    rng = random.Random(numero)
+    cliente = Cliente(host, puerto)
+    await cliente.conectar()
+    try:
+        hechos = 0
+        while hechos < pedidos:
+            inicio = time.perf_counter()
+            if lote > 1:
+                ops = [_operacion(rng, libros, usuarios) for _ in range(min(lote, pedidos - hechos))]
+                estado, datos = await cliente.pedir('POST', '/lote', {'operaciones': [
+                    {'metodo': m, 'ruta': r, 'cuerpo': c} for _, m, r, c in ops]})
+                fallidos = sum(1 for res in datos.get('resultados', ()) if res['estado'] >= 500)
+                errores[0] += fallidos + (estado >= 400)
+                latencias.setdefault('lote', []).append(time.perf_counter() - inicio)
+                hechos += len(ops)
+            else:
+                tipo, metodo, ruta, cuerpo = _operacion(rng, libros, usuarios)
+                estado, _ = await cliente.pedir(metodo, ruta, cuerpo)
+                errores[0] += estado >= 500
+                latencias.setdefault(tipo, []).append(time.perf_counter() - inicio)
+                hechos += 1
+    finally:
+        cliente.cerrar()
+
+
+async def cargar(host, puerto, clientes=CLIENTES, pedidos=PEDIDOS, lote=1, libros=1000, usuarios=200):
+    """Corre la prueba y devuelve {operación: métricas} más el total."""
+    latencias, errores = {}, [0]
+    inicio = time.perf_counter()
+    await asyncio.gather(*(_cliente(n, host, puerto, pedidos, lote, libros, usuarios, latencias, errores)
+                           for n in range(clientes)))
+    total = time.perf_counter() - inicio
+    resultados = {}
+    for tipo, valores in latencias.items():
+        valores.sort()
+        resultados[tipo] = {'pedidos': len(valores), 'p50_ms': percentil(valores, 50) * 1000,
+                            'p95_ms': percentil(valores, 95) * 1000,
+                            'p99_ms': percentil(valores, 99) * 1000}
+    resultados['total'] = {'operaciones': clientes * pedidos, 'segundos': total,
+                           'ops_s': clientes * pedidos / total if total else 0.0, 'errores': errores[0]}
+    return resultados
+
+
+def _contar(ruta, archivo):
+    from readers_bay.carga_streaming import iterar_json
+    return sum(1 for _ in iterar_json(os.path.join(ruta, archivo))) or 1
+
+
+async def _esperar_puerto(host, puerto, espera=120):
+    limite = time.monotonic() + espera
+    while True:
+        try:
+            _, escritor = await asyncio.open_connection(host, puerto)
+            escritor.close()
+            return
+        except OSError:
+            if time.monotonic() > limite:
+                raise
+            await asyncio.sleep(0.2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga del servidor HTTP del club.")
+    parser.add_argument('--datos', default='data', help="Datos para el servidor (se usa una copia)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8765)
+    parser.add_argument('--clientes', type=int, default=CLIENTES)
+    parser.add_argument('--pedidos', type=int, default=PEDIDOS, help="Operaciones por cliente")
+    parser.add_argument('--lote', type=int, default=1, help="Operaciones por pedido (POST /lote)")
+    parser.add_argument('--sin-servidor', action='store_true', help="No lanzar servidor.py (ya está corriendo)")
+    args = parser.parse_args()
+
+    libros, usuarios = _contar(args.datos, 'libros.json'), _contar(args.datos, 'usuarios.json')
+    proceso = temporal = None
+    if not args.sin_servidor:
+        temporal = tempfile.mkdtemp(prefix='readers_bay_http_')
+        ruta = os.path.join(temporal, 'data')
+        shutil.copytree(args.datos, ruta)
+        raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        proceso = subprocess.Popen([sys.executable, os.path.join(raiz, 'servidor.py'), '--datos', ruta,
+                                    '--host', args.host, '--puerto', str(args.puerto)])
+    try:
+        asyncio.run(_esperar_puerto(args.host, args.puerto))
+        resultados = asyncio.run(cargar(args.host, args.puerto, args.clientes, args.pedidos,
+                                        args.lote, libros, usuarios))
+    finally:
+        if proceso is not None:
+            proceso.terminate()
+            proceso.wait()
+        if temporal:
+            shutil.rmtree(temporal, ignore_errors=True)
+
+    total = resultados.pop('total')
+    print(f"{'operación':<12}{'pedidos':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for tipo, m in resultados.items():
+        print(f"{tipo:<12}{m['pedidos']:>10}{m['p50_ms']:>10.2f}{m['p95_ms']:>10.2f}{m['p99_ms']:>10.2f}")
+    print(f"\n{total['operaciones']} operaciones en {total['segundos']:.2f} s "
+          f"({total['ops_s']:.0f} ops/s), {total['errores']} errores")
@@ -0,0 +1,186 @@
+import argparse
+import datetime
+import json
+import math
+import os
+import random
+
+# --- Generador de datos sintéticos ---
+# Escribe libros.json, usuarios.json, reseñas.json y compartidos.json con el
+# mismo formato que data/, del tamaño que se pida (de mil a millones de
+# registros). Escribe registro por registro, así la memoria no crece con el
+# tamaño del archivo (las reseñas guardan solo una cuenta por libro).
+#
+# Uso: python -m benchmarks.generar_datos --destino /tmp/club_1m --libros 100000 --reseñas 1000000
+
+SILABAS = ("la", "el", "mar", "sol", "ca", "sa", "de", "los", "ri", "to", "ne", "gra", "per",
+           "dis", "vi", "da", "ro", "mo", "te", "cie", "lo", "ven", "tu", "ra", "al", "ba")
+PALABRAS_TITULO = ("Amor", "Guerra", "Noche", "Sombra", "Ciudad", "Tiempo", "Viento", "Río",
+                   "Casa", "Silencio", "Memoria", "Luna", "Mar", "Perros", "Soledad", "Camino",
+                   "Jardín", "Espejo", "Fuego", "Isla", "Tierra", "Sueño", "Cielo", "Laberinto")
+CONECTORES = ("de", "del", "en", "y", "sin", "bajo", "entre", "para")
+NOMBRES = ("Gabriel", "Isabel", "Mario", "Julio", "Laura", "Carlos", "Ana", "Rómulo", "Jorge",
+           "Elena", "Miguel", "Lucía", "Andrés", "Sofía", "Pablo", "Teresa", "Ángel", "Marta")
+APELLIDOS = ("García", "Márquez", "Allende", "Vargas", "Cortázar", "Borges", "Esquivel", "Gallegos",
+             "Rulfo", "Fuentes", "Neruda", "Sábato", "Benedetti", "Zafón", "Pérez", "López")
+GENEROS = ("Novela", "Realismo Mágico", "Misterio", "Romance", "Ciencia Ficción", "Fantasía",
+           "Poesía", "Ensayo", "Histórica", "Teatro", "Cuento", "Aventura")
+# Distribución típica de estrellas: muchas 4 y 5, pocas 1 y 2
+PESOS_RATING = (5, 7, 18, 35, 35)
+TEXTOS = ("Me encantó", "Muy bueno", "Regular", "No lo terminé", "Lo recomiendo",
+          "Buen final", "Algo lento al principio", "")
+FECHA_INICIO = datetime.date(2020, 1, 1)
+
+
+def _fecha(rng):
+    return (FECHA_INICIO + datetime.timedelta(days=rng.randrange(2200))).isoformat()
+
+
+def _palabra_inventada(rng):
+    return ''.join(rng.choice(SILABAS) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def _titulo(rng):
+    partes = [rng.choice(PALABRAS_TITULO), rng.choice(CONECTORES), rng.choice(PALABRAS_TITULO)]
+    if rng.random() < 0.6:
+        partes.append(_palabra_inventada(rng))  # variedad de vocabulario, como un catálogo real
+    return ' '.join(partes)
+
+
+def _libro_popular(rng, total_libros):
+    # Popularidad sesgada (tipo Zipf): pocos libros acumulan muchas reseñas
+    return min(total_libros, int(rng.paretovariate(1.2))) if rng.random() < 0.5 \
+        else rng.randint(1, total_libros)
+
+
+def escribir_arreglo(ruta, registros):
+    """Escribe un arreglo JSON (un registro por línea) sin tenerlo entero en memoria."""
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write('[\n')
+        primero = True
+        for registro in registros:
+            if not primero:
+                f.write(',\n')
+            f.write('    ' + json.dumps(registro, ensure_ascii=False))
+            primero = False
+        f.write('\n]')
+
+
+def generar_libros(rng, cantidad):
+    autores = [f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)} {_palabra_inventada(rng)}"
+               for _ in range(max(1, cantidad // 8))]
+    for i in range(1, cantidad + 1):
+        yield {"id": i, "titulo": _titulo(rng), "autor": rng.choice(autores),
+               "anio": rng.randint(1600, 2025), "genero": rng.choice(GENEROS)}
+
+
+def generar_usuarios(rng, cantidad):
+    for i in range(1, cantidad + 1):
+        nombre = f"{rng.choice(NOMBRES)}{i}"
+        yield {"id": i, "nombre": nombre, "email": f"{nombre.lower()}@email.com",
+               "password": f"{rng.randrange(10**6):06d}"}
+
+
+def _reseñas_por_libro(cantidad, total_libros, total_usuarios):
+    """
+    Cuántas reseñas recibe cada libro: proporcional a la popularidad de
+    _libro_popular, sin pasar de una por usuario (lo que sobra de los
+    libros llenos se reparte entre los demás).
+    """
+    # Probabilidad de cada libro según _libro_popular: mitad Pareto, mitad uniforme
+    pesos = [0.5 / total_libros + 0.5 * (libro ** -1.2 - (libro + 1) ** -1.2)
+             for libro in range(1, total_libros + 1)]
+    pesos[-1] += 0.5 * (total_libros + 1) ** -1.2  # la cola de Pareto cae en el último
+    cuentas = [0] * total_libros
+    orden = sorted(range(total_libros), key=pesos.__getitem__, reverse=True)
+    restante, suma = cantidad, sum(pesos)
+    llenos = 0
+    # Los más populares que no entran se llenan; si uno no se llena, los
+    # que siguen (menos populares) tampoco
+    for libro in orden:
+        if not restante or restante * pesos[libro] / suma < total_usuarios:
+            break
+        cuentas[libro] = total_usuarios
+        restante -= total_usuarios
+        suma -= pesos[libro]
+        llenos += 1
+    if restante:
+        resto = orden[llenos:]
+        cuotas = [restante * pesos[libro] / suma for libro in resto]
+        for libro, cuota in zip(resto, cuotas):
+            cuentas[libro] = int(cuota)
+        # Lo que falta por redondeo, a los de mayor parte decimal (cada uno
+        # tenía lugar: su cuota no llegaba a total_usuarios)
+        faltan = restante - sum(cuentas[libro] for libro in resto)
+        por_decimales = sorted(range(len(resto)), key=lambda i: cuotas[i] - int(cuotas[i]), reverse=True)
+        for i in por_decimales[:faltan]:
+            cuentas[resto[i]] += 1
+    return cuentas
+
+
+def generar_reseñas(rng, cantidad, total_libros, total_usuarios):
+    """
+    Genera `cantidad` reseñas, una por usuario y libro como al guardarlas
+    desde la aplicación. Los pares salen distintos sin recordar los usados:
+    cada libro recorre sus usuarios con un paso coprimo con total_usuarios.
+    """
+    total_pares = total_libros * total_usuarios
+    if cantidad > total_pares:
+        raise ValueError(f"No entran {cantidad} reseñas: hay {total_pares} pares de libro y usuario")
+    return _generar_reseñas(rng, cantidad, total_libros, total_usuarios)
+
+
+def _generar_reseñas(rng, cantidad, total_libros, total_usuarios):
+    id_ = 0
+    for libro_id, cuenta in enumerate(_reseñas_por_libro(cantidad, total_libros, total_usuarios), 1):
+        if not cuenta:
+            continue
+        paso = rng.randrange(1, total_usuarios) if total_usuarios > 1 else 1
+        while math.gcd(paso, total_usuarios) != 1:
+            paso = rng.randrange(1, total_usuarios)
+        inicio = rng.randrange(total_usuarios)
+        for j in range(cuenta):
+            id_ += 1
+            yield {"id": id_, "libro_id": libro_id, "usuario_id": (inicio + j * paso) % total_usuarios + 1,
+                   "rating": rng.choices(range(1, 6), PESOS_RATING)[0],
+                   "texto": rng.choice(TEXTOS), "fecha": _fecha(rng)}
+
+
+def generar_compartidos(rng, cantidad, total_libros, total_usuarios):
+    if total_usuarios < 2:
+        return  # nadie a quien recomendar: no se comparte con uno mismo
+    for i in range(1, cantidad + 1):
+        de = rng.randint(1, total_usuarios)
+        a = rng.randint(1, total_usuarios)
+        if a == de:
+            a = a % total_usuarios + 1
+        yield {"id": i, "de_usuario_id": de, "a_usuario_id": a,
+               "libro_id": _libro_popular(rng, total_libros),
+               "fecha": _fecha(rng), "nota": rng.choice(TEXTOS)}
+
+
+def generar(destino, libros=1000, usuarios=200, reseñas=5000, compartidos=1000, semilla=42):
+    """Crea los cuatro archivos en `destino` (se crea la carpeta si no existe)."""
+    rng = random.Random(semilla)
+    # Antes de escribir nada: falla si no entran tantas reseñas
+    filas_reseñas = generar_reseñas(rng, reseñas, libros, usuarios)
+    os.makedirs(destino, exist_ok=True)
+    escribir_arreglo(os.path.join(destino, 'libros.json'), generar_libros(rng, libros))
+    escribir_arreglo(os.path.join(destino, 'usuarios.json'), generar_usuarios(rng, usuarios))
+    escribir_arreglo(os.path.join(destino, 'reseñas.json'), filas_reseñas)
+    escribir_arreglo(os.path.join(destino, 'compartidos.json'),
+                     generar_compartidos(rng, compartidos, libros, usuarios))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos del club de libros.")
+    parser.add_argument('--destino', required=True, help="Carpeta donde escribir los JSON")
+    parser.add_argument('--libros', type=int, default=1000)
+    parser.add_argument('--usuarios', type=int, default=200)
+    parser.add_argument('--reseñas', '--resenas', dest='reseñas', type=int, default=5000)
+    parser.add_argument('--compartidos', type=int, default=1000)
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    generar(args.destino, args.libros, args.usuarios, args.reseñas, args.compartidos, args.semilla)
+    print(f"Datos generados en {args.destino}")
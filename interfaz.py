@@ -1,44 +1,58 @@
-import flet as ft
-import json
 import os
-from datetime import datetime
-import time
+from typing import TYPE_CHECKING
+
+from readers_bay.instrumentacion import instrumentar_metodo, medido, medir
+
+if TYPE_CHECKING:
+    import flet as ft
 
 # --- 1. PERSISTENCIA DE DATOS ---
+# Reseñas y compartidos se guardan con readers_bay.operaciones: el
+# repositorio actualiza la memoria y deja la escritura a disco en la cola
+# del escritor de fondo
 
-def cargar_datos(nombre_archivo):
-    ruta_base = os.path.dirname(__file__)
-    ruta_archivo = os.path.join(ruta_base, 'data', nombre_archivo)
-    try:
-        if os.path.exists(ruta_archivo):
-            with open(ruta_archivo, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return []
-    except:
-        return []
-
-def guardar_datos_json(nombre_archivo, lista_datos):
-    try:
-        if not os.path.exists("data"): os.makedirs("data")
-        ruta = os.path.join("data", nombre_archivo)
-        with open(ruta, "w", encoding="utf-8") as f:
-            json.dump(lista_datos, f, ensure_ascii=False, indent=4)
-    except Exception as e:
-        print(f"Error al guardar {nombre_archivo}: {e}")
-
-# Carga global de datos
-usuarios = cargar_datos('usuarios.json')
-libros = cargar_datos('libros.json')
-reseñas = cargar_datos('reseñas.json')
-compartidos = cargar_datos('compartidos.json')
+RUTA_DATOS = os.path.join(os.path.dirname(__file__), 'data')
+
+# Estado global de la app: se llena en cargar_datos(), no al importar
+repo = credenciales = vigilante = indice_busqueda = carga_catalogo = None
+
+@medido('ui.cargar_datos')
+def cargar_datos(ruta_datos=RUTA_DATOS):
+    """Abre los datos (JSON o SQLite según READERS_BAY_BACKEND) y empieza a leer el catálogo."""
+    from readers_bay.busqueda import IndiceBusqueda
+    from readers_bay.carga_streaming import CargaCatalogo
+    from readers_bay.credenciales import Credenciales
+    from readers_bay.repositorio import VigilanteCambios, abrir_repositorio
+
+    global repo, credenciales, vigilante, indice_busqueda, carga_catalogo
+    os.makedirs(ruta_datos, exist_ok=True)
+    repo = abrir_repositorio(ruta_datos)
+    credenciales = Credenciales()
+    # Otras ventanas (o main.py) pueden estar usando la misma carpeta de datos
+    vigilante = VigilanteCambios(repo).iniciar()
+    # El catálogo se lee e indexa en segundo plano mientras se muestra el login
+    indice_busqueda = IndiceBusqueda()
+    carga_catalogo = CargaCatalogo(repo.iterar_libros(), indice_busqueda.agregar_libro).iniciar()
+    # "También les gustó" también se prepara de fondo
+    repo.preparar_recomendaciones()
 
 # --- 2. APLICACIÓN PRINCIPAL ---
 
-def main(page: ft.Page):
+def app(page: "ft.Page"):
+    # Solo la ventana usa Flet y asyncio: se importan al abrirla
+    import flet as ft
+    from readers_bay import operaciones
+    from readers_bay.busqueda_async import BusquedaDiferida
+    from readers_bay.buzon import TAMAÑO_PAGINA_BUZON
+    from readers_bay.credenciales import UsuarioDuplicado
+    from readers_bay.paginacion import MARGEN_SCROLL, ListaPaginada
+
     page.title = "Readers Bay"
     page.window_width = 450
     page.window_height = 800
     page.theme_mode = ft.ThemeMode.LIGHT
+    # Con READERS_BAY_INSTRUMENTAR, cada page.update() queda medido
+    instrumentar_metodo(page, 'update', 'ui.page_update')
 
     # --- FUNCIONES DE UTILIDAD ---
     
@@ -63,8 +77,8 @@ def main(page: ft.Page):
         lbl_error = ft.Text("", color="red")
 
         def btn_login_click(e):
-            encontrado = next((u for u in usuarios if u['nombre'].lower() == txt_user.value.lower() 
-                             and str(u['password']) == str(txt_pass.value)), None)
+            # Índice por nombre + un solo hash, sin recorrer la lista de usuarios
+            encontrado = credenciales.autenticar(repo, txt_user.value or "", txt_pass.value or "")
             if encontrado:
                 page.data = encontrado
                 iniciar_biblioteca()
@@ -82,11 +96,19 @@ def main(page: ft.Page):
 
     def abrir_registro(e):
         t_u = ft.TextField(label="Nuevo Usuario"); t_p = ft.TextField(label="Contraseña", password=True)
+        lbl_reg = ft.Text("", color="red")
         def reg(e):
-            usuarios.append({"id": int(time.time()), "nombre": t_u.value, "password": t_p.value})
-            guardar_datos_json("usuarios.json", usuarios)
+            if not (t_u.value or "").strip() or not t_p.value:
+                lbl_reg.value = "Completa usuario y contraseña"; page.update(); return
+            nuevo = {"nombre": t_u.value.strip(), "password": t_p.value}  # el id lo asigna el repositorio
+            try:
+                credenciales.registrar(repo, nuevo)
+            except UsuarioDuplicado:
+                lbl_reg.value = "Ese nombre de usuario ya existe"; page.update(); return
+            except Exception as ex:
+                lbl_reg.value = f"No se pudo registrar: {ex}"; page.update(); return
             cerrar_dialogo(dlg); mostrar_snack("Registrado con éxito")
-        dlg = ft.AlertDialog(title=ft.Text("Registro"), content=ft.Column([t_u, t_p], tight=True), actions=[ft.TextButton("OK", on_click=reg)])
+        dlg = ft.AlertDialog(title=ft.Text("Registro"), content=ft.Column([t_u, t_p, lbl_reg], tight=True), actions=[ft.TextButton("OK", on_click=reg)])
         page.overlay.append(dlg); dlg.open = True; page.update()
 
     # --- VISTA: BIBLIOTECA ---
@@ -94,25 +116,53 @@ def main(page: ft.Page):
     def iniciar_biblioteca():
         page.clean()
         user_actual = page.data
-        lista_libros_ui = ft.Column(scroll=ft.ScrollMode.ADAPTIVE, expand=True)
+        # ListView: solo se dibuja lo visible y se piden más páginas al llegar al final
+        lista_libros_ui = ft.ListView(expand=True, on_scroll=lambda e: al_desplazar(e))
 
         # --- FUNCIÓN: BUZÓN DE CORREOS ---
+        def fila_mensaje(m):
+            # Los compartidos de main.py traen ids en vez de nombres y títulos
+            remitente = m.get('remitente') or (repo.usuario(m.get('de_usuario_id')) or {}).get('nombre', '?')
+            titulo = m.get('libro_titulo') or (repo.libro(m.get('libro_id')) or {}).get('titulo', '?')
+            return ft.ListTile(leading=ft.Icon(ft.Icons.EMAIL), title=ft.Text(f"De: {remitente}"), subtitle=ft.Text(f"Libro: {titulo}\n'{m.get('mensaje') or m.get('nota', '')}'"), is_three_line=True)
+
+        def actualizar_badge():
+            no_leidos = repo.no_leidos(user_actual['id'])
+            btn_buzon.badge = str(no_leidos) if no_leidos else None
+
         def abrir_buzon(e):
-            mis_mensajes = [m for m in compartidos if m.get('destinatario') == user_actual['nombre']]
+            # Solo la primera página del buzón del usuario; el resto se pide con "Ver más"
+            mis_mensajes = repo.buzon(user_actual['id'])
+            repo.marcar_leidos(user_actual['id']); actualizar_badge()
             if not mis_mensajes:
                 contenido = ft.Text("No tienes mensajes nuevos.")
             else:
-                filas = [ft.ListTile(leading=ft.Icon(ft.Icons.EMAIL), title=ft.Text(f"De: {m['remitente']}"), subtitle=ft.Text(f"Libro: {m['libro_titulo']}\n'{m['mensaje']}'"), is_three_line=True) for m in mis_mensajes]
-                contenido = ft.Column(filas, scroll=True, height=400)
+                estado = {'pagina': 0}
+                filas = ft.Column([fila_mensaje(m) for m in mis_mensajes], scroll=True, height=400)
+                def ver_mas(e):
+                    estado['pagina'] += 1
+                    siguientes = repo.buzon(user_actual['id'], estado['pagina'])
+                    filas.controls.extend(fila_mensaje(m) for m in siguientes)
+                    btn_mas.visible = len(siguientes) == TAMAÑO_PAGINA_BUZON
+                    page.update()
+                btn_mas = ft.TextButton("Ver más", on_click=ver_mas, visible=len(mis_mensajes) == TAMAÑO_PAGINA_BUZON)
+                contenido = ft.Column([filas, btn_mas], tight=True)
 
             dlg_buzon = ft.AlertDialog(title=ft.Text("Buzón de Entrada"), content=contenido, actions=[ft.TextButton("Cerrar", on_click=lambda _: cerrar_dialogo(dlg_buzon))])
             page.overlay.append(dlg_buzon); dlg_buzon.open = True; page.update()
 
         # --- FUNCIONES DE DETALLES DEL LIBRO ---
+        @medido('ui.abrir_detalles')
         def abrir_detalles(libro):
+            # Rating, reseñas con nombres y compartidos salen de la caché de detalles
+            detalle = operaciones.detalle_libro(repo, libro['id'])
+            rating, tambien = detalle['rating'], detalle['tambien_gustaron']
+            texto = f"ID: {libro['id']}\nAutor: {libro['autor']}\nGénero: {libro['genero']}\nAño: {libro['anio']}\nPromedio: {rating['promedio']} ★ ({rating['cantidad']} reseñas)"
+            if tambien:
+                texto += "\n\nA quienes les gustó también les gustó:\n" + "\n".join(f"• {l['titulo']} ({l['autor']})" for l in tambien[:5])
             dlg = ft.AlertDialog(
                 title=ft.Text(libro['titulo']),
-                content=ft.Text(f"ID: {libro['id']}\nAutor: {libro['autor']}\nGénero: {libro['genero']}\nAño: {libro['anio']}"),
+                content=ft.Text(texto),
                 actions=[
                     ft.TextButton("Ver Reseñas", on_click=lambda _: ver_reseñas(libro)),
                     ft.TextButton("Añadir Reseña", on_click=lambda _: abrir_formulario_resena(libro)), # REINSTALADO
@@ -122,68 +172,126 @@ def main(page: ft.Page):
             )
             page.overlay.append(dlg); dlg.open = True; page.update()
 
+        @medido('ui.ver_reseñas')
         def ver_reseñas(libro):
-            filtradas = [r for r in reseñas if r.get('libro_id') == libro['id']]
-            cont = ft.Column([ft.ListTile(title=ft.Text(f"{r['rating']} ★"), subtitle=ft.Text(r['texto'])) for r in filtradas], height=300, scroll=True) if filtradas else ft.Text("Sin reseñas.")
+            filtradas = operaciones.detalle_libro(repo, libro['id'])['reseñas']
+            cont = ft.Column([ft.ListTile(title=ft.Text(f"{r['rating']} ★ · {r['usuario'] or 'Anónimo'}"), subtitle=ft.Text(r['texto'])) for r in filtradas], height=300, scroll=True) if filtradas else ft.Text("Sin reseñas.")
             dlg_v = ft.AlertDialog(title=ft.Text("Reseñas"), content=cont, actions=[ft.TextButton("Cerrar", on_click=lambda _: cerrar_dialogo(dlg_v))])
             page.overlay.append(dlg_v); dlg_v.open = True; page.update()
 
         def abrir_formulario_resena(libro):
             t_rate = ft.TextField(label="Calificación (1-5)", width=100)
             t_com = ft.TextField(label="Tu comentario", multiline=True, min_lines=3)
+            lbl_error = ft.Text("", color="red")
             def guardar(e):
                 if not t_rate.value or not t_com.value: return
-                reseñas.append({
-                    "id": int(time.time()), "libro_id": libro['id'], 
-                    "rating": t_rate.value, "texto": t_com.value, 
-                    "fecha": datetime.now().strftime("%d/%m/%Y")
-                })
-                guardar_datos_json("reseñas.json", reseñas)
+                # Una reseña por usuario y libro: si ya tiene una, se edita
+                try:
+                    operaciones.guardar_reseña(repo, libro['id'], user_actual['id'], t_rate.value, t_com.value)
+                except ValueError as ex:
+                    lbl_error.value = str(ex); page.update(); return
+                rehacer_cards([libro['id']])  # la card muestra el promedio
                 cerrar_dialogo(dlg_f); mostrar_snack("¡Reseña guardada!")
 
-            dlg_f = ft.AlertDialog(title=ft.Text(f"Nueva reseña: {libro['titulo']}"), content=ft.Column([t_rate, t_com], tight=True), actions=[ft.TextButton("Guardar", on_click=guardar)])
+            dlg_f = ft.AlertDialog(title=ft.Text(f"Nueva reseña: {libro['titulo']}"), content=ft.Column([t_rate, t_com, lbl_error], tight=True), actions=[ft.TextButton("Guardar", on_click=guardar)])
             page.overlay.append(dlg_f); dlg_f.open = True; page.update()
 
         def compartir_libro(libro):
-            ops = [ft.dropdown.Option(u['nombre']) for u in usuarios if u['nombre'] != user_actual['nombre']]
+            ops = [ft.dropdown.Option(key=str(u['id']), text=u['nombre']) for u in repo.usuarios() if u['id'] != user_actual['id']]
             dd = ft.Dropdown(label="Enviar a...", options=ops); txt = ft.TextField(label="Mensaje")
             def enviar(e):
                 if not dd.value: return
-                compartidos.append({
-                    "remitente": user_actual['nombre'], "destinatario": dd.value,
-                    "libro_titulo": libro['titulo'], "mensaje": txt.value, 
-                    "fecha": datetime.now().strftime("%d/%m/%Y %H:%M")
-                })
-                guardar_datos_json("compartidos.json", compartidos)
-                cerrar_dialogo(dlg_c); mostrar_snack(f"Enviado a {dd.value}")
+                destinatario = repo.usuario(int(dd.value))
+                # Mismas validaciones que main.py y el servidor; el buzón se indexa por id
+                try:
+                    operaciones.compartir_libro(repo, libro['id'], user_actual['id'], destinatario['id'], txt.value or "")
+                except ValueError as ex:
+                    mostrar_snack(str(ex)); return
+                cerrar_dialogo(dlg_c); mostrar_snack(f"Enviado a {destinatario['nombre']}")
             dlg_c = ft.AlertDialog(title=ft.Text("Compartir"), content=ft.Column([dd, txt], tight=True), actions=[ft.TextButton("Enviar", on_click=enviar)])
             page.overlay.append(dlg_c); dlg_c.open = True; page.update()
 
         # UI BIBLIOTECA
-        def crear_card(l):
+        def crear_card(l, promedio):
             return ft.Card(ft.Container(padding=15, content=ft.Row([
                 ft.Icon(ft.Icons.BOOK_ROUNDED, color="blue"),
                 ft.Column([ft.Text(l['titulo'], weight="bold"), ft.Text(l['autor'])], expand=True),
+                ft.Text(f"{promedio} ★" if promedio else ""),
                 ft.IconButton(ft.Icons.INFO_OUTLINE, on_click=lambda _: abrir_detalles(l))
             ])))
 
-        buscador = ft.TextField(label="Buscar libro...", prefix_icon=ft.Icons.SEARCH, on_change=lambda e: filtrar())
-        def filtrar():
-            lista_libros_ui.controls.clear()
-            for l in libros:
-                if buscador.value.lower() in l['titulo'].lower() or buscador.value.lower() in l['autor'].lower():
-                    lista_libros_ui.controls.append(crear_card(l))
-            page.update()
+        async def al_escribir(e):
+            busqueda.programar(buscador.value or "")
+
+        buscador = ft.TextField(label="Buscar libro...", prefix_icon=ft.Icons.SEARCH, on_change=al_escribir)
+        def crear_cards(nuevos):
+            # Un solo pedido de promedios para toda la página
+            promedios = repo.promedios([l['id'] for l in nuevos])
+            return [crear_card(l, promedios[l['id']]) for l in nuevos]
+
+        paginas = ListaPaginada(crear_cards)
+
+        def rehacer_cards(libro_ids=None):
+            # Las cards reutilizadas traen el promedio de cuando se crearon
+            nuevas = {id(anterior): nueva for anterior, nueva in paginas.rehacer(libro_ids)}
+            if nuevas:
+                lista_libros_ui.controls = [nuevas.get(id(c), c) for c in lista_libros_ui.controls]
 
-        for l in libros: lista_libros_ui.controls.append(crear_card(l))
+        def filtrar(resultados):
+            # Las cards de libros que siguen en el resultado se reutilizan
+            with medir('ui.filtrar'):
+                lista_libros_ui.controls = paginas.mostrar(resultados)
+                page.update()
+
+        # Debounce: solo la última consulta tecleada llega a filtrar()
+        busqueda = BusquedaDiferida(indice_busqueda.buscar, filtrar)
+
+        def al_desplazar(e):
+            # Cerca del final: se agrega la siguiente página
+            if paginas.hay_mas() and e.max_scroll_extent - e.pixels < MARGEN_SCROLL:
+                lista_libros_ui.controls.extend(paginas.cargar_mas())
+                page.update()
+
+        async def refrescar_catalogo():
+            filtrar(indice_busqueda.buscar(buscador.value or ""))
+
+        def al_cargar_lote():
+            # Llamado desde el hilo de carga: la UI se toca desde el loop de la página
+            page.run_task(refrescar_catalogo)
+
+        async def refrescar_buzon():
+            actualizar_badge(); page.update()
+
+        async def refrescar_promedios():
+            rehacer_cards(); page.update()
+
+        def al_cambiar_datos(colecciones):
+            # Llamado desde el hilo del vigilante cuando otro proceso guardó algo
+            if 'compartidos' in colecciones or 'leidos' in colecciones:
+                page.run_task(refrescar_buzon)
+            if 'reseñas' in colecciones:
+                page.run_task(refrescar_promedios)
+
+        def cerrar_sesion(e):
+            carga_catalogo.desuscribir(al_cargar_lote)
+            vigilante.desuscribir(al_cambiar_datos)
+            mostrar_login()
+
+        if not carga_catalogo.terminada.is_set():
+            carga_catalogo.suscribir(al_cargar_lote)
+        vigilante.suscribir(al_cambiar_datos)
+        lista_libros_ui.controls = paginas.mostrar(indice_busqueda.buscar(""))
+
+        btn_buzon = ft.IconButton(ft.Icons.EMAIL_OUTLINED, tooltip="Buzón", on_click=abrir_buzon)
+        actualizar_badge()
 
         page.add(
             ft.AppBar(
                 title=ft.Text(f"Readers Bay - {user_actual['nombre']}"),
                 bgcolor=ft.Colors.BLUE_50,
                 actions=[
-                    ft.IconButton(ft.Icons.EMAIL_OUTLINED, tooltip="Buzón", on_click=abrir_buzon),
-                    ft.IconButton(ft.Icons.LOGOUT, on_click=lambda _: mostrar_login())
+                    btn_buzon,
+                    ft.IconButton(ft.Icons.LOGOUT, on_click=cerrar_sesion)
                 ]
             ),
             ft.Text("Mi Biblioteca", size=24, weight="bold"),
@@ -194,5 +302,15 @@ def main(page: ft.Page):
 
     mostrar_login()
 
+def main(ruta_datos=RUTA_DATOS):
+    # Flet se importa recién aquí: importar interfaz.py no lo necesita
+    import flet as ft
+    cargar_datos(ruta_datos)
+    try:
+        ft.run(app)
+    finally:
+        vigilante.detener()
+        repo.cerrar()  # escribe lo que haya quedado en la cola de guardado
+
 if __name__ == "__main__":
-    ft.run(main)
\ No newline at end of file
+    main()
\ No newline at end of file
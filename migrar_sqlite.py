@@ -0,0 +1,22 @@
+import argparse
+import os
+
+from readers_bay.repositorio import ARCHIVO_SQLITE, migrar_json_a_sqlite
+
+# --- Migración única de data/*.json a SQLite ---
+# Uso: python migrar_sqlite.py [--datos data] [--destino data/club.db]
+# Después, arrancar la app con READERS_BAY_BACKEND=sqlite.
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migra los archivos JSON del club a SQLite.")
+    parser.add_argument('--datos', default='data', help="Carpeta con los archivos JSON")
+    parser.add_argument('--destino', default=None, help=f"Base de destino (por defecto <datos>/{ARCHIVO_SQLITE})")
+    args = parser.parse_args(argv)
+
+    destino = args.destino or os.path.join(args.datos, ARCHIVO_SQLITE)
+    migrar_json_a_sqlite(args.datos, destino)
+    print(f"Datos migrados a {destino}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Lógica del club de libros, sin UI: repositorios (JSON o SQLite), índices,
+búsqueda y operaciones. Importar el paquete no lee datos ni importa Flet;
+los datos se cargan recién al llamar a abrir_repositorio().
+
+    from readers_bay import abrir_repositorio, operaciones
+"""
+
+import importlib
+
+# Lo que se puede importar directo del paquete -> módulo que lo define.
+# Se importa al primer uso, así "import readers_bay" no carga nada de más.
+_EXPORTADOS = {
+    'abrir_repositorio': 'repositorio',
+    'migrar_json_a_sqlite': 'repositorio',
+    'VigilanteCambios': 'repositorio',
+    'IndiceBusqueda': 'busqueda',
+    'MotorRecomendaciones': 'recomendaciones',
+    'Credenciales': 'credenciales',
+    'UsuarioDuplicado': 'credenciales',
+}
+_MODULOS = ('agregados', 'almacen', 'busqueda', 'busqueda_async', 'buzon', 'carga_streaming',
+            'credenciales', 'escritor', 'importacion', 'indices', 'operaciones', 'paginacion',
+            'recomendaciones', 'registros', 'repositorio')
+
+__all__ = sorted(_EXPORTADOS) + list(_MODULOS)
+
+
+def __getattr__(nombre):
+    if nombre in _EXPORTADOS:
+        return getattr(importlib.import_module(f'.{_EXPORTADOS[nombre]}', __name__), nombre)
+    if nombre in _MODULOS:
+        return importlib.import_module(f'.{nombre}', __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
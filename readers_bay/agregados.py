@@ -0,0 +1,88 @@
+# --- Agregados de calificación por libro ---
+# Cantidad, suma e histograma (1 a 5 estrellas) de cada libro_id, mantenidos
+# al crear o editar reseñas. Así el promedio sale en O(1) sin recorrer las
+# reseñas del libro.
+
+RATING_MINIMO = 1
+RATING_MAXIMO = 5
+
+
+def rating_numerico(valor):
+    """Convierte el rating guardado (a veces texto, como "5") a int, o None si no es válido."""
+    try:
+        rating = int(valor)
+    except (TypeError, ValueError):
+        return None
+    if RATING_MINIMO <= rating <= RATING_MAXIMO:
+        return rating
+    return None
+
+
+def resumen_vacio():
+    return {'cantidad': 0, 'suma': 0, 'promedio': 0,
+            'histograma': {estrellas: 0 for estrellas in range(RATING_MINIMO, RATING_MAXIMO + 1)}}
+
+
+def calcular_promedio_agregado(cantidad, suma):
+    """Mismo redondeo que calcular_promedio: un decimal, 0 si no hay reseñas."""
+    if not cantidad:
+        return 0
+    return round(suma / cantidad, 1)
+
+
+class AgregadosRating:
+    """Agregados por libro que se actualizan en O(1) por reseña."""
+
+    def __init__(self, reseñas=()):
+        self._cantidad = {}
+        self._suma = {}
+        self._histograma = {}
+        # Lo que aportó cada reseña, para restarlo al editarla aunque el
+        # registro ya se haya modificado en su lugar
+        self._aportes = {}
+        for reseña in reseñas:
+            self.registrar(reseña)
+
+    def registrar(self, reseña):
+        """Suma una reseña nueva o reemplaza el aporte anterior de una editada."""
+        clave = reseña.get('id', id(reseña))
+        anterior = self._aportes.pop(clave, None)
+        if anterior is not None:
+            self._restar(*anterior)
+        libro_id = reseña.get('libro_id')
+        rating = rating_numerico(reseña.get('rating'))
+        if libro_id is None or rating is None:
+            return
+        self._sumar(libro_id, rating)
+        self._aportes[clave] = (libro_id, rating)
+
+    def _sumar(self, libro_id, rating):
+        self._cantidad[libro_id] = self._cantidad.get(libro_id, 0) + 1
+        self._suma[libro_id] = self._suma.get(libro_id, 0) + rating
+        histograma = self._histograma.setdefault(libro_id, [0] * (RATING_MAXIMO + 1))
+        histograma[rating] += 1
+
+    def _restar(self, libro_id, rating):
+        self._cantidad[libro_id] -= 1
+        self._suma[libro_id] -= rating
+        self._histograma[libro_id][rating] -= 1
+
+    # --- Consultas ---
+
+    def promedio(self, libro_id):
+        return calcular_promedio_agregado(self._cantidad.get(libro_id, 0), self._suma.get(libro_id, 0))
+
+    def resumen(self, libro_id):
+        """Cantidad, suma, promedio e histograma {estrellas: cantidad} de un libro."""
+        resumen = resumen_vacio()
+        if self._cantidad.get(libro_id):
+            resumen['cantidad'] = self._cantidad[libro_id]
+            resumen['suma'] = self._suma[libro_id]
+            resumen['promedio'] = self.promedio(libro_id)
+            for estrellas in resumen['histograma']:
+                resumen['histograma'][estrellas] = self._histograma[libro_id][estrellas]
+        return resumen
+
+    def promedios(self, libro_ids):
+        """Promedio de muchos libros a la vez: {libro_id: promedio}."""
+        return {libro_id: self.promedio(libro_id) for libro_id in libro_ids}
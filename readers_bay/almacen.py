@@ -0,0 +1,460 @@
+import atexit
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+from .carga_streaming import iterar_json
+from .instrumentacion import contar, medido
+from .registros import Registro, a_json
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+# --- Almacén con log de escritura anticipada ---
+# Cada cambio se agrega como una línea JSON a "<archivo>.log" en lugar de
+# reescribir el archivo completo. El archivo JSON original hace de snapshot:
+# al arrancar se lee el snapshot y se reproduce el log encima. Cuando el log
+# crece demasiado se compacta en un snapshot nuevo desde un hilo aparte.
+#
+# Varios procesos (interfaz.py y main.py a la vez) pueden usar la misma
+# carpeta: escrituras y compactaciones se hacen con flock sobre
+# "<archivo>.lock", que además guarda el último id asignado y cuántas veces
+# se compactó. Cada proceso sigue leyendo el log desde donde quedó, así
+# solo aplica los registros que cambiaron los demás.
+
+
+def escribir_snapshot(ruta, datos):
+    """Escribe el snapshot de forma atómica (archivo temporal + os.replace)."""
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, indent=4, ensure_ascii=False, default=a_json)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+
+
+def _como_dict(registro):
+    return registro.como_dict() if isinstance(registro, Registro) else dict(registro)
+
+
+def _clave_contenido(registro):
+    # Para reconocer registros sin id (datos viejos) por lo que contienen
+    return json.dumps(_como_dict(registro), sort_keys=True, ensure_ascii=False, default=a_json)
+
+
+class AlmacenLog:
+    """
+    Colección persistida como snapshot JSON + log de operaciones.
+    Guardar un registro cuesta una línea en el log, sin importar el tamaño
+    de la colección.
+    """
+
+    def __init__(self, ruta, lote_fsync=64, intervalo_fsync=1.0,
+                 minimo_compactacion=1000, factor_compactacion=0.5, fabrica=None, escritor=None,
+                 al_cambiar=None):
+        self.ruta = ruta
+        self.fabrica = fabrica    # dict leído -> registro (p. ej. Reseña.desde_dict)
+        self.escritor = escritor  # EscritorFondo opcional: guardar() no espera al disco
+        # al_cambiar(registro, anterior) avisa de lo que llega de otros procesos
+        # (anterior es None si el registro es nuevo). Se llama sin el bloqueo
+        # tomado: quien lo reciba puede guardar desde otro hilo mientras tanto
+        self.al_cambiar = al_cambiar
+        self.ruta_log = ruta + '.log'
+        self.ruta_compactando = ruta + '.log.compactando'
+        self.ruta_bloqueo = ruta + '.lock'
+        self.lote_fsync = lote_fsync
+        self.intervalo_fsync = intervalo_fsync
+        self.minimo_compactacion = minimo_compactacion
+        self.factor_compactacion = factor_compactacion
+
+        self.datos = []
+        self._por_id = {}
+        self._log = None
+        self._lector = None       # el mismo log, abierto para leer lo que agregan otros
+        self._archivo_bloqueo = None
+        self._generacion = 0      # compactaciones vistas (si cambia, el log se vació)
+        self._cambios_sin_avisar = 0
+        self._pendientes = 0      # líneas escritas todavía sin fsync
+        self._entradas_log = 0    # líneas en el log actual
+        self._lock = threading.Lock()
+        self._cerrado = threading.Event()
+        self._hilo_fsync = None
+        self._hilo_compactacion = None
+
+    # --- Bloqueo entre hilos y procesos ---
+
+    @contextmanager
+    def _bloqueo(self, exclusivo=True):
+        with self._lock:
+            if fcntl is None or self._archivo_bloqueo is None:
+                yield
+                return
+            fcntl.flock(self._archivo_bloqueo.fileno(), fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._archivo_bloqueo.fileno(), fcntl.LOCK_UN)
+
+    def _leer_meta(self):
+        self._archivo_bloqueo.seek(0)
+        try:
+            return json.loads(self._archivo_bloqueo.read() or '{}')
+        except ValueError:
+            return {}
+
+    def _escribir_meta(self, meta):
+        self._archivo_bloqueo.seek(0)
+        self._archivo_bloqueo.truncate()
+        self._archivo_bloqueo.write(json.dumps(meta))
+        self._archivo_bloqueo.flush()
+
+    # --- Arranque ---
+
+    @medido('almacen.cargar')
+    def cargar(self):
+        """Lee snapshot + log y devuelve la lista de registros resultante."""
+        self._archivo_bloqueo = os.fdopen(
+            os.open(self.ruta_bloqueo, os.O_RDWR | os.O_CREAT, 0o644), 'r+', encoding='utf-8')
+        with self._bloqueo():
+            self.datos = []
+            self._por_id = {}
+            for registro in iterar_json(self.ruta):
+                if self.fabrica is not None:
+                    registro = self.fabrica(registro)
+                self.datos.append(registro)
+                if 'id' in registro:
+                    self._por_id.setdefault(registro['id'], registro)
+
+            # Las compactaciones ya no rotan el log, pero puede quedar uno
+            # de una versión anterior cortada a mitad de compactar
+            quedo_compactacion = os.path.exists(self.ruta_compactando)
+            if quedo_compactacion:
+                self._reproducir(self.ruta_compactando)
+            self._entradas_log = self._reproducir(self.ruta_log)
+
+            # Los registros viejos sin id reciben uno ahora, una sola vez y en
+            # disco: si cada proceso los reconociera a su manera, al releer
+            # un snapshot no sabría cuáles ya tiene y los duplicaría
+            meta = self._leer_meta()
+            sin_id = [registro for registro in self.datos if registro.get('id') is None]
+            if sin_id:
+                ultimo = max((r['id'] for r in self.datos if isinstance(r.get('id'), int)), default=0)
+                ultimo = max(meta.get('ultimo_id', 0), ultimo)
+                for registro in sin_id:
+                    ultimo += 1
+                    registro['id'] = ultimo
+                    self._por_id[ultimo] = registro
+                meta['ultimo_id'] = ultimo
+
+            if quedo_compactacion or sin_id:
+                escribir_snapshot(self.ruta, [_como_dict(r) for r in self.datos])
+                for ruta in (self.ruta_compactando, self.ruta_log):
+                    if os.path.exists(ruta):
+                        os.remove(ruta)
+                self._entradas_log = 0
+                # Los demás procesos abiertos releen el snapshot nuevo
+                meta['generacion'] = meta.get('generacion', 0) + 1
+                self._escribir_meta(meta)
+
+            self._generacion = meta.get('generacion', 0)
+            self._log = open(self.ruta_log, 'ab')
+            self._lector = open(self.ruta_log, 'rb')
+            self._lector.seek(0, os.SEEK_END)
+
+        self._cerrado.clear()
+        self._hilo_fsync = threading.Thread(target=self._bucle_fsync, daemon=True)
+        self._hilo_fsync.start()
+        atexit.register(self.cerrar)
+        return self.datos
+
+    def _reproducir(self, ruta):
+        """Aplica las entradas de un log sobre self.datos. Devuelve cuántas leyó."""
+        if not os.path.exists(ruta):
+            return 0
+        leidas = 0
+        offset_valido = 0
+        with open(ruta, 'rb') as f:
+            for linea in f:
+                try:
+                    entrada = json.loads(linea)
+                except ValueError:
+                    break  # última línea truncada por un corte a mitad de escritura
+                self._aplicar(entrada['r'])
+                offset_valido += len(linea)
+                leidas += 1
+        if offset_valido < os.path.getsize(ruta):
+            with open(ruta, 'r+b') as f:
+                f.truncate(offset_valido)
+        return leidas
+
+    def _aplicar(self, registro):
+        """Upsert por id. Devuelve (registro, anterior) si algo cambió, si no None."""
+        id_registro = registro.get('id')
+        existente = self._por_id.get(id_registro) if id_registro is not None else None
+        if existente is not None:
+            anterior = _como_dict(existente)
+            existente.update(registro)
+            if _como_dict(existente) == anterior:
+                return None
+            return existente, anterior
+        if self.fabrica is not None:
+            registro = self.fabrica(registro)
+        self.datos.append(registro)
+        if id_registro is not None:
+            self._por_id[id_registro] = registro
+        return registro, None
+
+    # --- Cambios de otros procesos ---
+
+    def _ponerse_al_dia(self):
+        """
+        Aplica lo que otros procesos agregaron al log desde la última lectura.
+        Requiere el bloqueo. Devuelve los cambios como (registro, anterior),
+        para pasarlos a _avisar() una vez soltado el bloqueo.
+        """
+        cambios = []
+        generacion = self._leer_meta().get('generacion', 0)
+        if generacion != self._generacion:
+            # Otro proceso compactó: lo que no llegamos a leer está en el snapshot
+            self._generacion = generacion
+            cambios.extend(self._releer_snapshot())
+            self._lector.seek(0)
+            self._entradas_log = 0
+
+        while True:
+            inicio = self._lector.tell()
+            linea = self._lector.readline()
+            if not linea:
+                break
+            if not linea.endswith(b'\n'):
+                self._lector.seek(inicio)  # línea a medio escribir por un proceso cortado
+                break
+            try:
+                entrada = json.loads(linea)
+            except ValueError:
+                continue
+            self._entradas_log += 1
+            cambio = self._aplicar(entrada['r'])
+            if cambio is not None:
+                cambios.append(cambio)
+
+        self._cambios_sin_avisar += len(cambios)
+        return cambios
+
+    def _releer_snapshot(self):
+        """
+        Rearma self.datos a partir del snapshot que dejó otra compactación
+        (no se mezcla encima: los registros sin id se duplicarían). Los
+        registros que ya estaban en memoria se conservan como objetos, y lo
+        propio que aún espera en la cola del escritor se mantiene.
+        """
+        cambios = []
+        datos, por_id = [], {}
+        propios_sin_id = {}
+        for registro in self.datos:
+            if registro.get('id') is None:
+                propios_sin_id.setdefault(_clave_contenido(registro), []).append(registro)
+
+        for leido in iterar_json(self.ruta):
+            id_registro = leido.get('id')
+            existente = self._por_id.get(id_registro) if id_registro is not None else None
+            if existente is None and id_registro is None:
+                iguales = propios_sin_id.get(_clave_contenido(leido))
+                existente = iguales.pop() if iguales else None
+            if existente is not None:
+                anterior = _como_dict(existente)
+                existente.update(leido)
+                if _como_dict(existente) != anterior:
+                    cambios.append((existente, anterior))
+                registro = existente
+            else:
+                registro = self.fabrica(leido) if self.fabrica is not None else leido
+                cambios.append((registro, None))
+            datos.append(registro)
+            if id_registro is not None:
+                por_id[id_registro] = registro
+
+        for id_registro, registro in self._por_id.items():
+            if id_registro not in por_id:
+                datos.append(registro)
+                por_id[id_registro] = registro
+        # Se reemplaza el contenido de la misma lista: el repositorio la comparte
+        self.datos[:] = datos
+        self._por_id = por_id
+        return cambios
+
+    def _avisar(self, cambios):
+        # Fuera del bloqueo: al_cambiar toma el lock del repositorio, y quien
+        # tiene ese lock puede estar esperando este bloqueo (nuevo_id)
+        if self.al_cambiar is not None:
+            for registro, anterior in cambios:
+                self.al_cambiar(registro, anterior)
+
+    def refrescar(self):
+        """Lee los cambios de otros procesos. Devuelve cuántos registros cambiaron desde la última vez."""
+        if self._lector is None:
+            return 0
+        with self._bloqueo(exclusivo=False):
+            avisos = self._ponerse_al_dia()
+            cambios, self._cambios_sin_avisar = self._cambios_sin_avisar, 0
+        self._avisar(avisos)
+        contar('almacen.cambios_externos', cambios)
+        return cambios
+
+    def nuevo_id(self, minimo=0):
+        """Id para un registro nuevo, sin choques con los que asignen otros procesos."""
+        return self.reservar_ids(1, minimo)[0]
+
+    def reservar_ids(self, cantidad, minimo=0):
+        """Rango de `cantidad` ids consecutivos, con un solo paso por el bloqueo."""
+        with self._bloqueo():
+            meta = self._leer_meta()
+            primero = max(meta.get('ultimo_id', 0), minimo) + 1
+            meta['ultimo_id'] = primero + cantidad - 1
+            self._escribir_meta(meta)
+        return range(primero, primero + cantidad)
+
+    # --- Escritura ---
+
+    def guardar(self, registro):
+        """
+        Registra el estado actual de un registro (nuevo o editado).
+        La lista en memoria la mantiene quien llama, igual que antes.
+        """
+        if registro.get('id') is not None:
+            self._por_id.setdefault(registro['id'], registro)
+        # Se serializa ahora: lo que se escribe es el estado al momento de guardar
+        linea = json.dumps({'op': 'guardar', 'r': registro}, ensure_ascii=False, default=a_json) + '\n'
+        if self.escritor is not None:
+            self.escritor.enviar(self, registro.get('id'), linea)
+        else:
+            self.escribir_lote([linea])
+
+    def guardar_lote(self, registros):
+        """
+        Como guardar() para muchos registros, pero directo al log en una sola
+        escritura (importaciones). Antes se escribe lo que ya estaba en la
+        cola, para que el log conserve el orden de los cambios.
+        """
+        lineas = []
+        for registro in registros:
+            if registro.get('id') is not None:
+                self._por_id.setdefault(registro['id'], registro)
+            lineas.append(json.dumps({'op': 'guardar', 'r': registro}, ensure_ascii=False, default=a_json) + '\n')
+        if self.escritor is not None:
+            self.escritor.vaciar()
+        if lineas:
+            self.escribir_lote(lineas)
+
+    @medido('almacen.escribir_lote')
+    def escribir_lote(self, lineas):
+        """Agrega varias líneas al log en una sola escritura."""
+        with self._bloqueo():
+            if self._log is None:
+                raise RuntimeError(f"{self.ruta_log} está cerrado")
+            # Primero lo de otros procesos; si tocaron los mismos registros,
+            # en memoria tiene que quedar lo nuestro, que va después en el log
+            cambios = self._ponerse_al_dia()
+            ajenos = {registro.get('id') for registro, _ in cambios}
+            if ajenos:
+                for linea in lineas:
+                    registro = json.loads(linea)['r']
+                    if registro.get('id') in ajenos:
+                        cambio = self._aplicar(registro)
+                        if cambio is not None:
+                            cambios.append(cambio)
+            self._log.write(''.join(lineas).encode('utf-8'))
+            self._log.flush()
+            self._lector.seek(0, os.SEEK_END)  # lo propio no se vuelve a leer
+            self._pendientes += len(lineas)
+            self._entradas_log += len(lineas)
+            if self._pendientes >= self.lote_fsync:
+                self._fsync()
+            if self._entradas_log >= self._umbral_compactacion() and not self._compactando():
+                self._hilo_compactacion = threading.Thread(target=self._compactar, daemon=True)
+                self._hilo_compactacion.start()
+        self._avisar(cambios)
+
+    def sincronizar(self):
+        """Escribe lo que esté en cola y hace fsync: al volver, lo guardado es durable."""
+        if self.escritor is not None:
+            self.escritor.vaciar()
+        self._sincronizar_disco()
+
+    def _sincronizar_disco(self):
+        with self._lock:
+            if self._log is not None:
+                self._fsync()
+
+    def _fsync(self):
+        if self._pendientes:
+            os.fsync(self._log.fileno())
+            self._pendientes = 0
+
+    def _bucle_fsync(self):
+        while not self._cerrado.wait(self.intervalo_fsync):
+            self._sincronizar_disco()
+
+    # --- Compactación ---
+
+    def _umbral_compactacion(self):
+        # Proporcional al tamaño: el costo de compactar queda amortizado en O(1)
+        return max(self.minimo_compactacion, int(len(self.datos) * self.factor_compactacion))
+
+    def _compactando(self):
+        return self._hilo_compactacion is not None and self._hilo_compactacion.is_alive()
+
+    @medido('almacen.compactar')
+    def _compactar(self):
+        """
+        Escribe el snapshot y vacía el log, con el bloqueo tomado: los demás
+        procesos esperan (sus guardados quedan en la cola de su escritor) y
+        al ver la generación nueva releen el snapshot.
+        """
+        with self._bloqueo():
+            if self._log is None:
+                return
+            cambios = self._ponerse_al_dia()
+            escribir_snapshot(self.ruta, [_como_dict(r) for r in self.datos])
+            self._fsync()
+            os.ftruncate(self._log.fileno(), 0)
+            meta = self._leer_meta()
+            meta['generacion'] = self._generacion = meta.get('generacion', 0) + 1
+            self._escribir_meta(meta)
+            self._lector.seek(0)
+            self._entradas_log = 0
+        self._avisar(cambios)
+
+    def compactar(self):
+        """Compacta ya y espera a que termine."""
+        if self.escritor is not None:
+            self.escritor.vaciar()
+        with self._lock:
+            if not self._compactando():
+                self._hilo_compactacion = threading.Thread(target=self._compactar, daemon=True)
+                self._hilo_compactacion.start()
+            hilo = self._hilo_compactacion
+        hilo.join()
+
+    # --- Cierre ---
+
+    def cerrar(self):
+        """Escribe lo encolado, hace fsync y espera a una compactación en curso."""
+        if self.escritor is not None:
+            self.escritor.vaciar()
+        self._cerrado.set()
+        hilo = self._hilo_compactacion
+        if hilo is not None:
+            hilo.join()
+        with self._lock:
+            if self._log is not None:
+                self._fsync()
+                self._log.close()
+                self._log = None
+            for archivo in (self._lector, self._archivo_bloqueo):
+                if archivo is not None:
+                    archivo.close()
+            self._lector = self._archivo_bloqueo = None
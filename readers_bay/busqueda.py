@@ -0,0 +1,167 @@
+import heapq
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+from .instrumentacion import medido
+
+# --- Índice invertido para el buscador de libros ---
+# Cada palabra de título, autor y género se normaliza (minúsculas, sin
+# tildes) y se indexa por todos sus prefijos, así "garc" o "marquez"
+# encuentran "Gabriel García Márquez" sin recorrer el catálogo.
+
+PESOS_CAMPOS = {'titulo': 3, 'autor': 2, 'genero': 1}
+BONO_PALABRA_EXACTA = 1
+# Consultas con más candidatos que esto (prefijos de 1-2 letras en catálogos
+# grandes) se guardan en caché hasta el próximo alta/baja de libros
+MINIMO_CANDIDATOS_CACHE = 2000
+MAXIMO_CONSULTAS_CACHE = 256
+
+_PALABRA = re.compile(r"\w+")
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes: 'Márquez' -> 'marquez'."""
+    descompuesto = unicodedata.normalize('NFKD', str(texto).casefold())
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def tokenizar(texto):
+    """Separa un texto normalizado en palabras."""
+    return _PALABRA.findall(normalizar(texto))
+
+
+class IndiceBusqueda:
+    """Índice invertido por prefijos sobre los campos de los libros."""
+
+    def __init__(self, libros=(), largo_maximo_prefijo=15):
+        self.largo_maximo_prefijo = largo_maximo_prefijo
+        self._libros = {}                 # id -> libro
+        self._orden = {}                  # id -> posición de alta (desempate)
+        self._altas = 0
+        self._prefijos = {campo: defaultdict(set) for campo in PESOS_CAMPOS}
+        self._palabras = {campo: defaultdict(set) for campo in PESOS_CAMPOS}
+        self._cache = {}
+        # El catálogo puede llenarse desde un hilo de carga mientras la UI busca
+        self._lock = threading.RLock()
+        for libro in libros:
+            self.agregar_libro(libro)
+
+    def __len__(self):
+        return len(self._libros)
+
+    # --- Mantenimiento incremental ---
+
+    def agregar_libro(self, libro):
+        with self._lock:
+            self._agregar(libro)
+
+    def _agregar(self, libro):
+        libro_id = libro['id']
+        if libro_id in self._libros:
+            self._quitar(libro_id)
+        self._cache.clear()
+        self._libros[libro_id] = libro
+        self._orden[libro_id] = self._altas
+        self._altas += 1
+        for campo, palabra in self._palabras_de(libro):
+            self._palabras[campo][palabra].add(libro_id)
+            for prefijo in self._prefijos_de(palabra):
+                self._prefijos[campo][prefijo].add(libro_id)
+
+    def quitar_libro(self, libro_id):
+        with self._lock:
+            self._quitar(libro_id)
+
+    def _quitar(self, libro_id):
+        libro = self._libros.pop(libro_id, None)
+        if libro is None:
+            return
+        del self._orden[libro_id]
+        self._cache.clear()
+        for campo, palabra in self._palabras_de(libro):
+            self._descartar(self._palabras[campo], palabra, libro_id)
+            for prefijo in self._prefijos_de(palabra):
+                self._descartar(self._prefijos[campo], prefijo, libro_id)
+
+    @staticmethod
+    def _descartar(mapa, clave, libro_id):
+        ids = mapa.get(clave)
+        if ids is not None:
+            ids.discard(libro_id)
+            if not ids:
+                del mapa[clave]
+
+    def _palabras_de(self, libro):
+        for campo in PESOS_CAMPOS:
+            for palabra in set(tokenizar(libro.get(campo, ''))):
+                yield campo, palabra
+
+    def _prefijos_de(self, palabra):
+        for largo in range(1, min(len(palabra), self.largo_maximo_prefijo) + 1):
+            yield palabra[:largo]
+
+    # --- Consulta ---
+
+    @medido('busqueda.buscar')
+    def buscar(self, consulta, campos=None, limite=None):
+        """
+        Devuelve los libros que tienen todas las palabras de la consulta
+        (como palabra o prefijo), ordenados por relevancia.
+        """
+        with self._lock:
+            return self._buscar(consulta, campos, limite)
+
+    def _buscar(self, consulta, campos, limite):
+        campos = campos or tuple(PESOS_CAMPOS)
+        palabras = tokenizar(consulta)
+        if not palabras:
+            libros = list(self._libros.values())
+            return libros[:limite] if limite is not None else libros
+
+        clave_cache = (tuple(sorted(set(palabras))), tuple(campos), limite)
+        if clave_cache in self._cache:
+            return list(self._cache[clave_cache])
+
+        # Candidatos: intersección (en C) de los libros que tienen cada palabra
+        postings = [self._postings(palabra, campos) for palabra in set(palabras)]
+        uniones = sorted((set().union(*(ids for _, ids, _ in p)) for p in postings), key=len)
+        candidatos = uniones[0].intersection(*uniones[1:])
+        if not candidatos:
+            return []
+
+        # Solo se puntúan los candidatos: peso del campo + bono si la palabra es completa
+        puntajes = {}
+        for libro_id in candidatos:
+            puntaje = 0
+            for p in postings:
+                for peso, prefijo, exacta in p:
+                    if libro_id in prefijo:
+                        puntaje += peso + (BONO_PALABRA_EXACTA if libro_id in exacta else 0)
+            puntajes[libro_id] = puntaje
+
+        clave = lambda i: (-puntajes[i], self._orden[i])
+        if limite is not None:
+            ids = heapq.nsmallest(limite, puntajes, key=clave)
+        else:
+            ids = sorted(puntajes, key=clave)
+        resultado = [self._libros[i] for i in ids]
+        if len(candidatos) >= MINIMO_CANDIDATOS_CACHE:
+            if len(self._cache) >= MAXIMO_CONSULTAS_CACHE:
+                self._cache.pop(next(iter(self._cache)))
+            self._cache[clave_cache] = resultado
+        return list(resultado)
+
+    def _postings(self, palabra, campos):
+        """(peso, ids con el prefijo, ids con la palabra exacta) por campo."""
+        clave = palabra[:self.largo_maximo_prefijo]
+        postings = []
+        for campo in campos:
+            prefijo = self._prefijos[campo].get(clave, set())
+            if len(palabra) > self.largo_maximo_prefijo:
+                # El prefijo indexado está recortado: se confirma contra el texto
+                prefijo = {i for i in prefijo
+                           if any(p.startswith(palabra) for p in tokenizar(self._libros[i].get(campo, '')))}
+            postings.append((PESOS_CAMPOS[campo], prefijo, self._palabras[campo].get(palabra, set())))
+        return postings
@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+from .instrumentacion import contar, registrar_tiempo
+
+# --- Búsqueda diferida (debounce) y cancelable ---
+# Cada tecla reprograma la búsqueda: se espera un momento sin teclear, se
+# filtra fuera del hilo del loop y solo el resultado de la última consulta
+# llega a la UI. Una tecla nueva cancela la búsqueda que esté en curso.
+# Consultas, cancelaciones y latencias van a la instrumentación
+# (READERS_BAY_INSTRUMENTAR), bajo "busqueda_ui.*".
+
+ESPERA_DEBOUNCE = 0.2      # segundos sin teclear antes de buscar
+
+
+class BusquedaDiferida:
+    """Debounce + cancelación para un buscador, con sus latencias instrumentadas."""
+
+    def __init__(self, buscar, mostrar, espera=ESPERA_DEBOUNCE):
+        self.buscar = buscar       # consulta -> resultados (síncrona, se corre en un hilo)
+        self.mostrar = mostrar     # resultados -> None (actualiza la UI)
+        self.espera = espera
+        self._tarea = None
+        self._generacion = 0
+
+    def programar(self, consulta):
+        """Agenda la búsqueda de `consulta` cancelando la anterior. Requiere un loop activo."""
+        contar('busqueda_ui.consultas')
+        if self._tarea is not None and not self._tarea.done():
+            self._tarea.cancel()
+            contar('busqueda_ui.canceladas')
+        self._generacion += 1
+        self._tarea = asyncio.get_running_loop().create_task(
+            self._ejecutar(consulta, self._generacion, time.perf_counter()))
+        return self._tarea
+
+    async def _ejecutar(self, consulta, generacion, inicio):
+        await asyncio.sleep(self.espera)
+        inicio_filtro = time.perf_counter()
+        resultados = await asyncio.to_thread(self.buscar, consulta)
+        fin = time.perf_counter()
+        if generacion != self._generacion:
+            # Llegó otra tecla mientras filtrábamos: este resultado ya no sirve
+            return
+        registrar_tiempo('busqueda_ui.filtro', fin - inicio_filtro)
+        self.mostrar(resultados)
+        # De la tecla a la UI, con la espera del debounce incluida
+        registrar_tiempo('busqueda_ui.latencia', time.perf_counter() - inicio)
+        contar('busqueda_ui.mostradas')
@@ -0,0 +1,75 @@
+from collections import defaultdict
+
+# --- Buzón de entrada por usuario ---
+# Los compartidos se agrupan por destinatario (id de usuario) a medida que
+# se cargan o se envían, así abrir el buzón cuesta lo que tiene el buzón
+# del usuario y no lo que se compartió en todo el club. Lo leído se marca
+# con el id del último compartido que vio cada usuario: el repositorio
+# guarda esas marcas, y los no leídos son los que tienen un id mayor.
+
+TAMAÑO_PAGINA_BUZON = 20
+
+
+class Buzones:
+    """Mensajes por destinatario, en orden de llegada, con contador de no leídos."""
+
+    def __init__(self, compartidos=(), id_por_nombre=None, leidos=None):
+        # Los compartidos viejos de interfaz.py solo traen el nombre del destinatario
+        self._id_por_nombre = id_por_nombre or (lambda nombre: None)
+        self._mensajes = defaultdict(list)
+        self._leidos = dict(leidos or {})   # usuario_id -> id del último compartido visto
+        self._sin_leer = defaultdict(int)
+        self._ultimo_id = {}                # usuario_id -> id mayor de su buzón
+        for comp in compartidos:
+            self.agregar(comp)
+
+    def destinatario_de(self, comp):
+        usuario_id = comp.get('a_usuario_id')
+        if usuario_id is None and comp.get('destinatario'):
+            usuario_id = self._id_por_nombre(comp['destinatario'])
+        return usuario_id
+
+    def agregar(self, comp):
+        """Agrega un compartido al buzón de su destinatario (O(1))."""
+        usuario_id = self.destinatario_de(comp)
+        if usuario_id is None:
+            return
+        self._mensajes[usuario_id].append(comp)
+        id_ = comp.get('id') or 0
+        self._ultimo_id[usuario_id] = max(self._ultimo_id.get(usuario_id, 0), id_)
+        if id_ > self._leidos.get(usuario_id, 0):
+            self._sin_leer[usuario_id] += 1
+
+    def pagina(self, usuario_id, numero=0, tamaño=TAMAÑO_PAGINA_BUZON):
+        """Página `numero` del buzón, de los más nuevos a los más viejos."""
+        mensajes = self._mensajes.get(usuario_id, [])
+        fin = len(mensajes) - numero * tamaño
+        if fin <= 0:
+            return []
+        return mensajes[max(0, fin - tamaño):fin][::-1]
+
+    def total(self, usuario_id):
+        return len(self._mensajes.get(usuario_id, ()))
+
+    def no_leidos(self, usuario_id):
+        return self._sin_leer.get(usuario_id, 0)
+
+    def marcar_leidos(self, usuario_id):
+        """
+        Marca todo el buzón como leído. Devuelve la marca nueva para
+        guardarla, o None si no cambió.
+        """
+        ultimo = self._ultimo_id.get(usuario_id, 0)
+        if ultimo <= self._leidos.get(usuario_id, 0):
+            return None
+        self._leidos[usuario_id] = ultimo
+        self._sin_leer.pop(usuario_id, None)
+        return ultimo
+
+    def fijar_leido(self, usuario_id, ultimo_id):
+        """Aplica una marca guardada por otro proceso (no retrocede) y recuenta."""
+        if ultimo_id <= self._leidos.get(usuario_id, 0):
+            return
+        self._leidos[usuario_id] = ultimo_id
+        self._sin_leer[usuario_id] = sum(1 for comp in self._mensajes.get(usuario_id, ())
+                                         if (comp.get('id') or 0) > ultimo_id)
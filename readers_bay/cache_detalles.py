@@ -0,0 +1,76 @@
+import os
+import threading
+from collections import OrderedDict
+
+# --- Caché de vistas de detalle ---
+# La vista de detalle de un libro une reseñas con nombres de usuario, el
+# resumen de calificaciones y los compartidos con remitente y destinatario.
+# Los libros populares se abren una y otra vez: el detalle ya armado queda
+# en una caché LRU acotada por libro_id. El repositorio la invalida al
+# guardar una reseña o un compartido de ese libro (propio o de otro
+# proceso), y la vacía si cambia el nombre de un usuario.
+
+TAMAÑO_CACHE_DETALLES = int(os.environ.get('READERS_BAY_CACHE_DETALLES', 256))
+
+
+class CacheDetalles:
+    """Detalles de libro ya armados, los menos usados salen primero."""
+
+    def __init__(self, tamaño=TAMAÑO_CACHE_DETALLES):
+        self.tamaño = tamaño
+        self._detalles = OrderedDict()
+        self._lock = threading.Lock()
+        # Sube con cada invalidación: un detalle armado mientras tanto ya
+        # puede estar viejo y no se guarda
+        self._version = 0
+        self.aciertos = self.fallos = self.invalidaciones = self.desalojos = 0
+
+    def obtener(self, libro_id, armar):
+        """
+        El detalle del libro, desde la caché o con armar() (que lo devuelve
+        o None si no existe). Es compartido: quien lo use no lo modifica.
+        """
+        with self._lock:
+            detalle = self._detalles.get(libro_id)
+            if detalle is not None:
+                self._detalles.move_to_end(libro_id)
+                self.aciertos += 1
+                return detalle
+            self.fallos += 1
+            version = self._version
+        detalle = armar()
+        if detalle is None or self.tamaño <= 0:
+            return detalle
+        with self._lock:
+            if version == self._version:
+                self._detalles[libro_id] = detalle
+                self._detalles.move_to_end(libro_id)
+                while len(self._detalles) > self.tamaño:
+                    self._detalles.popitem(last=False)
+                    self.desalojos += 1
+        return detalle
+
+    def invalidar(self, libro_id):
+        with self._lock:
+            self._version += 1
+            if self._detalles.pop(libro_id, None) is not None:
+                self.invalidaciones += 1
+
+    def vaciar(self):
+        with self._lock:
+            self._version += 1
+            self.invalidaciones += len(self._detalles)
+            self._detalles.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': self.aciertos / consultas if consultas else 0.0,
+                'invalidaciones': self.invalidaciones,
+                'desalojos': self.desalojos,
+                'entradas': len(self._detalles),
+                'capacidad': self.tamaño,
+            }
@@ -0,0 +1,234 @@
+import json
+import os
+import threading
+
+from .registros import a_json
+
+# --- Lectura incremental de los archivos JSON ---
+# json.load necesita todo el texto del archivo en memoria antes de devolver
+# el primer registro. iterar_json lee por bloques y va entregando cada
+# elemento del arreglo apenas está completo, así la memoria extra queda
+# acotada al bloque + el registro en curso. EscrituraArregloJSON es el camino
+# inverso: escribe un arreglo elemento por elemento.
+
+TAMAÑO_BLOQUE = 64 * 1024
+_ESPACIOS = ' \t\n\r'
+_ESPACIOS_BYTES = _ESPACIOS.encode('ascii')
+
+
+def iterar_json(ruta, tamaño_bloque=TAMAÑO_BLOQUE):
+    """Genera los elementos de un archivo con un arreglo JSON, uno por uno."""
+    try:
+        archivo = open(ruta, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        return
+    decodificador = json.JSONDecoder()
+    with archivo:
+        buffer = ''
+        pos = 0
+        fin_archivo = False
+
+        def rellenar():
+            nonlocal buffer, pos, fin_archivo
+            bloque = archivo.read(tamaño_bloque)
+            if not bloque:
+                fin_archivo = True
+            buffer = buffer[pos:] + bloque
+            pos = 0
+
+        def siguiente_caracter():
+            # Salta espacios; devuelve el próximo carácter o '' al final
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in _ESPACIOS:
+                    pos += 1
+                if pos < len(buffer) or fin_archivo:
+                    return buffer[pos] if pos < len(buffer) else ''
+                rellenar()
+
+        if siguiente_caracter() != '[':
+            return
+        pos += 1
+        if siguiente_caracter() == ']':
+            return
+
+        while True:
+            if not siguiente_caracter():
+                return
+            try:
+                elemento, fin = decodificador.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if fin_archivo:
+                    return  # archivo truncado o inválido: se entrega lo leído
+                rellenar()
+                continue
+            if fin == len(buffer) and not fin_archivo:
+                # Podría ser un número cortado por el bloque: se confirma con más texto
+                rellenar()
+                continue
+            pos = fin
+            yield elemento
+
+            separador = siguiente_caracter()
+            if separador != ',':
+                return  # ']' (fin del arreglo) o archivo inválido
+            pos += 1
+
+
+class EscrituraArregloJSON:
+    """
+    Escribe un arreglo JSON de a un elemento en un archivo temporal que
+    reemplaza a `ruta` al cerrar el with (nunca queda a medias). Con
+    conservar=True primero van los elementos que ya tenía el archivo,
+    copiados como texto por bloques, sin decodificarlos.
+    """
+
+    def __init__(self, ruta, conservar=False, indentar=4, tamaño_bloque=TAMAÑO_BLOQUE):
+        self.ruta = ruta
+        self.temporal = ruta + '.tmp'
+        self.conservar = conservar
+        self.indentar = indentar
+        self.tamaño_bloque = tamaño_bloque
+        self.escritos = 0
+        self._archivo = None
+        self._vacio = True
+
+    def __enter__(self):
+        self._archivo = open(self.temporal, 'wb')
+        try:
+            self._archivo.write(b'[')
+            if self.conservar:
+                self._copiar_existente()
+        except BaseException:
+            self._descartar()
+            raise
+        return self
+
+    def escribir(self, elemento):
+        texto = json.dumps(elemento, ensure_ascii=False, indent=self.indentar, default=a_json)
+        if self.indentar:
+            texto = ' ' * self.indentar + texto.replace('\n', '\n' + ' ' * self.indentar)
+        self._archivo.write(('\n' if self._vacio else ',\n').encode('utf-8') + texto.encode('utf-8'))
+        self._vacio = False
+        self.escritos += 1
+
+    def __exit__(self, tipo, valor, traza):
+        if tipo is not None:
+            self._descartar()
+            return
+        self._archivo.write(b']\n' if self._vacio else b'\n]\n')
+        self._archivo.flush()
+        os.fsync(self._archivo.fileno())
+        self._archivo.close()
+        os.replace(self.temporal, self.ruta)
+
+    def _descartar(self):
+        self._archivo.close()
+        if os.path.exists(self.temporal):
+            os.remove(self.temporal)
+
+    def _copiar_existente(self):
+        try:
+            original = open(self.ruta, 'rb')
+        except FileNotFoundError:
+            return
+        with original:
+            largo = os.fstat(original.fileno()).st_size
+            apertura = self._primer_caracter(original, 0, largo)
+            cierre = self._ultimo_caracter(original, largo)
+            if apertura < 0:
+                return  # archivo vacío
+            if not self._es(original, apertura, b'[') or not self._es(original, cierre, b']'):
+                raise ValueError(f"{self.ruta} no tiene un arreglo JSON")
+            inicio = self._primer_caracter(original, apertura + 1, cierre)
+            if inicio < 0:
+                return  # arreglo vacío
+            fin = self._ultimo_caracter(original, cierre) + 1
+            original.seek(inicio)
+            self._archivo.write(b'\n')
+            restante = fin - inicio
+            while restante:
+                bloque = original.read(min(self.tamaño_bloque, restante))
+                if not bloque:
+                    raise ValueError(f"{self.ruta} cambió mientras se copiaba")
+                self._archivo.write(bloque)
+                restante -= len(bloque)
+            self._vacio = False
+
+    def _primer_caracter(self, archivo, inicio, fin):
+        # Posición del primer byte que no es espacio en [inicio, fin), o -1
+        while inicio < fin:
+            archivo.seek(inicio)
+            bloque = archivo.read(min(self.tamaño_bloque, fin - inicio))
+            sin_espacios = bloque.lstrip(_ESPACIOS_BYTES)
+            if sin_espacios:
+                return inicio + len(bloque) - len(sin_espacios)
+            inicio += len(bloque)
+        return -1
+
+    def _ultimo_caracter(self, archivo, fin):
+        # Posición del último byte que no es espacio antes de fin, o -1
+        while fin > 0:
+            inicio = max(fin - self.tamaño_bloque, 0)
+            archivo.seek(inicio)
+            sin_espacios = archivo.read(fin - inicio).rstrip(_ESPACIOS_BYTES)
+            if sin_espacios:
+                return inicio + len(sin_espacios) - 1
+            fin = inicio
+        return -1
+
+    @staticmethod
+    def _es(archivo, posicion, caracter):
+        archivo.seek(posicion)
+        return archivo.read(1) == caracter
+
+
+class CargaCatalogo:
+    """
+    Recorre un iterable de libros en un hilo aparte y avisa a los
+    suscriptores por lotes, para que la UI muestre la primera página
+    antes de que termine la lectura.
+    """
+
+    def __init__(self, libros, al_libro, primer_lote=30, tamaño_lote=5000):
+        self._libros = libros          # iterable (p. ej. repo.iterar_libros())
+        self._al_libro = al_libro      # se llama con cada libro leído
+        self.primer_lote = primer_lote
+        self.tamaño_lote = tamaño_lote
+        self.leidos = 0
+        self.terminada = threading.Event()
+        self._suscriptores = []
+        self._lock = threading.Lock()
+
+    def suscribir(self, funcion):
+        """funcion() se llama tras cada lote y al terminar (desde el hilo de carga)."""
+        with self._lock:
+            self._suscriptores.append(funcion)
+
+    def desuscribir(self, funcion):
+        with self._lock:
+            if funcion in self._suscriptores:
+                self._suscriptores.remove(funcion)
+
+    def iniciar(self):
+        threading.Thread(target=self._cargar, daemon=True).start()
+        return self
+
+    def _cargar(self):
+        proximo_aviso = self.primer_lote
+        try:
+            for libro in self._libros:
+                self._al_libro(libro)
+                self.leidos += 1
+                if self.leidos >= proximo_aviso:
+                    self._avisar()
+                    proximo_aviso = self.leidos + self.tamaño_lote
+        finally:
+            self.terminada.set()
+            self._avisar()
+
+    def _avisar(self):
+        with self._lock:
+            suscriptores = list(self._suscriptores)
+        for funcion in suscriptores:
+            funcion()
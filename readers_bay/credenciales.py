@@ -0,0 +1,114 @@
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+from collections import OrderedDict
+
+# --- Contraseñas con hash y login ---
+# Las contraseñas se guardan como PBKDF2-SHA256 con sal propia:
+#   "pbkdf2_sha256$<iteraciones>$<sal hex>$<hash hex>"
+# Las que siguen en texto plano (datos viejos) se aceptan y se convierten al
+# primer login correcto. El costo se ajusta con READERS_BAY_ITERACIONES.
+
+ALGORITMO = 'pbkdf2_sha256'
+ITERACIONES = int(os.environ.get('READERS_BAY_ITERACIONES', 200_000))
+LARGO_SAL = 16
+TAMAÑO_CACHE_VERIFICACIONES = 1024
+
+
+class UsuarioDuplicado(ValueError):
+    """Ya existe otro usuario con ese nombre (sin distinguir mayúsculas)."""
+
+
+def clave_nombre(nombre):
+    """Forma en que se comparan los nombres de usuario."""
+    return str(nombre).strip().casefold()
+
+
+def es_hash(guardado):
+    return isinstance(guardado, str) and guardado.startswith(ALGORITMO + '$')
+
+
+class Credenciales:
+    """
+    Hashea y verifica contraseñas. Las verificaciones correctas quedan en
+    una caché acotada, así volver a entrar en la misma sesión no paga otra
+    vez el costo del hash.
+    """
+
+    def __init__(self, iteraciones=ITERACIONES, tamaño_cache=TAMAÑO_CACHE_VERIFICACIONES):
+        self.iteraciones = iteraciones
+        self.tamaño_cache = tamaño_cache
+        # La caché guarda HMACs con una clave que solo vive en este proceso
+        self._clave_cache = secrets.token_bytes(32)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._hash_señuelo = None
+
+    def hashear(self, password, iteraciones=None):
+        iteraciones = iteraciones or self.iteraciones
+        sal = secrets.token_bytes(LARGO_SAL)
+        derivado = hashlib.pbkdf2_hmac('sha256', str(password).encode('utf-8'), sal, iteraciones)
+        return f"{ALGORITMO}${iteraciones}${sal.hex()}${derivado.hex()}"
+
+    def verificar(self, guardado, password):
+        if guardado is None:
+            return False
+        password = str(password)
+        if not es_hash(guardado):
+            # Texto plano de los datos viejos (a veces guardado como número)
+            return hmac.compare_digest(str(guardado).encode('utf-8'), password.encode('utf-8'))
+
+        clave = hmac.new(self._clave_cache, f"{guardado}\0{password}".encode('utf-8'),
+                         hashlib.sha256).digest()
+        with self._lock:
+            if clave in self._cache:
+                self._cache.move_to_end(clave)
+                return True
+
+        try:
+            _, iteraciones, sal, esperado = guardado.split('$')
+            derivado = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'),
+                                           bytes.fromhex(sal), int(iteraciones))
+        except ValueError:
+            return False
+        if not hmac.compare_digest(derivado.hex(), esperado):
+            return False
+
+        with self._lock:
+            self._cache[clave] = True
+            if len(self._cache) > self.tamaño_cache:
+                self._cache.popitem(last=False)
+        return True
+
+    def necesita_rehash(self, guardado):
+        """True si está en texto plano o con menos iteraciones que las actuales."""
+        if not es_hash(guardado):
+            return True
+        try:
+            return int(guardado.split('$')[1]) < self.iteraciones
+        except (IndexError, ValueError):
+            return True
+
+    def autenticar(self, repo, nombre, password):
+        """Devuelve el usuario si nombre y contraseña coinciden, si no None."""
+        usuario = repo.usuario_por_nombre(nombre)
+        if usuario is None:
+            # Un nombre inexistente cuesta lo mismo que uno existente
+            if self._hash_señuelo is None:
+                self._hash_señuelo = self.hashear(secrets.token_hex(8))
+            self.verificar(self._hash_señuelo, password)
+            return None
+        if not self.verificar(usuario.get('password'), password):
+            return None
+        if self.necesita_rehash(usuario.get('password')):
+            usuario['password'] = self.hashear(password)
+            repo.guardar_usuario(usuario)
+        return usuario
+
+    def registrar(self, repo, usuario):
+        """Guarda un usuario nuevo con la contraseña hasheada (UsuarioDuplicado si el nombre existe)."""
+        usuario = dict(usuario)
+        usuario['password'] = self.hashear(usuario.get('password', ''))
+        return repo.guardar_usuario(usuario)
@@ -0,0 +1,97 @@
+import atexit
+import threading
+from collections import OrderedDict
+
+# --- Escritura en segundo plano ---
+# Los guardados se encolan y un hilo aparte los pasa a disco, así quien
+# guarda (un evento de la UI, un prompt de main.py) no espera al disco.
+# Si un registro se guarda varias veces antes de que el hilo lo escriba,
+# solo se escribe la última versión, y lo pendiente de un mismo archivo
+# se escribe en una sola operación.
+
+MAXIMO_PENDIENTES = 10_000
+
+
+class EscritorFondo:
+    """
+    Cola acotada de escrituras. Cada destino debe tener un método
+    escribir_lote(lista) (p. ej. AlmacenLog); `clave` identifica el
+    registro para combinar escrituras repetidas.
+    """
+
+    def __init__(self, maximo_pendientes=MAXIMO_PENDIENTES):
+        self.maximo_pendientes = maximo_pendientes
+        self._pendientes = OrderedDict()   # (destino, clave) -> datos
+        self._escribiendo = False
+        self._cerrado = False
+        self._cond = threading.Condition()
+        self._metricas = {'encoladas': 0, 'combinadas': 0, 'escritas': 0, 'lotes': 0,
+                          'errores': 0, 'profundidad_maxima': 0}
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+        atexit.register(self.cerrar)
+
+    def enviar(self, destino, clave, datos):
+        """Encola una escritura. Si la cola está llena, espera a que haya lugar."""
+        with self._cond:
+            if self._cerrado:
+                raise RuntimeError("El escritor está cerrado")
+            clave = (destino, clave if clave is not None else object())
+            self._metricas['encoladas'] += 1
+            while clave not in self._pendientes and len(self._pendientes) >= self.maximo_pendientes:
+                self._cond.wait()
+            if clave in self._pendientes:
+                self._pendientes[clave] = datos
+                self._metricas['combinadas'] += 1
+                return
+            self._pendientes[clave] = datos
+            self._metricas['profundidad_maxima'] = max(self._metricas['profundidad_maxima'],
+                                                       len(self._pendientes))
+            self._cond.notify_all()
+
+    def _bucle(self):
+        while True:
+            with self._cond:
+                while not self._pendientes and not self._cerrado:
+                    self._cond.wait()
+                if not self._pendientes:
+                    return
+                lote, self._pendientes = self._pendientes, OrderedDict()
+                self._escribiendo = True
+                self._cond.notify_all()   # hay lugar en la cola
+
+            por_destino = {}
+            for (destino, _), datos in lote.items():
+                por_destino.setdefault(destino, []).append(datos)
+            errores = 0
+            for destino, datos in por_destino.items():
+                try:
+                    destino.escribir_lote(datos)
+                except Exception as e:
+                    errores += 1
+                    print(f"Error al guardar: {e}")
+
+            with self._cond:
+                self._escribiendo = False
+                self._metricas['escritas'] += len(lote)
+                self._metricas['lotes'] += 1
+                self._metricas['errores'] += errores
+                self._cond.notify_all()
+
+    def vaciar(self, espera=None):
+        """Espera a que todo lo encolado esté escrito. Devuelve False si se agotó la espera."""
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: (not self._pendientes and not self._escribiendo) or not self._hilo.is_alive(),
+                espera)
+
+    def metricas(self):
+        with self._cond:
+            return dict(self._metricas, profundidad=len(self._pendientes))
+
+    def cerrar(self):
+        """Escribe lo pendiente y detiene el hilo."""
+        with self._cond:
+            self._cerrado = True
+            self._cond.notify_all()
+        self._hilo.join()
@@ -0,0 +1,396 @@
+import csv
+import datetime
+import itertools
+import json
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+from .agregados import rating_numerico
+from .carga_streaming import EscrituraArregloJSON, iterar_json
+from .instrumentacion import medido
+from .registros import Libro, Reseña, a_json
+
+# --- Importación y exportación masiva ---
+# Libros y reseñas desde archivos CSV, JSONL (un objeto por línea) o JSON
+# (un arreglo), sin tener el archivo completo en memoria:
+#
+#   1. El archivo se lee por lotes de TAMAÑO_LOTE_IMPORTACION registros.
+#   2. Un pool de procesos decodifica y valida cada lote: campos
+#      obligatorios, tipos y el rating de 1 a 5 de guardar_reseña. Hay a lo
+#      sumo LOTES_POR_PROCESO lotes por proceso en vuelo, así la memoria no
+#      depende del tamaño del archivo.
+#   3. El proceso principal revisa las referencias (que existan el libro y
+#      el usuario de cada reseña, que no se repita el id de un libro, que
+#      el id de una reseña sea de una que ya existe) y
+#      entrega el lote al repositorio, que lo guarda y lo indexa de una vez
+#      (ver Repositorio.importacion).
+#
+# Los registros inválidos no frenan la importación: se informan con su
+# número de línea (en un arreglo JSON, su posición). exportar() hace el
+# camino inverso, registro por registro.
+#
+#   python -m readers_bay.importacion importar reseñas nuevas.csv --datos data
+#   python -m readers_bay.importacion exportar libros catalogo.jsonl --datos data
+#
+# Los procesos del pool arrancan con spawn: un script que llame a importar()
+# necesita el `if __name__ == "__main__":` de siempre.
+
+TAMAÑO_LOTE_IMPORTACION = 5000
+LOTES_POR_PROCESO = 2
+# Archivos más chicos se validan en el mismo proceso: arrancar el pool cuesta más
+MINIMO_BYTES_POOL = 1 << 20
+MAXIMO_ERRORES_INFORMADOS = 100
+
+FORMATOS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.json': 'json'}
+CAMPOS = {'libros': Libro.CAMPOS, 'reseñas': Reseña.CAMPOS}
+
+
+def formato_de(ruta):
+    """'csv', 'jsonl' o 'json' según la extensión del archivo."""
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension not in FORMATOS:
+        raise ValueError(f"Formato desconocido para {ruta} (se espera .csv, .jsonl o .json)")
+    return FORMATOS[extension]
+
+
+# --- Validación (corre en los procesos del pool) ---
+
+def _entero(datos, campo, obligatorio=False):
+    valor = datos.get(campo)
+    if valor is None or valor == '':
+        if obligatorio:
+            raise ValueError(f"Falta '{campo}'")
+        return None
+    # int() aceptaría True o 4.7 (truncado): se rechazan
+    if isinstance(valor, bool) or (isinstance(valor, float) and not valor.is_integer()):
+        raise ValueError(f"'{campo}' debe ser un número entero")
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{campo}' debe ser un número entero") from None
+
+
+def _texto(datos, campo, obligatorio=False):
+    valor = datos.get(campo)
+    if isinstance(valor, str):
+        valor = valor.strip()
+    if valor is None or valor == '':
+        if obligatorio:
+            raise ValueError(f"Falta '{campo}'")
+        return None
+    if not isinstance(valor, str):
+        raise ValueError(f"'{campo}' debe ser texto")
+    return valor
+
+
+def _validar_libro(datos):
+    libro = {'id': _entero(datos, 'id'),
+             'titulo': _texto(datos, 'titulo', obligatorio=True),
+             'autor': _texto(datos, 'autor', obligatorio=True),
+             'anio': _entero(datos, 'anio'),
+             'genero': _texto(datos, 'genero')}
+    return {campo: valor for campo, valor in libro.items() if valor is not None}
+
+
+def _validar_reseña(datos):
+    reseña = {'id': _entero(datos, 'id'),
+              'libro_id': _entero(datos, 'libro_id', obligatorio=True),
+              'usuario_id': _entero(datos, 'usuario_id', obligatorio=True)}
+    if datos.get('rating') in (None, ''):
+        raise ValueError("Falta 'rating'")
+    try:
+        rating = rating_numerico(_entero(datos, 'rating'))
+    except ValueError:
+        rating = None
+    if rating is None:
+        raise ValueError("El rating debe ser un número entre 1 y 5")
+    reseña['rating'] = rating
+    # El texto se guarda tal cual (guardar_reseña no lo recorta). Sin texto
+    # o sin fecha no se completan acá: si la reseña ya existe se conservan
+    # los guardados, y si es nueva los completa el repositorio
+    texto = datos.get('texto')
+    if texto is not None and not isinstance(texto, str):
+        raise ValueError("'texto' debe ser texto")
+    reseña['texto'] = texto
+    fecha = _texto(datos, 'fecha')
+    if fecha is not None:
+        try:
+            datetime.date.fromisoformat(fecha)
+        except ValueError:
+            raise ValueError("'fecha' debe tener el formato AAAA-MM-DD") from None
+    reseña['fecha'] = fecha
+    return {campo: valor for campo, valor in reseña.items() if valor is not None}
+
+
+_VALIDADORES = {'libros': _validar_libro, 'reseñas': _validar_reseña}
+
+
+def _decodificar(formato, cabecera, crudo):
+    if formato == 'csv':
+        try:
+            fila = next(csv.reader([crudo], strict=True))
+        except csv.Error as e:
+            raise ValueError(f"CSV inválido: {e}") from None
+        if len(fila) > len(cabecera):
+            raise ValueError(f"La fila tiene {len(fila)} columnas y la cabecera {len(cabecera)}")
+        return dict(zip(cabecera, fila))
+    if formato == 'jsonl':
+        try:
+            crudo = json.loads(crudo)
+        except ValueError as e:
+            raise ValueError(f"JSON inválido: {getattr(e, 'msg', e)}") from None
+    if not isinstance(crudo, dict):
+        raise ValueError("Se esperaba un objeto JSON")
+    return crudo
+
+
+def _procesar_lote(trabajo):
+    """Decodifica y valida un lote. Devuelve ([(línea, registro)], [(línea, error)])."""
+    coleccion, formato, cabecera, registros = trabajo
+    validar = _VALIDADORES[coleccion]
+    validos, errores = [], []
+    for numero, crudo in registros:
+        try:
+            validos.append((numero, validar(_decodificar(formato, cabecera, crudo))))
+        except ValueError as e:
+            errores.append((numero, str(e)))
+    return validos, errores
+
+
+# --- Lectura por lotes ---
+
+def _registros_csv(archivo):
+    # Un registro ocupa varias líneas si tiene saltos dentro de comillas:
+    # se juntan líneas hasta que las comillas queden parejas ("" cuenta 2)
+    texto, inicio, comillas = '', 0, 0
+    for numero, linea in enumerate(archivo, 1):
+        if not texto:
+            inicio = numero
+        texto += linea
+        comillas += linea.count('"')
+        if comillas % 2 == 0:
+            if texto.strip():
+                yield inicio, texto
+            texto, comillas = '', 0
+    if texto.strip():
+        yield inicio, texto  # comillas sin cerrar: lo informa la validación
+
+
+def _trabajos(ruta, coleccion, formato, tamaño_lote):
+    """Genera los lotes a validar: (colección, formato, cabecera, [(línea, crudo)])."""
+    if formato == 'json':
+        registros = enumerate(iterar_json(ruta), 1)
+        cabecera = None
+        archivo = nullcontext()
+    else:
+        archivo = open(ruta, encoding='utf-8-sig', newline='' if formato == 'csv' else None)
+    with archivo:
+        if formato == 'csv':
+            registros = _registros_csv(archivo)
+            primera = next(registros, None)
+            cabecera = next(csv.reader([primera[1]])) if primera else []
+            cabecera = [columna.strip() for columna in cabecera]
+            obligatorias = {'libros': ('titulo', 'autor'),
+                            'reseñas': ('libro_id', 'usuario_id', 'rating')}[coleccion]
+            faltan = [columna for columna in obligatorias if columna not in cabecera]
+            if faltan:
+                raise ValueError(f"Faltan columnas en la cabecera de {ruta}: {', '.join(faltan)}")
+        elif formato == 'jsonl':
+            registros = ((numero, linea) for numero, linea in enumerate(archivo, 1) if linea.strip())
+            cabecera = None
+        while True:
+            lote = list(itertools.islice(registros, tamaño_lote))
+            if not lote:
+                return
+            yield coleccion, formato, cabecera, lote
+
+
+def _en_paralelo(funcion, trabajos, procesos):
+    """funcion(trabajo) para cada trabajo, en orden, con pocos trabajos en vuelo."""
+    if procesos <= 1:
+        yield from map(funcion, trabajos)
+        return
+    # spawn: el repositorio tiene hilos propios y fork con hilos no es seguro
+    with ProcessPoolExecutor(procesos, mp_context=multiprocessing.get_context('spawn')) as pool:
+        en_vuelo = deque()
+        for trabajo in trabajos:
+            en_vuelo.append(pool.submit(funcion, trabajo))
+            if len(en_vuelo) >= procesos * LOTES_POR_PROCESO:
+                yield en_vuelo.popleft().result()
+        while en_vuelo:
+            yield en_vuelo.popleft().result()
+
+
+# --- Importación ---
+
+def _verificar_referencias(repo, coleccion, validos, vistos):
+    """
+    Separa los registros que apuntan a algo que no existe, repiten el id
+    de un libro (del repositorio o de este mismo archivo, en `vistos`) o
+    traen el id de una reseña que no existe o es de otro libro o usuario.
+    """
+    errores = []
+    if coleccion == 'libros':
+        ids = [libro['id'] for _, libro in validos if 'id' in libro]
+        existentes = repo.ids_existentes('libros', ids) | vistos.intersection(ids)
+        aceptados = []
+        for numero, libro in validos:
+            id_ = libro.get('id')
+            if id_ is not None:
+                if id_ in existentes:
+                    errores.append((numero, f"Ya existe el libro {id_}"))
+                    continue
+                existentes.add(id_)
+                vistos.add(id_)
+            aceptados.append((numero, libro))
+        return aceptados, errores
+
+    libros = repo.ids_existentes('libros', {reseña['libro_id'] for _, reseña in validos})
+    usuarios = repo.ids_existentes('usuarios', {reseña['usuario_id'] for _, reseña in validos})
+    # Un id solo sirve para actualizar una reseña que ya existe, del mismo
+    # libro y usuario: los ids nuevos los reparte el repositorio, que así no
+    # choca con los que asignen otros procesos
+    guardadas = repo.reseñas_por_id({reseña['id'] for _, reseña in validos if 'id' in reseña})
+    aceptados = []
+    for numero, reseña in validos:
+        guardada = guardadas.get(reseña.get('id'))
+        if reseña['libro_id'] not in libros:
+            errores.append((numero, f"No existe el libro {reseña['libro_id']}"))
+        elif reseña['usuario_id'] not in usuarios:
+            errores.append((numero, f"No existe el usuario {reseña['usuario_id']}"))
+        elif 'id' in reseña and guardada is None:
+            errores.append((numero, f"No existe la reseña {reseña['id']} (las nuevas van sin id)"))
+        elif guardada is not None and (guardada['libro_id'], guardada.get('usuario_id')) != \
+                (reseña['libro_id'], reseña['usuario_id']):
+            errores.append((numero, f"La reseña {reseña['id']} es de otro libro o usuario"))
+        else:
+            aceptados.append((numero, reseña))
+    return aceptados, errores
+
+
+@medido('importacion.importar')
+def importar(repo, coleccion, ruta, formato=None, procesos=None, solo_validar=False,
+             tamaño_lote=TAMAÑO_LOTE_IMPORTACION):
+    """
+    Importa los libros o reseñas de un archivo CSV, JSONL o JSON. Devuelve
+    el resumen {'leidos', 'validos', 'importados', 'actualizados',
+    'rechazados', 'errores': [{'linea', 'error'}, ...]}. Con solo_validar
+    no guarda nada.
+    """
+    if coleccion not in CAMPOS:
+        raise ValueError(f"No se puede importar '{coleccion}'")
+    formato = formato or formato_de(ruta)
+    if procesos is None:
+        procesos = (os.cpu_count() or 1) if os.path.getsize(ruta) >= MINIMO_BYTES_POOL else 1
+
+    resumen = {'leidos': 0, 'validos': 0, 'importados': 0, 'actualizados': 0, 'rechazados': 0,
+               'errores': []}
+
+    def rechazar(errores):
+        resumen['rechazados'] += len(errores)
+        lugar = MAXIMO_ERRORES_INFORMADOS - len(resumen['errores'])
+        resumen['errores'].extend({'linea': numero, 'error': error} for numero, error in errores[:lugar])
+
+    trabajos = _trabajos(ruta, coleccion, formato, tamaño_lote)
+    vistos = set()
+    with nullcontext(None) if solo_validar else repo.importacion(coleccion) as insertar:
+        for validos, errores in _en_paralelo(_procesar_lote, trabajos, procesos):
+            resumen['leidos'] += len(validos) + len(errores)
+            validos, errores_referencias = _verificar_referencias(repo, coleccion, validos, vistos)
+            # En el orden del archivo
+            rechazar(sorted(errores + errores_referencias))
+            resumen['validos'] += len(validos)
+            if insertar is not None and validos:
+                nuevos, actualizados = insertar([registro for _, registro in validos])
+                resumen['importados'] += nuevos
+                resumen['actualizados'] += actualizados
+    return resumen
+
+
+# --- Exportación ---
+
+@medido('importacion.exportar')
+def exportar(repo, coleccion, ruta, formato=None):
+    """
+    Escribe todos los libros o reseñas en un archivo CSV, JSONL o JSON, de
+    a un registro (memoria constante). Devuelve cuántos escribió.
+    """
+    if coleccion not in CAMPOS:
+        raise ValueError(f"No se puede exportar '{coleccion}'")
+    formato = formato or formato_de(ruta)
+    registros = repo.iterar_libros() if coleccion == 'libros' else repo.iterar_reseñas()
+
+    if formato == 'json':
+        with EscrituraArregloJSON(ruta, indentar=None) as archivo:
+            for registro in registros:
+                archivo.escribir(registro)
+        return archivo.escritos
+
+    # Archivo temporal y reemplazo, como los demás archivos de datos
+    temporal = ruta + '.tmp'
+    escritos = 0
+    try:
+        with open(temporal, 'w', encoding='utf-8', newline='' if formato == 'csv' else None) as f:
+            if formato == 'csv':
+                escritor = csv.DictWriter(f, CAMPOS[coleccion], extrasaction='ignore')
+                escritor.writeheader()
+                for registro in registros:
+                    escritor.writerow(registro)
+                    escritos += 1
+            else:
+                for registro in registros:
+                    f.write(json.dumps(registro, ensure_ascii=False, default=a_json) + '\n')
+                    escritos += 1
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    return escritos
+
+
+def main(argv=None):
+    import argparse
+
+    from .repositorio import abrir_repositorio
+
+    parser = argparse.ArgumentParser(description="Importa o exporta libros y reseñas en CSV, JSONL o JSON.")
+    parser.add_argument('accion', choices=('importar', 'exportar'))
+    parser.add_argument('coleccion', choices=tuple(CAMPOS))
+    parser.add_argument('archivo')
+    parser.add_argument('--datos', default='data')
+    parser.add_argument('--backend', choices=('json', 'sqlite'))
+    parser.add_argument('--formato', choices=('csv', 'jsonl', 'json'),
+                        help="Por defecto, según la extensión del archivo")
+    parser.add_argument('--procesos', type=int, help="Procesos para validar (por defecto, uno por CPU)")
+    parser.add_argument('--validar', action='store_true', help="Solo valida, no guarda nada")
+    args = parser.parse_args(argv)
+
+    repo = abrir_repositorio(args.datos, args.backend)
+    try:
+        if args.accion == 'exportar':
+            escritos = exportar(repo, args.coleccion, args.archivo, args.formato)
+            print(f"{escritos} {args.coleccion} exportados a {args.archivo}")
+            return
+        resumen = importar(repo, args.coleccion, args.archivo, args.formato, args.procesos, args.validar)
+    finally:
+        repo.cerrar()
+
+    if args.validar:
+        print(f"{resumen['validos']} válidos y {resumen['rechazados']} rechazados de {resumen['leidos']} leídos")
+    else:
+        print(f"{resumen['importados']} nuevos, {resumen['actualizados']} actualizados y "
+              f"{resumen['rechazados']} rechazados de {resumen['leidos']} leídos")
+    for error in resumen['errores']:
+        print(f"  línea {error['linea']}: {error['error']}")
+    if resumen['rechazados'] > len(resumen['errores']):
+        print(f"  ... y {resumen['rechazados'] - len(resumen['errores'])} errores más")
+    if args.coleccion == 'reseñas' and resumen['importados'] + resumen['actualizados']:
+        print(f"Para actualizar las recomendaciones: python -m readers_bay.recomendaciones --datos {args.datos}")
+
+
+if __name__ == "__main__":
+    main()
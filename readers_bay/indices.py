@@ -0,0 +1,93 @@
+from collections import defaultdict
+
+from .credenciales import clave_nombre
+
+# --- Índices en memoria ---
+# Evitan recorrer las listas completas en cada búsqueda. Los registros
+# indexados son los mismos diccionarios de las listas, así que editar una
+# reseña "en su lugar" no desincroniza el índice.
+
+class IndiceDatos:
+    """Mapas de acceso directo sobre libros, usuarios, reseñas y compartidos."""
+
+    def __init__(self, libros=(), usuarios=(), reseñas=(), compartidos=()):
+        self.libros_por_id = {}
+        self.usuarios_por_id = {}
+        self.usuarios_por_nombre = {}
+        self.reseñas_por_id = {}
+        self.compartidos_por_id = {}
+        self.reseñas_por_libro = defaultdict(list)
+        self.compartidos_por_libro = defaultdict(list)
+        self.reseña_por_libro_usuario = {}
+
+        for libro in libros:
+            self.agregar_libro(libro)
+        for usuario in usuarios:
+            self.agregar_usuario(usuario)
+        for reseña in reseñas:
+            self.agregar_reseña(reseña)
+        for comp in compartidos:
+            self.agregar_compartido(comp)
+
+    # --- Altas ---
+
+    def agregar_libro(self, libro):
+        if 'id' in libro:
+            self.libros_por_id[libro['id']] = libro
+
+    def agregar_usuario(self, usuario):
+        if 'id' in usuario:
+            self.usuarios_por_id[usuario['id']] = usuario
+        if usuario.get('nombre'):
+            self.usuarios_por_nombre.setdefault(clave_nombre(usuario['nombre']), usuario)
+
+    def renombrar_usuario(self, usuario, nombre_anterior):
+        clave = clave_nombre(nombre_anterior)
+        if self.usuarios_por_nombre.get(clave) is usuario:
+            del self.usuarios_por_nombre[clave]
+        self.agregar_usuario(usuario)
+
+    def agregar_reseña(self, reseña):
+        if 'id' in reseña:
+            self.reseñas_por_id[reseña['id']] = reseña
+        libro_id = reseña.get('libro_id')
+        if libro_id is None:
+            return
+        self.reseñas_por_libro[libro_id].append(reseña)
+        usuario_id = reseña.get('usuario_id')
+        if usuario_id is not None:
+            # Igual que la búsqueda lineal: gana la primera reseña del usuario
+            self.reseña_por_libro_usuario.setdefault((libro_id, usuario_id), reseña)
+
+    def agregar_compartido(self, comp):
+        if 'id' in comp:
+            self.compartidos_por_id[comp['id']] = comp
+        libro_id = comp.get('libro_id')
+        if libro_id is not None:
+            self.compartidos_por_libro[libro_id].append(comp)
+
+    # --- Consultas O(1) ---
+
+    def libro(self, libro_id):
+        return self.libros_por_id.get(libro_id)
+
+    def usuario(self, usuario_id):
+        return self.usuarios_por_id.get(usuario_id)
+
+    def usuario_por_nombre(self, nombre):
+        return self.usuarios_por_nombre.get(clave_nombre(nombre))
+
+    def reseña(self, reseña_id):
+        return self.reseñas_por_id.get(reseña_id)
+
+    def compartido(self, compartido_id):
+        return self.compartidos_por_id.get(compartido_id)
+
+    def reseñas_de(self, libro_id):
+        return self.reseñas_por_libro.get(libro_id, [])
+
+    def compartidos_de(self, libro_id):
+        return self.compartidos_por_libro.get(libro_id, [])
+
+    def reseña_de(self, libro_id, usuario_id):
+        return self.reseña_por_libro_usuario.get((libro_id, usuario_id))
@@ -0,0 +1,277 @@
+import atexit
+import functools
+import os
+import threading
+import time
+
+# --- Instrumentación de los caminos calientes ---
+# Tiempos y contadores alrededor de la carga y el guardado de datos, la
+# búsqueda, las uniones de la vista de detalle y las actualizaciones de la
+# UI. Se activa con variables de entorno, antes de arrancar:
+#
+#   READERS_BAY_INSTRUMENTAR=1            vuelca a readers_bay_perfil.<pid>.json
+#   READERS_BAY_INSTRUMENTAR=perfil.json  vuelca a ese archivo ({pid} se reemplaza)
+#   READERS_BAY_PERFILAR=1                además, captura cProfile de las regiones
+#                                         medidas del hilo principal en
+#                                         <archivo>.prof (ver pstats)
+#
+# Apagada no cuesta nada: @medido devuelve la función tal cual, medir() es
+# un contexto vacío compartido y contar() y registrar_tiempo() no hacen nada. El archivo se
+# escribe al salir; `python -m readers_bay.instrumentacion <archivo>` lo
+# muestra como tabla.
+
+_CONFIGURACION = os.environ.get('READERS_BAY_INSTRUMENTAR', '').strip()
+ACTIVA = _CONFIGURACION.lower() not in ('', '0', 'no', 'false')
+PERFILAR = ACTIVA and os.environ.get('READERS_BAY_PERFILAR', '').strip().lower() not in ('', '0', 'no', 'false')
+ARCHIVO_PREDETERMINADO = 'readers_bay_perfil.{pid}.json'
+
+# Histograma en escala log2 de microsegundos: la casilla i cuenta las
+# duraciones de hasta 2**i µs (la última junta todo lo que pase de ~4.6 h)
+CASILLAS = 34
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) de una lista ordenada, por el método del más cercano."""
+    if not valores:
+        return 0.0
+    posicion = min(len(valores) - 1, max(0, round(p / 100 * len(valores)) - 1))
+    return valores[posicion]
+
+
+class Medicion:
+    """Cantidad, total, extremos e histograma de las duraciones de una región."""
+
+    __slots__ = ('llamadas', 'total', 'minimo', 'maximo', 'casillas')
+
+    def __init__(self):
+        self.llamadas = 0
+        self.total = 0.0
+        self.minimo = float('inf')
+        self.maximo = 0.0
+        self.casillas = [0] * CASILLAS
+
+    def registrar(self, segundos):
+        self.llamadas += 1
+        self.total += segundos
+        self.minimo = min(self.minimo, segundos)
+        self.maximo = max(self.maximo, segundos)
+        self.casillas[min(int(segundos * 1e6).bit_length(), CASILLAS - 1)] += 1
+
+    def percentil(self, p):
+        """Cota superior (en ms) de la casilla donde cae el percentil p."""
+        objetivo = self.llamadas * p / 100
+        acumulado = 0
+        for i, cantidad in enumerate(self.casillas):
+            acumulado += cantidad
+            if cantidad and acumulado >= objetivo:
+                return min(2 ** i / 1000, self.maximo * 1000)
+        return self.maximo * 1000
+
+    def como_dict(self):
+        return {
+            'llamadas': self.llamadas,
+            'total_ms': self.total * 1000,
+            'medio_ms': self.total / self.llamadas * 1000 if self.llamadas else 0.0,
+            'min_ms': self.minimo * 1000 if self.llamadas else 0.0,
+            'max_ms': self.maximo * 1000,
+            'p50_ms': self.percentil(50),
+            'p95_ms': self.percentil(95),
+            'p99_ms': self.percentil(99),
+            'histograma_us': {f'<={2 ** i}': n for i, n in enumerate(self.casillas) if n},
+        }
+
+
+class Registro:
+    """Mediciones y contadores de un proceso, más las capturas de cProfile."""
+
+    def __init__(self, perfilar=False):
+        self.inicio = time.time()
+        self.mediciones = {}
+        self.contadores = {}
+        self.perfilar = perfilar
+        self._lock = threading.Lock()
+        # Un solo cProfile para el proceso y solo en el hilo principal: desde
+        # Python 3.12 no puede haber dos perfiladores prendidos a la vez
+        self._perfil = None
+        self._perfil_activo = False
+        self._perfil_usado = False
+
+    def registrar(self, nombre, segundos):
+        with self._lock:
+            medicion = self.mediciones.get(nombre)
+            if medicion is None:
+                medicion = self.mediciones[nombre] = Medicion()
+            medicion.registrar(segundos)
+
+    def contar(self, nombre, cantidad=1):
+        with self._lock:
+            self.contadores[nombre] = self.contadores.get(nombre, 0) + cantidad
+
+    def medir(self, nombre):
+        return _Region(self, nombre)
+
+    def _entrar_perfil(self):
+        # Solo la región más externa prende el perfilador: las anidadas ya
+        # quedan dentro de su captura. Las de otros hilos solo se cronometran
+        if self._perfil_activo or threading.current_thread() is not threading.main_thread():
+            return None
+        if self._perfil is None:
+            import cProfile
+            self._perfil = cProfile.Profile()
+        try:
+            self._perfil.enable()
+        except ValueError:
+            return None  # otra herramienta de perfilado ya está prendida
+        self._perfil_activo = self._perfil_usado = True
+        return self._perfil
+
+    def _salir_perfil(self, perfil):
+        perfil.disable()
+        self._perfil_activo = False
+
+    def resumen(self):
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'inicio': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.inicio)),
+                'duracion_s': time.time() - self.inicio,
+                'contadores': dict(sorted(self.contadores.items())),
+                'tiempos': {nombre: m.como_dict() for nombre, m in sorted(self.mediciones.items())},
+            }
+
+    def volcar(self, ruta):
+        """Escribe el resumen en ruta (JSON) y, si se perfiló, ruta + '.prof'."""
+        import json
+
+        temporal = ruta + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(self.resumen(), f, indent=2, ensure_ascii=False)
+        os.replace(temporal, ruta)
+        if self._perfil_usado and not self._perfil_activo:
+            import pstats
+            pstats.Stats(self._perfil).dump_stats(ruta + '.prof')
+
+
+class _Region:
+    """with registro.medir(nombre): mide el bloque (y lo perfila si corresponde)."""
+
+    __slots__ = ('registro', 'nombre', 'inicio', 'perfil')
+
+    def __init__(self, registro, nombre):
+        self.registro = registro
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.perfil = self.registro._entrar_perfil() if self.registro.perfilar else None
+        self.inicio = time.perf_counter()
+
+    def __exit__(self, *excepcion):
+        self.registro.registrar(self.nombre, time.perf_counter() - self.inicio)
+        if self.perfil is not None:
+            self.registro._salir_perfil(self.perfil)
+
+
+class _SinMedir:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *excepcion):
+        pass
+
+
+def _ruta_salida():
+    ruta = ARCHIVO_PREDETERMINADO if _CONFIGURACION.lower() in ('1', 'si', 'sí', 'true') else _CONFIGURACION
+    return ruta.replace('{pid}', str(os.getpid()))
+
+
+registro = Registro(PERFILAR) if ACTIVA else None
+
+
+def volcar(ruta=None):
+    """Vuelca lo medido hasta ahora (no hace nada si está apagada)."""
+    if registro is not None:
+        try:
+            registro.volcar(ruta or _ruta_salida())
+        except OSError as e:
+            print(f"No se pudo guardar la instrumentación: {e}")
+
+
+def _volcar_al_salir():
+    # Procesos que no pasaron por ninguna región medida no dejan archivo
+    if registro.mediciones or registro.contadores:
+        volcar()
+
+
+if ACTIVA:
+    atexit.register(_volcar_al_salir)
+
+    def medido(nombre):
+        """Decorador: mide cada llamada de la función bajo `nombre`."""
+        def decorador(funcion):
+            @functools.wraps(funcion)
+            def envoltura(*args, **kwargs):
+                with registro.medir(nombre):
+                    return funcion(*args, **kwargs)
+            return envoltura
+        return decorador
+
+    medir = registro.medir
+    contar = registro.contar
+    # Duraciones medidas a mano, p. ej. de una tarea que cruza varios await
+    registrar_tiempo = registro.registrar
+else:
+    _SIN_MEDIR = _SinMedir()
+
+    def medido(nombre):
+        return lambda funcion: funcion
+
+    def medir(nombre):
+        return _SIN_MEDIR
+
+    def contar(nombre, cantidad=1):
+        pass
+
+    def registrar_tiempo(nombre, segundos):
+        pass
+
+
+def instrumentar_metodo(objeto, metodo, nombre):
+    """Reemplaza objeto.metodo por una versión medida (p. ej. page.update)."""
+    if not ACTIVA:
+        return
+    try:
+        setattr(objeto, metodo, medido(nombre)(getattr(objeto, metodo)))
+    except (AttributeError, TypeError):
+        pass  # objetos que no aceptan atributos nuevos: se quedan sin medir
+
+
+def imprimir(resumen):
+    print(f"pid {resumen['pid']}, {resumen['duracion_s']:.1f} s desde {resumen['inicio']}\n")
+    print(f"{'región':<28}{'llamadas':>10}{'total ms':>12}{'medio ms':>10}"
+          f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    tiempos = sorted(resumen['tiempos'].items(), key=lambda par: -par[1]['total_ms'])
+    for nombre, m in tiempos:
+        print(f"{nombre:<28}{m['llamadas']:>10}{m['total_ms']:>12.2f}{m['medio_ms']:>10.3f}"
+              f"{m['p50_ms']:>10.3f}{m['p95_ms']:>10.3f}{m['p99_ms']:>10.3f}{m['max_ms']:>10.3f}")
+    if resumen['contadores']:
+        print()
+        for nombre, cantidad in resumen['contadores'].items():
+            print(f"{nombre:<28}{cantidad:>10}")
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Muestra un volcado de la instrumentación.")
+    parser.add_argument('archivo')
+    parser.add_argument('--perfil', type=int, metavar='N',
+                        help="Además, las N funciones con más tiempo acumulado del .prof")
+    args = parser.parse_args()
+    with open(args.archivo, encoding='utf-8') as f:
+        imprimir(json.load(f))
+    if args.perfil:
+        import pstats
+        pstats.Stats(args.archivo + '.prof').sort_stats('cumulative').print_stats(args.perfil)
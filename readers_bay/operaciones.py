@@ -0,0 +1,113 @@
+import datetime
+
+from .agregados import rating_numerico
+from .instrumentacion import medido
+
+# --- Operaciones del club, sin prompts ni UI ---
+# Lo que hacen main.py (con input()) e interfaz.py (con Flet) separado de
+# cómo se piden los datos, para poder usarlo también desde el servidor HTTP
+# (servidor.py) y desde scripts. Los datos inválidos se informan con
+# ValueError; lo que no existe, con None.
+
+
+def buscar_libros(indice_busqueda, consulta='', campos=None, limite=None):
+    """Libros que coinciden con la consulta (ver IndiceBusqueda.buscar)."""
+    return indice_busqueda.buscar(consulta, campos=campos, limite=limite)
+
+
+@medido('detalle_libro')
+def detalle_libro(repo, libro_id):
+    """
+    Libro con su resumen de calificaciones, sus reseñas y sus
+    recomendaciones, con los nombres de usuario ya resueltos, más los
+    libros que también gustaron a sus lectores (ya calculados: O(K)).
+    Las uniones salen de la caché de detalles del repositorio si está.
+    """
+    if repo.cache_detalles is None:
+        detalle = _armar_detalle(repo, libro_id)
+    else:
+        detalle = repo.cache_detalles.obtener(libro_id, lambda: _armar_detalle(repo, libro_id))
+    if detalle is None:
+        return None
+    # Los vecinos cambian con reseñas de otros libros: se leen siempre
+    return dict(detalle, tambien_gustaron=tambien_gustaron(repo, libro_id))
+
+
+@medido('detalle.unir')
+def _armar_detalle(repo, libro_id):
+    libro = repo.libro(libro_id)
+    if libro is None:
+        return None
+
+    def nombre(usuario_id):
+        usuario = repo.usuario(usuario_id)
+        return usuario['nombre'] if usuario else None
+
+    reseñas = []
+    for r in repo.reseñas_de(libro_id):
+        reseña = dict(r)
+        reseña['usuario'] = nombre(r.get('usuario_id'))
+        reseñas.append(reseña)
+    compartidos = []
+    for c in repo.compartidos_de(libro_id):
+        comp = dict(c)
+        comp.setdefault('remitente', nombre(c.get('de_usuario_id')))
+        comp.setdefault('destinatario', nombre(c.get('a_usuario_id')))
+        compartidos.append(comp)
+    return {'libro': dict(libro), 'rating': repo.rating_de(libro_id),
+            'reseñas': reseñas, 'compartidos': compartidos}
+
+
+def tambien_gustaron(repo, libro_id):
+    """Los libros recomendados para este, con su puntaje de parecido."""
+    libros = []
+    for vecino_id, puntaje in repo.recomendados(libro_id):
+        vecino = repo.libro(vecino_id)
+        if vecino is not None:
+            libros.append(dict(vecino, puntaje=puntaje))
+    return libros
+
+
+@medido('guardar_reseña')
+def guardar_reseña(repo, libro_id, usuario_id, rating, texto='', fecha=None):
+    """
+    Crea la reseña del usuario para el libro o edita la que ya tiene (una
+    por usuario y libro). Devuelve (reseña, creada).
+    """
+    rating = rating_numerico(rating)
+    if rating is None:
+        raise ValueError("El rating debe ser un número entre 1 y 5")
+    if repo.libro(libro_id) is None:
+        raise ValueError(f"No existe el libro {libro_id}")
+    if repo.usuario(usuario_id) is None:
+        raise ValueError(f"No existe el usuario {usuario_id}")
+
+    fecha = fecha or datetime.date.today().isoformat()
+    reseña = repo.reseña_de(libro_id, usuario_id)
+    creada = reseña is None
+    if creada:
+        reseña = {"libro_id": libro_id, "usuario_id": usuario_id}
+    reseña['rating'] = rating
+    reseña['texto'] = texto or ""
+    reseña['fecha'] = fecha
+    return repo.guardar_reseña(reseña), creada
+
+
+@medido('compartir_libro')
+def compartir_libro(repo, libro_id, de_usuario_id, a_usuario_id, nota='', fecha=None):
+    """Recomienda un libro a otro usuario. Devuelve el compartido guardado."""
+    if de_usuario_id == a_usuario_id:
+        raise ValueError("No puedes recomendarte un libro a ti mismo")
+    if repo.libro(libro_id) is None:
+        raise ValueError(f"No existe el libro {libro_id}")
+    for usuario_id in (de_usuario_id, a_usuario_id):
+        if repo.usuario(usuario_id) is None:
+            raise ValueError(f"No existe el usuario {usuario_id}")
+
+    return repo.guardar_compartido({
+        "de_usuario_id": de_usuario_id,
+        "a_usuario_id": a_usuario_id,
+        "libro_id": libro_id,
+        "fecha": fecha or datetime.date.today().isoformat(),
+        "nota": nota or "",
+    })
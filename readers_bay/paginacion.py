@@ -0,0 +1,69 @@
+# --- Paginación perezosa de la lista de libros ---
+# La búsqueda devuelve todos los libros que coinciden (solo referencias),
+# pero los controles de la UI se crean por páginas a medida que se hace
+# scroll. En cada búsqueda nueva se reutilizan los controles de los libros
+# que ya estaban en pantalla en vez de reconstruirlos.
+
+TAMAÑO_PAGINA = 30
+# Píxeles antes del final del scroll en que se pide la siguiente página
+MARGEN_SCROLL = 800
+
+
+class ListaPaginada:
+    """Decide qué controles crear y cuáles reutilizar para una lista de libros."""
+
+    def __init__(self, crear_controles, tamaño_pagina=TAMAÑO_PAGINA):
+        # crear_controles(libros) -> lista de controles, en el mismo orden
+        self.crear_controles = crear_controles
+        self.tamaño_pagina = tamaño_pagina
+        self.resultados = []
+        self.visibles = 0
+        self._controles = {}   # libro_id -> control de la ventana actual
+
+    def mostrar(self, resultados):
+        """Nueva búsqueda: devuelve los controles de la primera página."""
+        anteriores = self._controles
+        self.resultados = resultados
+        self.visibles = 0
+        self._controles = {}
+        return self._pagina(anteriores)
+
+    def hay_mas(self):
+        return self.visibles < len(self.resultados)
+
+    def cargar_mas(self):
+        """Controles de la página siguiente (para agregar al final), o []."""
+        if not self.hay_mas():
+            return []
+        return self._pagina(self._controles)
+
+    def rehacer(self, libro_ids=None):
+        """
+        Vuelve a crear los controles ya mostrados de esos libros (o de todos)
+        cuando cambió algo que muestran, como el promedio. Devuelve pares
+        (control anterior, control nuevo) para reemplazarlos en la lista.
+        """
+        mostrados = self.resultados[:self.visibles]
+        if libro_ids is not None:
+            libro_ids = set(libro_ids)
+            mostrados = [libro for libro in mostrados if libro['id'] in libro_ids]
+        if not mostrados:
+            return []
+        reemplazos = []
+        for libro, control in zip(mostrados, self.crear_controles(mostrados)):
+            reemplazos.append((self._controles[libro['id']], control))
+            self._controles[libro['id']] = control
+        return reemplazos
+
+    def _pagina(self, reutilizables):
+        pagina = self.resultados[self.visibles:self.visibles + self.tamaño_pagina]
+        faltan = [libro for libro in pagina if libro['id'] not in reutilizables]
+        nuevos = dict(zip((libro['id'] for libro in faltan), self.crear_controles(faltan))) if faltan else {}
+
+        controles = []
+        for libro in pagina:
+            control = reutilizables.get(libro['id']) or nuevos[libro['id']]
+            self._controles[libro['id']] = control
+            controles.append(control)
+        self.visibles += len(pagina)
+        return controles
@@ -0,0 +1,309 @@
+import json
+import math
+import operator
+import os
+import threading
+import zlib
+from collections import Counter
+
+from .agregados import rating_numerico
+from .instrumentacion import contar, medido
+
+# --- "A quienes les gustó este libro también les gustó..." ---
+# Recomendaciones automáticas por co-ocurrencia entre libros: dos libros se
+# parecen cuando los mismos lectores los disfrutaron. Un lector "disfrutó"
+# un libro si lo calificó con 4 o 5, o si lo recomendó a otro (compartido).
+#
+# Parecido de A y B = lectores de ambos / sqrt(lectores de A * lectores de B)
+# (coseno sobre conjuntos). De cada libro se guardan solo sus K vecinos más
+# parecidos, así que la vista de detalle los lee en O(K) sin calcular nada.
+#
+# El cálculo completo es un proceso por lotes (ver `python -m
+# readers_bay.recomendaciones`) que deja los vecinos en recomendaciones.json.
+# Entre una corrida y la siguiente, cada reseña o compartido nuevo actualiza
+# en memoria los vecinos del libro tocado y de los libros de ese lector. El
+# archivo lleva una firma de las señales con que se calculó: si al abrir
+# los datos no coincide (hubo reseñas después), se recalcula.
+# Tanto la carga de señales como el cálculo avanzan por lotes de libros y
+# sueltan el lock entre uno y otro: los guardados no esperan al cálculo.
+
+ARCHIVO_RECOMENDACIONES = 'recomendaciones.json'
+VECINOS_POR_LIBRO = 10
+RATING_MINIMO_GUSTO = 4
+MINIMO_COINCIDENCIAS = 1
+TAMAÑO_LOTE_RECOMENDACIONES = 100
+
+
+class MotorRecomendaciones:
+    """Vecinos más parecidos de cada libro, con actualización incremental."""
+
+    def __init__(self, reseñas=(), compartidos=(), k=VECINOS_POR_LIBRO,
+                 minimo_coincidencias=MINIMO_COINCIDENCIAS):
+        self.k = k
+        self.minimo_coincidencias = minimo_coincidencias
+        # Señales "le gustó": {usuario_id: {libro_id: fuentes}} y el índice
+        # inverso {libro_id: {usuario_id}}. Una reseña y un compartido del
+        # mismo lector sobre el mismo libro son dos fuentes de una señal.
+        self._libros_de = {}
+        self._lectores = {}
+        # 1 / sqrt(lectores) de cada libro: el denominador del coseno, listo
+        # para multiplicar
+        self._inversa = {}
+        # Fuente que aporta hoy cada reseña o compartido (por id), para
+        # deshacerla si la reseña se edita
+        self._fuentes = {}
+        self.vecinos = None  # {libro_id: [(vecino_id, puntaje), ...]}
+        # Señales que cambiaron sin vecinos listos o durante un cálculo:
+        # se aplican cuando el cálculo (o la carga del archivo) termina
+        self._pendientes = set()
+        self._calculando = False
+        self._lock = threading.RLock()
+        self.agregar_señales(reseñas, compartidos)
+
+    def agregar_señales(self, reseñas=(), compartidos=(), tamaño_lote=TAMAÑO_LOTE_RECOMENDACIONES * 10,
+                        incremental=True):
+        """
+        Carga las señales de muchos registros, por lotes. Con
+        incremental=False no se tocan los vecinos ya calculados: quien llama
+        se encarga de un calcular() al final (importaciones masivas).
+        """
+        for tipo, registros, gusto in (('reseña', reseñas, self._gusto_de_reseña),
+                                       ('compartido', compartidos, self._gusto_de_compartido)):
+            registros = iter(registros)
+            while True:
+                with self._lock:
+                    lote = 0
+                    for registro in registros:
+                        cambios = self._registrar(tipo, registro, gusto(registro))
+                        # Sin vecinos todavía, lo cargado lo cubre el cálculo
+                        # (o el archivo): solo se mantienen vecinos existentes
+                        if incremental and self.vecinos is not None:
+                            self._actualizar(cambios)
+                        lote += 1
+                        if lote == tamaño_lote:
+                            break
+                if lote < tamaño_lote:
+                    break
+
+    # --- Señales ---
+
+    @staticmethod
+    def _gusto_de_reseña(reseña):
+        rating = rating_numerico(reseña.get('rating'))
+        if rating is None or rating < RATING_MINIMO_GUSTO:
+            return None
+        return reseña.get('usuario_id'), reseña.get('libro_id')
+
+    @staticmethod
+    def _gusto_de_compartido(comp):
+        return comp.get('de_usuario_id'), comp.get('libro_id')
+
+    def _registrar(self, tipo, registro, gusto):
+        """Aplica la señal del registro; devuelve (usuario, libro) de lo que cambió."""
+        if gusto is not None and None in gusto:
+            gusto = None
+        clave = (tipo, registro.get('id'))
+        anterior = self._fuentes.get(clave)
+        if anterior == gusto:
+            return ()
+        cambios = []
+        if anterior is not None:
+            self._fuentes.pop(clave)
+            if self._quitar(*anterior):
+                cambios.append(anterior)
+        if gusto is not None:
+            # Sin id no hay forma de reconocer una edición posterior
+            if clave[1] is not None:
+                self._fuentes[clave] = gusto
+            if self._sumar(*gusto):
+                cambios.append(gusto)
+        return cambios
+
+    def _sumar(self, usuario_id, libro_id):
+        libros = self._libros_de.setdefault(usuario_id, {})
+        libros[libro_id] = libros.get(libro_id, 0) + 1
+        if libros[libro_id] > 1:
+            return False
+        lectores = self._lectores.setdefault(libro_id, set())
+        lectores.add(usuario_id)
+        self._inversa[libro_id] = 1 / math.sqrt(len(lectores))
+        return True
+
+    def _quitar(self, usuario_id, libro_id):
+        libros = self._libros_de[usuario_id]
+        libros[libro_id] -= 1
+        if libros[libro_id]:
+            return False
+        del libros[libro_id]
+        lectores = self._lectores[libro_id]
+        lectores.discard(usuario_id)
+        if lectores:
+            self._inversa[libro_id] = 1 / math.sqrt(len(lectores))
+        else:
+            self._inversa.pop(libro_id, None)
+        return True
+
+    # --- Cálculo ---
+
+    def _fila(self, libro_id):
+        """Los k vecinos de un libro a partir de sus lectores."""
+        lectores = self._lectores.get(libro_id)
+        if not lectores:
+            return []
+        # Counter cuenta en C: una pasada por los libros de cada lector
+        coincidencias = Counter()
+        for usuario_id in lectores:
+            coincidencias.update(self._libros_de[usuario_id].keys())
+        del coincidencias[libro_id]
+        if self.minimo_coincidencias > 1:
+            coincidencias = {vecino: cantidad for vecino, cantidad in coincidencias.items()
+                             if cantidad >= self.minimo_coincidencias}
+        # Puntajes sin bucle de Python: coincidencias * 1/sqrt(lectores del
+        # vecino) con map, y a igual puntaje primero el id menor
+        vecinos = coincidencias.keys()
+        puntajes = map(operator.mul, coincidencias.values(), map(self._inversa.__getitem__, vecinos))
+        mejores = sorted(zip(puntajes, map(operator.neg, vecinos)), reverse=True)[:self.k]
+        propia = self._inversa[libro_id]
+        return [(-vecino, round(puntaje * propia, 4)) for puntaje, vecino in mejores]
+
+    @medido('recomendaciones.calcular')
+    def calcular(self, tamaño_lote=TAMAÑO_LOTE_RECOMENDACIONES):
+        """Cálculo completo de los vecinos de todos los libros."""
+        with self._lock:
+            libros = list(self._lectores)
+            self._calculando = True
+        nuevos = {}
+        try:
+            for inicio in range(0, len(libros), tamaño_lote):
+                with self._lock:
+                    for libro_id in libros[inicio:inicio + tamaño_lote]:
+                        fila = self._fila(libro_id)
+                        if fila:
+                            nuevos[libro_id] = fila
+        finally:
+            with self._lock:
+                self._calculando = False
+        self._instalar(nuevos)
+        return self.vecinos
+
+    def _instalar(self, vecinos):
+        with self._lock:
+            self.vecinos = vecinos
+            pendientes, self._pendientes = self._pendientes, set()
+            self._actualizar(pendientes)
+
+    @property
+    def listo(self):
+        return self.vecinos is not None
+
+    def vecinos_de(self, libro_id):
+        """Los k libros más parecidos, como [(libro_id, puntaje)]; vacío hasta calcular."""
+        vecinos = self.vecinos
+        return vecinos.get(libro_id, []) if vecinos is not None else []
+
+    # --- Actualización incremental ---
+
+    def registrar_reseña(self, reseña):
+        with self._lock:
+            self._actualizar(self._registrar('reseña', reseña, self._gusto_de_reseña(reseña)))
+
+    def registrar_compartido(self, comp):
+        with self._lock:
+            self._actualizar(self._registrar('compartido', comp, self._gusto_de_compartido(comp)))
+
+    def _actualizar(self, cambios):
+        if self.vecinos is None or self._calculando:
+            self._pendientes.update(cambios)
+            if self.vecinos is None:
+                return
+        for usuario_id, libro_id in cambios:
+            contar('recomendaciones.filas_recalculadas')
+            self._guardar_fila(libro_id, self._fila(libro_id))
+            # En los demás libros del lector solo cambia el par con el libro
+            # tocado; el resto de sus puntajes se corrige en el próximo lote
+            for otro in self._libros_de.get(usuario_id, ()):
+                if otro != libro_id:
+                    self._ajustar(otro, libro_id)
+
+    def _ajustar(self, libro_id, vecino):
+        """Recalcula un solo par dentro de la fila de un libro: O(K + lectores)."""
+        fila = [par for par in self.vecinos.get(libro_id, ()) if par[0] != vecino]
+        lectores = self._lectores.get(libro_id, set())
+        otros = self._lectores.get(vecino, set())
+        comunes = len(lectores & otros) if lectores and otros else 0
+        if comunes and comunes >= self.minimo_coincidencias:
+            puntaje = comunes * self._inversa[libro_id] * self._inversa[vecino]
+            fila.append((vecino, round(puntaje, 4)))
+            fila.sort(key=lambda par: (-par[1], par[0]))
+        self._guardar_fila(libro_id, fila[:self.k])
+
+    def _guardar_fila(self, libro_id, fila):
+        if fila:
+            self.vecinos[libro_id] = fila
+        else:
+            self.vecinos.pop(libro_id, None)
+
+    # --- Archivo ---
+
+    def firma(self):
+        """
+        Resumen de las señales cargadas (cantidad de pares lector-libro y
+        suma de sus CRC32): cambia si se agrega, quita o mueve un "le gustó".
+        """
+        with self._lock:
+            pares = [(usuario_id, libro_id) for usuario_id, libros in self._libros_de.items()
+                     for libro_id in libros]
+        suma = sum(zlib.crc32(f"{usuario_id}:{libro_id}".encode()) for usuario_id, libro_id in pares)
+        return {'señales': len(pares), 'crc': suma & 0xFFFFFFFF}
+
+    def guardar(self, ruta):
+        """Escribe los vecinos (archivo temporal y reemplazo, nunca a medias)."""
+        with self._lock:
+            datos = {'k': self.k, 'firma': self.firma(),
+                     'vecinos': {str(libro_id): fila for libro_id, fila in (self.vecinos or {}).items()}}
+        temporal = ruta + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(datos, separators=(',', ':')))
+        os.replace(temporal, ruta)
+
+    def cargar(self, ruta):
+        """
+        Lee los vecinos de la última corrida por lotes. False si no hay
+        archivo o si se calculó con otras señales que las cargadas.
+        """
+        try:
+            with open(ruta, encoding='utf-8') as f:
+                datos = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if datos.get('firma') != self.firma():
+            contar('recomendaciones.archivo_viejo')
+            return False
+        self._instalar({int(libro_id): [tuple(par) for par in fila][:self.k]
+                        for libro_id, fila in datos.get('vecinos', {}).items()})
+        return True
+
+
+def recalcular(repo, ruta):
+    """Proceso por lotes: vecinos de todos los libros desde el repositorio."""
+    motor = MotorRecomendaciones(repo.reseñas(), repo.compartidos())
+    motor.calcular()
+    motor.guardar(ruta)
+    return motor
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .repositorio import abrir_repositorio, ruta_recomendaciones
+
+    parser = argparse.ArgumentParser(description="Recalcula las recomendaciones por co-ocurrencia.")
+    parser.add_argument('--datos', default='data')
+    parser.add_argument('--backend', choices=('json', 'sqlite'))
+    args = parser.parse_args()
+    repo = abrir_repositorio(args.datos, args.backend)
+    try:
+        motor = recalcular(repo, ruta_recomendaciones(args.datos))
+        print(f"Vecinos calculados para {len(motor.vecinos)} libros")
+    finally:
+        repo.cerrar()
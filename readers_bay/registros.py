@@ -0,0 +1,152 @@
+import sys
+from collections.abc import MutableMapping
+
+# --- Registros compactos ---
+# Libros, usuarios, reseñas y compartidos en clases con __slots__ en vez de
+# dicts: cada registro ocupa una fracción de la memoria de un dict. Se usan
+# igual que un dict (r['rating'], r.get('nota'), 'id' in r, dict(r)...)
+# para que el código existente no cambie. Las claves que no son campos
+# conocidos (datos viejos con otro formato) van a un dict aparte, _extra.
+
+_FALTA = object()
+
+
+class Registro(MutableMapping):
+    """Base de los registros: campos fijos en slots + interfaz de dict."""
+
+    __slots__ = ('_extra',)
+    CAMPOS = ()
+    # Campos con pocos valores distintos que se repiten mucho (fechas, géneros)
+    INTERNADOS = ()
+    _CAMPOS_SET = frozenset()
+    _INTERNADOS_SET = frozenset()
+
+    def __init__(self, datos=(), **campos):
+        self._extra = None
+        if type(datos) is dict and not campos:
+            # Lo leído de JSON: directo, sin el update genérico de MutableMapping
+            for clave, valor in datos.items():
+                self[clave] = valor
+        else:
+            self.update(datos, **campos)
+
+    @classmethod
+    def desde_dict(cls, datos):
+        """Convierte un dict leído de JSON (o deja pasar un registro ya convertido)."""
+        if isinstance(datos, cls):
+            return datos
+        return cls(datos)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._CAMPOS_SET = frozenset(cls.CAMPOS)
+        cls._INTERNADOS_SET = frozenset(cls.INTERNADOS)
+
+    # --- Interfaz de MutableMapping ---
+
+    def __getitem__(self, clave):
+        if clave in self._CAMPOS_SET:
+            try:
+                return getattr(self, clave)
+            except AttributeError:
+                raise KeyError(clave) from None
+        if self._extra is not None and clave in self._extra:
+            return self._extra[clave]
+        raise KeyError(clave)
+
+    def __setitem__(self, clave, valor):
+        if clave in self._CAMPOS_SET:
+            if clave in self._INTERNADOS_SET and type(valor) is str:
+                valor = sys.intern(valor)
+            setattr(self, clave, valor)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[clave] = valor
+
+    def __delitem__(self, clave):
+        if clave in self._CAMPOS_SET:
+            try:
+                delattr(self, clave)
+            except AttributeError:
+                raise KeyError(clave) from None
+        elif self._extra is not None and clave in self._extra:
+            del self._extra[clave]
+        else:
+            raise KeyError(clave)
+
+    def __iter__(self):
+        for campo in self.CAMPOS:
+            if hasattr(self, campo):
+                yield campo
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    # get y __contains__ se usan mucho: versiones directas, sin pasar por KeyError
+
+    def get(self, clave, defecto=None):
+        if clave in self._CAMPOS_SET:
+            return getattr(self, clave, defecto)
+        if self._extra is not None:
+            return self._extra.get(clave, defecto)
+        return defecto
+
+    def __contains__(self, clave):
+        if clave in self._CAMPOS_SET:
+            return hasattr(self, clave)
+        return self._extra is not None and clave in self._extra
+
+    def como_dict(self):
+        # Lo mismo que dict(self), sin pasar por __iter__ y __getitem__
+        datos = {}
+        for campo in self.CAMPOS:
+            valor = getattr(self, campo, _FALTA)
+            if valor is not _FALTA:
+                datos[campo] = valor
+        if self._extra:
+            datos.update(self._extra)
+        return datos
+
+    def __eq__(self, otro):
+        if isinstance(otro, (Registro, dict)):
+            return self.como_dict() == dict(otro)
+        return NotImplemented
+
+    __hash__ = None  # mutable, como un dict
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.como_dict()!r})"
+
+
+class Libro(Registro):
+    __slots__ = ('id', 'titulo', 'autor', 'anio', 'genero')
+    CAMPOS = __slots__
+    INTERNADOS = ('autor', 'genero')
+
+
+class Usuario(Registro):
+    __slots__ = ('id', 'nombre', 'email', 'password')
+    CAMPOS = __slots__
+
+
+class Reseña(Registro):
+    __slots__ = ('id', 'libro_id', 'usuario_id', 'rating', 'texto', 'fecha')
+    CAMPOS = __slots__
+    INTERNADOS = ('fecha',)
+
+
+class Compartido(Registro):
+    __slots__ = ('id', 'de_usuario_id', 'a_usuario_id', 'libro_id', 'fecha', 'nota',
+                 'remitente', 'destinatario', 'libro_titulo', 'mensaje')
+    CAMPOS = __slots__
+    INTERNADOS = ('fecha', 'remitente', 'destinatario', 'libro_titulo')
+
+
+def a_json(objeto):
+    """Para json.dump(..., default=a_json): serializa los registros como dicts."""
+    if isinstance(objeto, Registro):
+        return objeto.como_dict()
+    raise TypeError(f"{type(objeto).__name__} no es serializable a JSON")
@@ -0,0 +1,1073 @@
+import datetime
+import functools
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from .agregados import AgregadosRating, calcular_promedio_agregado, resumen_vacio
+from .almacen import AlmacenLog
+from .buzon import TAMAÑO_PAGINA_BUZON, Buzones
+from .cache_detalles import CacheDetalles
+from .carga_streaming import EscrituraArregloJSON, iterar_json
+from .credenciales import UsuarioDuplicado, clave_nombre
+from .escritor import EscritorFondo
+from .indices import IndiceDatos
+from .instrumentacion import medido
+from .recomendaciones import ARCHIVO_RECOMENDACIONES, MotorRecomendaciones
+from .registros import Compartido, Libro, Reseña, Usuario
+
+# --- Repositorios de datos ---
+# Las entradas (main.py, interfaz.py) piden los datos a un repositorio en vez
+# de cargar las listas a mano. Hay dos implementaciones intercambiables:
+#   * RepositorioJSON: los archivos de data/ de siempre (+ log e índices).
+#   * RepositorioSQLite: una base sqlite3 con índices por libro y usuario.
+# Se elige con la variable de entorno READERS_BAY_BACKEND ("json" o "sqlite").
+
+ARCHIVOS = {
+    'libros': 'libros.json',
+    'usuarios': 'usuarios.json',
+    'reseñas': 'reseñas.json',
+    'compartidos': 'compartidos.json',
+}
+ARCHIVO_SQLITE = 'club.db'
+# Marcas de leído del buzón: {'id': usuario_id, 'ultimo_id': último compartido visto}
+ARCHIVO_LEIDOS = 'buzon_leidos.json'
+
+
+def ruta_recomendaciones(ruta_datos):
+    return os.path.join(ruta_datos, ARCHIVO_RECOMENDACIONES)
+
+
+def completar_reseña(datos):
+    """Copia de una reseña importada con el texto y la fecha que no trae (como guardar_reseña)."""
+    return {'texto': "", 'fecha': datetime.date.today().isoformat(), **datos}
+
+
+class Repositorio:
+    """Operaciones de datos que usan las entradas de la aplicación."""
+
+    _motor = None
+    _ruta_recomendaciones = None
+    cache_detalles = None  # CacheDetalles de cada backend (ver operaciones.detalle_libro)
+
+    def libros(self):
+        raise NotImplementedError
+
+    def iterar_libros(self):
+        """Recorre el catálogo sin esperar a tenerlo completo en memoria."""
+        yield from self.libros()
+
+    def iterar_reseñas(self):
+        """Recorre las reseñas sin armar otra lista (exportaciones)."""
+        yield from self.reseñas()
+
+    def usuarios(self):
+        raise NotImplementedError
+
+    def reseñas(self):
+        raise NotImplementedError
+
+    def compartidos(self):
+        raise NotImplementedError
+
+    def libro(self, libro_id):
+        raise NotImplementedError
+
+    def usuario(self, usuario_id):
+        raise NotImplementedError
+
+    def usuario_por_nombre(self, nombre):
+        """Usuario con ese nombre, sin distinguir mayúsculas (o None)."""
+        raise NotImplementedError
+
+    def _verificar_nombre_libre(self, usuario):
+        # Los nombres de usuario son únicos: se usan para el login
+        otro = self.usuario_por_nombre(usuario.get('nombre', ''))
+        if otro is not None and otro is not usuario and otro.get('id') != usuario.get('id'):
+            raise UsuarioDuplicado(f"Ya existe el usuario '{usuario.get('nombre')}'")
+
+    def reseñas_de(self, libro_id):
+        raise NotImplementedError
+
+    def compartidos_de(self, libro_id):
+        raise NotImplementedError
+
+    def reseña_de(self, libro_id, usuario_id):
+        raise NotImplementedError
+
+    def ids_existentes(self, coleccion, ids):
+        """Cuáles de esos ids ya están en la colección, como set."""
+        raise NotImplementedError
+
+    def reseñas_por_id(self, ids):
+        """Las reseñas con esos ids que existen, como {id: reseña}."""
+        raise NotImplementedError
+
+    def rating_de(self, libro_id):
+        """Cantidad, suma, promedio e histograma de calificaciones de un libro."""
+        raise NotImplementedError
+
+    def promedios(self, libro_ids):
+        """Promedios de muchos libros a la vez: {libro_id: promedio}."""
+        raise NotImplementedError
+
+    def _al_guardar_en_libro(self, registro):
+        # Una reseña o un compartido cambian el detalle de su libro
+        self.cache_detalles.invalidar(registro.get('libro_id'))
+
+    def recomendados(self, libro_id):
+        """
+        Lo que también gustó a quienes disfrutaron el libro, como
+        [(libro_id, puntaje)]. Vacío mientras se preparan (ver abajo).
+        """
+        return self.preparar_recomendaciones().vecinos_de(libro_id)
+
+    def preparar_recomendaciones(self):
+        """
+        Arma el motor de recomendaciones en un hilo aparte (una sola vez):
+        señales de reseñas y compartidos, y vecinos del archivo del último
+        lote. Sin archivo, o si hubo reseñas y compartidos después de
+        calcularlo (ver MotorRecomendaciones.firma), se calculan ahí mismo
+        y se dejan guardados.
+        """
+        if self._motor is None:
+            self._motor = MotorRecomendaciones()
+            threading.Thread(target=self._preparar_recomendaciones, args=(self._motor,),
+                             daemon=True).start()
+        return self._motor
+
+    def _preparar_recomendaciones(self, motor):
+        try:
+            motor.agregar_señales(self.reseñas(), self.compartidos())
+            if self._ruta_recomendaciones is None or not motor.cargar(self._ruta_recomendaciones):
+                motor.calcular()
+                if self._ruta_recomendaciones is not None:
+                    motor.guardar(self._ruta_recomendaciones)
+        except Exception as e:
+            print(f"Error al preparar las recomendaciones: {e}")
+
+    # Los guardar_* reciben un registro nuevo (se le asigna 'id' si no trae)
+    # o uno ya existente con cambios, y devuelven el registro guardado.
+
+    def guardar_usuario(self, usuario):
+        raise NotImplementedError
+
+    def guardar_reseña(self, reseña):
+        raise NotImplementedError
+
+    def guardar_compartido(self, comp):
+        raise NotImplementedError
+
+    # Importación masiva de 'libros' o 'reseñas' ya validados (importacion.py):
+    #
+    #     with repo.importacion('reseñas') as insertar:
+    #         nuevos, actualizados = insertar(lote)
+    #
+    # Cada lote va a disco y a los índices de una vez. Las reseñas se
+    # identifican por id o, si no traen, por libro y usuario (una por
+    # usuario y libro, como en operaciones.guardar_reseña).
+
+    def importacion(self, coleccion):
+        raise NotImplementedError
+
+    def _importar_señales(self, reseñas):
+        # Con vecinos listos se suman las señales sin recalcular fila por
+        # fila (se recalcula todo al terminar); si no, quedan pendientes
+        motor = self._motor
+        if motor is None:
+            return
+        if motor.listo:
+            motor.agregar_señales(reseñas, incremental=False)
+        else:
+            for reseña in reseñas:
+                motor.registrar_reseña(reseña)
+
+    def _terminar_importacion(self):
+        self.cache_detalles.vaciar()
+        if self._motor is not None and self._motor.listo:
+            threading.Thread(target=self._motor.calcular, daemon=True).start()
+
+    # Buzón de entrada: compartidos recibidos por un usuario, del más nuevo al más viejo
+
+    def buzon(self, usuario_id, pagina=0, tamaño=TAMAÑO_PAGINA_BUZON):
+        raise NotImplementedError
+
+    def no_leidos(self, usuario_id):
+        raise NotImplementedError
+
+    def marcar_leidos(self, usuario_id):
+        raise NotImplementedError
+
+    def refrescar(self):
+        """
+        Aplica lo que guardaron otros procesos sobre los mismos datos.
+        Devuelve los nombres de las colecciones que cambiaron.
+        """
+        return set()
+
+    def sincronizar(self):
+        """Espera a que todo lo guardado esté en disco."""
+
+    def metricas_escritura(self):
+        """Profundidad de la cola de escritura y contadores (vacío si se escribe directo)."""
+        return {}
+
+    def cerrar(self):
+        pass
+
+
+# --- Backend JSON ---
+
+class RepositorioJSON(Repositorio):
+    """Los archivos JSON de siempre, con escrituras por log e índices en memoria."""
+
+    # Cada colección se guarda en memoria con su clase compacta (registros.py)
+    FABRICAS = {
+        'libros': Libro.desde_dict,
+        'usuarios': Usuario.desde_dict,
+        'reseñas': Reseña.desde_dict,
+        'compartidos': Compartido.desde_dict,
+    }
+
+    def __init__(self, ruta_datos, escritura_en_fondo=True):
+        # Un solo hilo escritor para todos los logs: guardar no espera al disco
+        self.escritor = EscritorFondo() if escritura_en_fondo else None
+        # Índices, agregados, buzones y motor no son seguros entre hilos: los
+        # cambian los guardar_* y también los avisos de otros procesos, que
+        # llegan desde el hilo escritor y el del vigilante
+        self._lock_datos = threading.RLock()
+        self._almacenes = {
+            nombre: AlmacenLog(os.path.join(ruta_datos, ARCHIVOS[nombre]),
+                               fabrica=self.FABRICAS[nombre], escritor=self.escritor,
+                               al_cambiar=functools.partial(self._al_cambiar, nombre))
+            for nombre in ('usuarios', 'reseñas', 'compartidos')
+        }
+        self._datos = {nombre: almacen.cargar() for nombre, almacen in self._almacenes.items()}
+        self._almacenes['leidos'] = AlmacenLog(os.path.join(ruta_datos, ARCHIVO_LEIDOS),
+                                               escritor=self.escritor,
+                                               al_cambiar=functools.partial(self._al_cambiar, 'leidos'))
+        self._leidos = {marca['id']: marca for marca in self._almacenes['leidos'].cargar()}
+        self.indice = IndiceDatos((), self._datos['usuarios'],
+                                  self._datos['reseñas'], self._datos['compartidos'])
+        # El catálogo se lee recién cuando se pide (ver iterar_libros)
+        self._ruta_libros = os.path.join(ruta_datos, ARCHIVOS['libros'])
+        self._datos['libros'] = []
+        self._libros_cargados = False
+        self._leyendo_libros = False
+        self._lock_libros = threading.RLock()
+        self._libros_importando = {}
+        self.agregados = AgregadosRating(self._datos['reseñas'])
+        self.buzones = Buzones(self._datos['compartidos'], self._id_por_nombre,
+                               {usuario_id: marca['ultimo_id'] for usuario_id, marca in self._leidos.items()})
+        self._ruta_recomendaciones = ruta_recomendaciones(ruta_datos)
+        self.cache_detalles = CacheDetalles()
+        self._ultimo_id = {
+            nombre: max((r['id'] for r in lista if isinstance(r.get('id'), int)), default=0)
+            for nombre, lista in self._datos.items()
+        }
+
+    def libros(self):
+        self._asegurar_libros()
+        return self._datos['libros']
+
+    def iterar_libros(self):
+        """
+        La primera vez lee libros.json por partes e indexa cada libro al
+        vuelo; las siguientes recorre lo que ya está en memoria.
+        """
+        with self._lock_libros:
+            if self._libros_cargados or self._leyendo_libros:
+                yield from list(self._datos['libros'])
+                return
+            self._leyendo_libros = True
+            try:
+                self._datos['libros'].clear()  # por si una lectura anterior quedó a medias
+                for libro in iterar_json(self._ruta_libros):
+                    libro = Libro.desde_dict(libro)
+                    self._datos['libros'].append(libro)
+                    self.indice.agregar_libro(libro)
+                    if isinstance(libro.get('id'), int):
+                        self._ultimo_id['libros'] = max(self._ultimo_id['libros'], libro['id'])
+                    yield libro
+                self._libros_cargados = True
+            finally:
+                self._leyendo_libros = False
+
+    @medido('datos.cargar_libros')
+    def _asegurar_libros(self):
+        # Si otro hilo está leyendo, el RLock espera a que termine
+        with self._lock_libros:
+            if not self._libros_cargados and not self._leyendo_libros:
+                for _ in self.iterar_libros():
+                    pass
+
+    def usuarios(self):
+        return self._datos['usuarios']
+
+    def reseñas(self):
+        return self._datos['reseñas']
+
+    def compartidos(self):
+        return self._datos['compartidos']
+
+    def libro(self, libro_id):
+        self._asegurar_libros()
+        return self.indice.libro(libro_id)
+
+    def usuario(self, usuario_id):
+        return self.indice.usuario(usuario_id)
+
+    def usuario_por_nombre(self, nombre):
+        return self.indice.usuario_por_nombre(nombre)
+
+    def reseñas_de(self, libro_id):
+        return self.indice.reseñas_de(libro_id)
+
+    def compartidos_de(self, libro_id):
+        return self.indice.compartidos_de(libro_id)
+
+    def reseña_de(self, libro_id, usuario_id):
+        return self.indice.reseña_de(libro_id, usuario_id)
+
+    def ids_existentes(self, coleccion, ids):
+        if coleccion == 'libros':
+            self._asegurar_libros()
+            # También los de una importación en curso, que aún no están en el índice
+            return {id_ for id_ in ids
+                    if self.indice.libro(id_) is not None or id_ in self._libros_importando}
+        buscar = {'usuarios': self.indice.usuario, 'reseñas': self.indice.reseña,
+                  'compartidos': self.indice.compartido}[coleccion]
+        return {id_ for id_ in ids if buscar(id_) is not None}
+
+    def reseñas_por_id(self, ids):
+        encontradas = {}
+        for id_ in ids:
+            reseña = self.indice.reseña(id_)
+            if reseña is not None:
+                encontradas[id_] = reseña
+        return encontradas
+
+    def rating_de(self, libro_id):
+        return self.agregados.resumen(libro_id)
+
+    def promedios(self, libro_ids):
+        return self.agregados.promedios(libro_ids)
+
+    def guardar_usuario(self, usuario):
+        with self._lock_datos:
+            self._verificar_nombre_libre(usuario)
+            existente = self.indice.usuario(usuario['id']) if 'id' in usuario else None
+            nombre_anterior = existente.get('nombre') if existente is not None else None
+            usuario = self._registrar('usuarios', usuario, self.indice.usuario, self.indice.agregar_usuario)
+            if nombre_anterior is not None and nombre_anterior != usuario.get('nombre'):
+                self.indice.renombrar_usuario(usuario, nombre_anterior)
+                self.cache_detalles.vaciar()  # el nombre aparece en los detalles
+        return self._escribir('usuarios', usuario)
+
+    def guardar_reseña(self, reseña):
+        with self._lock_datos:
+            reseña = self._registrar('reseñas', reseña, self.indice.reseña, self.indice.agregar_reseña)
+            self.agregados.registrar(reseña)
+            self._al_guardar_en_libro(reseña)
+            if self._motor is not None:
+                self._motor.registrar_reseña(reseña)
+        return self._escribir('reseñas', reseña)
+
+    def guardar_compartido(self, comp):
+        with self._lock_datos:
+            comp = self._registrar('compartidos', comp, self.indice.compartido, self._indexar_compartido)
+            self._al_guardar_en_libro(comp)
+            if self._motor is not None:
+                self._motor.registrar_compartido(comp)
+        return self._escribir('compartidos', comp)
+
+    def _indexar_compartido(self, comp):
+        self.indice.agregar_compartido(comp)
+        self.buzones.agregar(comp)
+
+    def _id_por_nombre(self, nombre):
+        usuario = self.usuario_por_nombre(nombre)
+        return usuario['id'] if usuario else None
+
+    def buzon(self, usuario_id, pagina=0, tamaño=TAMAÑO_PAGINA_BUZON):
+        return self.buzones.pagina(usuario_id, pagina, tamaño)
+
+    def no_leidos(self, usuario_id):
+        return self.buzones.no_leidos(usuario_id)
+
+    def marcar_leidos(self, usuario_id):
+        with self._lock_datos:
+            ultimo = self.buzones.marcar_leidos(usuario_id)
+            if ultimo is None:
+                return
+            marca = self._leidos.get(usuario_id)
+            if marca is None:
+                marca = self._leidos[usuario_id] = {'id': usuario_id, 'ultimo_id': ultimo}
+                self._almacenes['leidos'].datos.append(marca)
+            else:
+                marca['ultimo_id'] = ultimo
+        self._almacenes['leidos'].guardar(marca)
+
+    @medido('datos.guardar')
+    def _registrar(self, nombre, registro, buscar, indexar):
+        """Pone el registro en memoria y en los índices (con _lock_datos tomado)."""
+        existente = buscar(registro['id']) if 'id' in registro else None
+        if existente is None:
+            # Registro nuevo: el id lo reparte el almacén, sin choques entre procesos
+            if 'id' not in registro:
+                registro['id'] = self._almacenes[nombre].nuevo_id(self._ultimo_id[nombre])
+            self._ultimo_id[nombre] = max(self._ultimo_id[nombre], registro['id'])
+            registro = self.FABRICAS[nombre](registro)
+            self._datos[nombre].append(registro)
+            indexar(registro)
+        elif existente is not registro:
+            existente.update(registro)
+            registro = existente
+        return registro
+
+    def _escribir(self, nombre, registro):
+        # Sin _lock_datos: con la cola llena, guardar() espera al hilo
+        # escritor, que a su vez puede esperar ese lock para avisar cambios
+        self._almacenes[nombre].guardar(registro)
+        return registro
+
+    @contextmanager
+    def importacion(self, coleccion):
+        if coleccion == 'libros':
+            with self._importacion_libros() as insertar:
+                yield insertar
+        elif coleccion == 'reseñas':
+            try:
+                yield self._importar_reseñas
+            finally:
+                self._terminar_importacion()
+        else:
+            raise ValueError(f"No se puede importar '{coleccion}'")
+
+    @contextmanager
+    def _importacion_libros(self):
+        # libros.json no tiene log: se reescribe una sola vez por importación,
+        # copiando el arreglo actual y agregando los lotes al final. Los
+        # demás procesos ven los libros nuevos al volver a abrir los datos.
+        with self._lock_libros:
+            self._asegurar_libros()
+            nuevos = self._libros_importando = {}
+
+            def insertar(libros):
+                for datos in libros:
+                    libro = Libro.desde_dict(datos)
+                    if libro.get('id') is None:
+                        libro['id'] = self._ultimo_id['libros'] + 1
+                    self._ultimo_id['libros'] = max(self._ultimo_id['libros'], libro['id'])
+                    archivo.escribir(libro)
+                    nuevos[libro['id']] = libro
+                return len(libros), 0
+
+            try:
+                with EscrituraArregloJSON(self._ruta_libros, conservar=True) as archivo:
+                    yield insertar
+            finally:
+                self._libros_importando = {}
+            # Recién con el archivo en su lugar pasan a memoria y al índice
+            self._datos['libros'].extend(nuevos.values())
+            for libro in nuevos.values():
+                self.indice.agregar_libro(libro)
+
+    @medido('datos.importar_lote')
+    def _importar_reseñas(self, reseñas):
+        with self._lock_datos:
+            guardadas, nuevas, actualizadas = self._registrar_reseñas(reseñas)
+        # Al log y al motor fuera del lock, igual que en _escribir()
+        self._almacenes['reseñas'].guardar_lote(guardadas)
+        self._importar_señales(guardadas)
+        return nuevas, actualizadas
+
+    def _registrar_reseñas(self, reseñas):
+        nuevas, tocadas, por_id, por_par = [], {}, {}, {}
+        actualizadas = 0
+        for datos in reseñas:
+            par = (datos['libro_id'], datos['usuario_id'])
+            id_ = datos.get('id')
+            reseña = None
+            if id_ is not None:
+                reseña = por_id.get(id_, self.indice.reseña(id_))
+            if reseña is None:
+                reseña = por_par.get(par, self.indice.reseña_de(*par))
+            if reseña is None:
+                reseña = Reseña.desde_dict(completar_reseña(datos))
+                nuevas.append(reseña)
+            else:
+                reseña.update({clave: valor for clave, valor in datos.items() if clave != 'id'})
+                actualizadas += 1
+            por_par[par] = reseña
+            if reseña.get('id') is not None:
+                por_id[reseña['id']] = reseña
+            tocadas[id(reseña)] = reseña  # una vez cada una, aunque se repita
+
+        almacen = self._almacenes['reseñas']
+        sin_id = [reseña for reseña in nuevas if reseña.get('id') is None]
+        if sin_id:
+            for reseña, id_ in zip(sin_id, almacen.reservar_ids(len(sin_id), self._ultimo_id['reseñas'])):
+                reseña['id'] = id_
+        for reseña in nuevas:
+            self._ultimo_id['reseñas'] = max(self._ultimo_id['reseñas'], reseña['id'])
+            self._datos['reseñas'].append(reseña)
+            self.indice.agregar_reseña(reseña)
+        guardadas = list(tocadas.values())
+        for reseña in guardadas:
+            self.agregados.registrar(reseña)
+        return guardadas, len(nuevas), actualizadas
+
+    def refrescar(self):
+        return {nombre for nombre, almacen in self._almacenes.items() if almacen.refrescar()}
+
+    def _al_cambiar(self, nombre, registro, anterior):
+        # Un registro que guardó otro proceso: se indexa como uno propio
+        with self._lock_datos:
+            if nombre == 'leidos':
+                self._leidos.setdefault(registro['id'], registro)
+                self.buzones.fijar_leido(registro['id'], registro['ultimo_id'])
+            else:
+                self._indexar_cambio(nombre, registro, anterior)
+
+    def _indexar_cambio(self, nombre, registro, anterior):
+        if isinstance(registro.get('id'), int):
+            self._ultimo_id[nombre] = max(self._ultimo_id[nombre], registro['id'])
+        if anterior is None:
+            indexar = {'usuarios': self.indice.agregar_usuario,
+                       'reseñas': self.indice.agregar_reseña,
+                       'compartidos': self._indexar_compartido}[nombre]
+            indexar(registro)
+        elif nombre == 'usuarios' and anterior.get('nombre') != registro.get('nombre'):
+            self.indice.renombrar_usuario(registro, anterior.get('nombre'))
+            self.cache_detalles.vaciar()
+        if nombre != 'usuarios':
+            self._al_guardar_en_libro(registro)
+        if nombre == 'reseñas':
+            self.agregados.registrar(registro)
+        if self._motor is not None and nombre != 'usuarios':
+            if nombre == 'reseñas':
+                self._motor.registrar_reseña(registro)
+            else:
+                self._motor.registrar_compartido(registro)
+
+    def sincronizar(self):
+        for almacen in self._almacenes.values():
+            almacen.sincronizar()
+
+    def metricas_escritura(self):
+        return self.escritor.metricas() if self.escritor is not None else {}
+
+    def cerrar(self):
+        for almacen in self._almacenes.values():
+            almacen.cerrar()
+        if self.escritor is not None:
+            self.escritor.cerrar()
+
+
+# --- Backend SQLite ---
+
+ESQUEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS libros (
+    id INTEGER PRIMARY KEY, titulo TEXT, autor TEXT, anio INTEGER, genero TEXT);
+CREATE TABLE IF NOT EXISTS usuarios (
+    id INTEGER PRIMARY KEY, nombre TEXT, email TEXT, password TEXT, nombre_clave TEXT);
+CREATE TABLE IF NOT EXISTS resenas (
+    id INTEGER PRIMARY KEY, libro_id INTEGER, usuario_id INTEGER,
+    rating INTEGER, texto TEXT, fecha TEXT);
+CREATE TABLE IF NOT EXISTS compartidos (
+    id INTEGER PRIMARY KEY, de_usuario_id INTEGER, a_usuario_id INTEGER,
+    libro_id INTEGER, fecha TEXT, nota TEXT,
+    remitente TEXT, destinatario TEXT, libro_titulo TEXT, mensaje TEXT);
+CREATE INDEX IF NOT EXISTS idx_resenas_libro ON resenas (libro_id);
+CREATE INDEX IF NOT EXISTS idx_resenas_usuario ON resenas (usuario_id);
+CREATE INDEX IF NOT EXISTS idx_resenas_libro_usuario ON resenas (libro_id, usuario_id);
+CREATE INDEX IF NOT EXISTS idx_compartidos_libro ON compartidos (libro_id);
+CREATE INDEX IF NOT EXISTS idx_compartidos_a_usuario ON compartidos (a_usuario_id, id);
+CREATE INDEX IF NOT EXISTS idx_compartidos_destinatario ON compartidos (destinatario, id);
+-- Último compartido que vio cada usuario (id: el del usuario)
+CREATE TABLE IF NOT EXISTS buzon_leidos (id INTEGER PRIMARY KEY, ultimo_id INTEGER NOT NULL);
+
+-- Agregados de calificación por libro, mantenidos por triggers. Sin
+-- "INSERT OR IGNORE": el ON CONFLICT del UPSERT exterior lo anularía.
+CREATE TABLE IF NOT EXISTS rating_libros (
+    libro_id INTEGER PRIMARY KEY, cantidad INTEGER NOT NULL DEFAULT 0,
+    suma INTEGER NOT NULL DEFAULT 0, h1 INTEGER NOT NULL DEFAULT 0,
+    h2 INTEGER NOT NULL DEFAULT 0, h3 INTEGER NOT NULL DEFAULT 0,
+    h4 INTEGER NOT NULL DEFAULT 0, h5 INTEGER NOT NULL DEFAULT 0);
+CREATE TRIGGER IF NOT EXISTS trg_rating_insert AFTER INSERT ON resenas BEGIN
+    INSERT INTO rating_libros (libro_id)
+        SELECT NEW.libro_id WHERE NEW.rating BETWEEN 1 AND 5
+        AND NOT EXISTS (SELECT 1 FROM rating_libros WHERE libro_id = NEW.libro_id);
+    UPDATE rating_libros SET
+        cantidad = cantidad + 1, suma = suma + NEW.rating,
+        h1 = h1 + (NEW.rating = 1), h2 = h2 + (NEW.rating = 2), h3 = h3 + (NEW.rating = 3),
+        h4 = h4 + (NEW.rating = 4), h5 = h5 + (NEW.rating = 5)
+    WHERE libro_id = NEW.libro_id AND NEW.rating BETWEEN 1 AND 5;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_rating_update AFTER UPDATE OF libro_id, rating ON resenas BEGIN
+    UPDATE rating_libros SET
+        cantidad = cantidad - 1, suma = suma - OLD.rating,
+        h1 = h1 - (OLD.rating = 1), h2 = h2 - (OLD.rating = 2), h3 = h3 - (OLD.rating = 3),
+        h4 = h4 - (OLD.rating = 4), h5 = h5 - (OLD.rating = 5)
+    WHERE libro_id = OLD.libro_id AND OLD.rating BETWEEN 1 AND 5;
+    INSERT INTO rating_libros (libro_id)
+        SELECT NEW.libro_id WHERE NEW.rating BETWEEN 1 AND 5
+        AND NOT EXISTS (SELECT 1 FROM rating_libros WHERE libro_id = NEW.libro_id);
+    UPDATE rating_libros SET
+        cantidad = cantidad + 1, suma = suma + NEW.rating,
+        h1 = h1 + (NEW.rating = 1), h2 = h2 + (NEW.rating = 2), h3 = h3 + (NEW.rating = 3),
+        h4 = h4 + (NEW.rating = 4), h5 = h5 + (NEW.rating = 5)
+    WHERE libro_id = NEW.libro_id AND NEW.rating BETWEEN 1 AND 5;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_rating_delete AFTER DELETE ON resenas BEGIN
+    UPDATE rating_libros SET
+        cantidad = cantidad - 1, suma = suma - OLD.rating,
+        h1 = h1 - (OLD.rating = 1), h2 = h2 - (OLD.rating = 2), h3 = h3 - (OLD.rating = 3),
+        h4 = h4 - (OLD.rating = 4), h5 = h5 - (OLD.rating = 5)
+    WHERE libro_id = OLD.libro_id AND OLD.rating BETWEEN 1 AND 5;
+END;
+"""
+
+# Nombres de usuario únicos sin distinguir mayúsculas, con la misma
+# comparación que el backend JSON (clave_nombre: casefold, que también
+# iguala "Ñ" y "ñ"; COLLATE NOCASE solo pliega ASCII). El índice UNIQUE
+# impide que dos procesos registren el mismo nombre a la vez.
+INDICE_NOMBRES_SQLITE = """
+DROP INDEX IF EXISTS idx_usuarios_nombre;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_usuarios_nombre_clave ON usuarios (nombre_clave);
+"""
+
+RECONSTRUIR_RATING_SQLITE = """
+INSERT INTO rating_libros (libro_id, cantidad, suma, h1, h2, h3, h4, h5)
+SELECT libro_id, COUNT(*), SUM(rating),
+       SUM(rating = 1), SUM(rating = 2), SUM(rating = 3), SUM(rating = 4), SUM(rating = 5)
+FROM resenas WHERE libro_id IS NOT NULL AND rating BETWEEN 1 AND 5
+GROUP BY libro_id
+"""
+
+# Máximo de parámetros por consulta "IN (...)"
+TAMAÑO_LOTE_SQLITE = 500
+
+# Tabla de cada colección
+TABLAS = {'libros': 'libros', 'usuarios': 'usuarios', 'reseñas': 'resenas', 'compartidos': 'compartidos'}
+
+# Columnas de cada tabla (las claves del registro que no estén aquí no se guardan)
+COLUMNAS = {
+    'libros': ('id', 'titulo', 'autor', 'anio', 'genero'),
+    'usuarios': ('id', 'nombre', 'email', 'password', 'nombre_clave'),
+    'resenas': ('id', 'libro_id', 'usuario_id', 'rating', 'texto', 'fecha'),
+    'compartidos': ('id', 'de_usuario_id', 'a_usuario_id', 'libro_id', 'fecha', 'nota',
+                    'remitente', 'destinatario', 'libro_titulo', 'mensaje'),
+    'buzon_leidos': ('id', 'ultimo_id'),
+}
+
+
+# Columnas que arma el repositorio y no son parte del registro
+COLUMNAS_INTERNAS = {'nombre_clave'}
+
+
+def _fila_a_dict(cursor, fila):
+    # Las columnas vacías se omiten para que el dict se parezca al del JSON
+    return {col[0]: valor for col, valor in zip(cursor.description, fila)
+            if valor is not None and col[0] not in COLUMNAS_INTERNAS}
+
+
+def _valores(tabla, registro):
+    valores = [registro.get(c) for c in COLUMNAS[tabla]]
+    if tabla == 'usuarios':
+        valores[-1] = clave_nombre(registro['nombre']) if registro.get('nombre') else None
+    return valores
+
+
+def _sin_nombres_repetidos(filas):
+    # Datos viejos con el mismo nombre dos veces: solo el primero conserva la clave
+    vistas = set()
+    for fila in filas:
+        if fila[-1] in vistas:
+            fila[-1] = None
+        vistas.add(fila[-1])
+        yield fila
+
+
+class RepositorioSQLite(Repositorio):
+    """Base sqlite3: cada consulta usa un índice en lugar de recorrer listas."""
+
+    def __init__(self, ruta_db):
+        # Flet atiende eventos desde varios hilos: una conexión compartida con lock
+        self._con = sqlite3.connect(ruta_db, check_same_thread=False)
+        self._con.row_factory = _fila_a_dict
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute("PRAGMA synchronous=NORMAL")
+        self._con.executescript(ESQUEMA_SQLITE)
+        self._lock = threading.Lock()
+        self._version_datos = self._uno("PRAGMA data_version")['data_version']
+        # Las recomendaciones no siguen lo que guardan otros procesos: eso
+        # entra en la próxima corrida por lotes
+        self._ruta_recomendaciones = ruta_recomendaciones(os.path.dirname(ruta_db))
+        self.cache_detalles = CacheDetalles()
+        self._migrar_nombres()
+        with self._con:
+            # Bases creadas antes de existir rating_libros: se llena una vez
+            vacia = self._con.execute("SELECT COUNT(*) AS n FROM rating_libros").fetchone()['n'] == 0
+            if vacia:
+                self._con.execute(RECONSTRUIR_RATING_SQLITE)
+
+    @medido('sqlite.consulta')
+    def _consultar(self, sql, parametros=()):
+        with self._lock:
+            return self._con.execute(sql, parametros).fetchall()
+
+    def _uno(self, sql, parametros=()):
+        filas = self._consultar(sql, parametros)
+        return filas[0] if filas else None
+
+    def libros(self):
+        return self._consultar("SELECT * FROM libros ORDER BY id")
+
+    def iterar_libros(self, tamaño_lote=TAMAÑO_LOTE_SQLITE):
+        return self._iterar_tabla('libros', tamaño_lote)
+
+    def iterar_reseñas(self, tamaño_lote=TAMAÑO_LOTE_SQLITE):
+        return self._iterar_tabla('resenas', tamaño_lote)
+
+    def _iterar_tabla(self, tabla, tamaño_lote):
+        # Por lotes de id: no se bloquea la conexión durante todo el recorrido
+        ultimo_id = None
+        while True:
+            if ultimo_id is None:
+                lote = self._consultar(f"SELECT * FROM {tabla} ORDER BY id LIMIT ?", (tamaño_lote,))
+            else:
+                lote = self._consultar(f"SELECT * FROM {tabla} WHERE id > ? ORDER BY id LIMIT ?",
+                                       (ultimo_id, tamaño_lote))
+            yield from lote
+            if len(lote) < tamaño_lote:
+                return
+            ultimo_id = lote[-1]['id']
+
+    def usuarios(self):
+        return self._consultar("SELECT * FROM usuarios ORDER BY id")
+
+    def reseñas(self):
+        return self._consultar("SELECT * FROM resenas ORDER BY id")
+
+    def compartidos(self):
+        return self._consultar("SELECT * FROM compartidos ORDER BY id")
+
+    def libro(self, libro_id):
+        return self._uno("SELECT * FROM libros WHERE id = ?", (libro_id,))
+
+    def usuario(self, usuario_id):
+        return self._uno("SELECT * FROM usuarios WHERE id = ?", (usuario_id,))
+
+    def _migrar_nombres(self):
+        # Bases creadas antes de nombre_clave: se agrega y se llena una vez.
+        # Si ya había nombres repetidos, el del id menor conserva la clave
+        # (como en el índice del backend JSON) y el resto queda sin login
+        with self._lock, self._con:
+            columnas = {f['name'] for f in self._con.execute("PRAGMA table_info(usuarios)").fetchall()}
+            if 'nombre_clave' not in columnas:
+                self._con.execute("ALTER TABLE usuarios ADD COLUMN nombre_clave TEXT")
+            filas = self._con.execute("SELECT id, nombre FROM usuarios WHERE nombre_clave IS NULL "
+                                      "AND nombre IS NOT NULL AND nombre != '' ORDER BY id").fetchall()
+            if filas:
+                usadas = {f['clave'] for f in self._con.execute(
+                    "SELECT nombre_clave AS clave FROM usuarios WHERE nombre_clave IS NOT NULL").fetchall()}
+                claves = []
+                for f in filas:
+                    clave = clave_nombre(f['nombre'])
+                    if clave not in usadas:
+                        usadas.add(clave)
+                        claves.append((clave, f['id']))
+                self._con.executemany("UPDATE usuarios SET nombre_clave = ? WHERE id = ?", claves)
+            self._con.executescript(INDICE_NOMBRES_SQLITE)
+
+    def usuario_por_nombre(self, nombre):
+        return self._uno("SELECT * FROM usuarios WHERE nombre_clave = ?", (clave_nombre(nombre),))
+
+    def reseñas_de(self, libro_id):
+        return self._consultar("SELECT * FROM resenas WHERE libro_id = ? ORDER BY id", (libro_id,))
+
+    def compartidos_de(self, libro_id):
+        return self._consultar("SELECT * FROM compartidos WHERE libro_id = ? ORDER BY id", (libro_id,))
+
+    def reseña_de(self, libro_id, usuario_id):
+        return self._uno("SELECT * FROM resenas WHERE libro_id = ? AND usuario_id = ? "
+                         "ORDER BY id LIMIT 1", (libro_id, usuario_id))
+
+    def ids_existentes(self, coleccion, ids):
+        ids = list(ids)
+        existentes = set()
+        for inicio in range(0, len(ids), TAMAÑO_LOTE_SQLITE):
+            lote = ids[inicio:inicio + TAMAÑO_LOTE_SQLITE]
+            filas = self._consultar(f"SELECT id FROM {TABLAS[coleccion]} "
+                                    f"WHERE id IN ({', '.join('?' for _ in lote)})", lote)
+            existentes.update(fila['id'] for fila in filas)
+        return existentes
+
+    def reseñas_por_id(self, ids):
+        ids = list(ids)
+        encontradas = {}
+        for inicio in range(0, len(ids), TAMAÑO_LOTE_SQLITE):
+            lote = ids[inicio:inicio + TAMAÑO_LOTE_SQLITE]
+            filas = self._consultar(f"SELECT * FROM resenas "
+                                    f"WHERE id IN ({', '.join('?' for _ in lote)})", lote)
+            encontradas.update((fila['id'], fila) for fila in filas)
+        return encontradas
+
+    def rating_de(self, libro_id):
+        fila = self._uno("SELECT * FROM rating_libros WHERE libro_id = ?", (libro_id,))
+        resumen = resumen_vacio()
+        if fila and fila['cantidad']:
+            resumen['cantidad'] = fila['cantidad']
+            resumen['suma'] = fila['suma']
+            resumen['promedio'] = calcular_promedio_agregado(fila['cantidad'], fila['suma'])
+            for estrellas in resumen['histograma']:
+                resumen['histograma'][estrellas] = fila[f'h{estrellas}']
+        return resumen
+
+    def promedios(self, libro_ids):
+        libro_ids = list(libro_ids)
+        promedios = dict.fromkeys(libro_ids, 0)
+        for inicio in range(0, len(libro_ids), TAMAÑO_LOTE_SQLITE):
+            lote = libro_ids[inicio:inicio + TAMAÑO_LOTE_SQLITE]
+            filas = self._consultar(
+                f"SELECT libro_id, cantidad, suma FROM rating_libros "
+                f"WHERE libro_id IN ({', '.join('?' for _ in lote)})", lote)
+            for fila in filas:
+                promedios[fila['libro_id']] = calcular_promedio_agregado(fila['cantidad'], fila['suma'])
+        return promedios
+
+    def guardar_usuario(self, usuario):
+        self._verificar_nombre_libre(usuario)
+        anterior = self.usuario(usuario['id']) if usuario.get('id') is not None else None
+        try:
+            usuario = self._guardar('usuarios', usuario)
+        except sqlite3.IntegrityError:
+            # Otro proceso lo registró entre la verificación y el INSERT
+            raise UsuarioDuplicado(f"Ya existe el usuario '{usuario.get('nombre')}'") from None
+        if anterior is not None and anterior.get('nombre') != usuario.get('nombre'):
+            self.cache_detalles.vaciar()  # el nombre aparece en los detalles
+        return usuario
+
+    def guardar_reseña(self, reseña):
+        reseña = self._guardar('resenas', reseña)
+        self._al_guardar_en_libro(reseña)
+        if self._motor is not None:
+            self._motor.registrar_reseña(reseña)
+        return reseña
+
+    def guardar_compartido(self, comp):
+        comp = self._guardar('compartidos', comp)
+        self._al_guardar_en_libro(comp)
+        if self._motor is not None:
+            self._motor.registrar_compartido(comp)
+        return comp
+
+    def refrescar(self):
+        # SQLite ya coordina a los procesos; solo hay que saber si otro escribió
+        version = self._uno("PRAGMA data_version")['data_version']
+        if version == self._version_datos:
+            return set()
+        self._version_datos = version
+        self.cache_detalles.vaciar()  # no se sabe qué libros tocó el otro proceso
+        return set(ARCHIVOS)
+
+    # Los compartidos viejos de interfaz.py solo traen el nombre del destinatario
+    FILTRO_BUZON = "(a_usuario_id = ? OR (a_usuario_id IS NULL AND destinatario = ?))"
+
+    def _id_por_nombre(self, nombre):
+        usuario = self.usuario_por_nombre(nombre)
+        return usuario['id'] if usuario else None
+
+    def _filtro_buzon(self, usuario_id):
+        usuario = self.usuario(usuario_id)
+        return (usuario_id, usuario.get('nombre') if usuario else None)
+
+    def buzon(self, usuario_id, pagina=0, tamaño=TAMAÑO_PAGINA_BUZON):
+        return self._consultar(
+            f"SELECT * FROM compartidos WHERE {self.FILTRO_BUZON} ORDER BY id DESC LIMIT ? OFFSET ?",
+            self._filtro_buzon(usuario_id) + (tamaño, pagina * tamaño))
+
+    def no_leidos(self, usuario_id):
+        # Con los índices (a_usuario_id, id) y (destinatario, id) se cuentan
+        # solo los posteriores a la marca, no todo el buzón
+        fila = self._uno(
+            f"SELECT COUNT(*) AS n FROM compartidos WHERE {self.FILTRO_BUZON} AND id > "
+            f"COALESCE((SELECT ultimo_id FROM buzon_leidos WHERE id = ?), 0)",
+            self._filtro_buzon(usuario_id) + (usuario_id,))
+        return fila['n']
+
+    def marcar_leidos(self, usuario_id):
+        # La marca no retrocede: otro proceso pudo haber visto más
+        filtro = self._filtro_buzon(usuario_id)
+        with self._lock, self._con:
+            self._con.execute(
+                f"INSERT INTO buzon_leidos (id, ultimo_id) "
+                f"SELECT * FROM (SELECT ? AS id, MAX(id) AS ultimo_id FROM compartidos "
+                f"WHERE {self.FILTRO_BUZON}) WHERE ultimo_id IS NOT NULL "
+                f"ON CONFLICT(id) DO UPDATE SET ultimo_id = MAX(ultimo_id, excluded.ultimo_id)",
+                (usuario_id,) + filtro)
+
+    def _sql_guardar(self, tabla):
+        # UPSERT en vez de INSERT OR REPLACE: el UPDATE dispara los triggers
+        # de rating con los valores viejos (REPLACE borraría sin avisarlos)
+        columnas = COLUMNAS[tabla]
+        return (f"INSERT INTO {tabla} ({', '.join(columnas)}) "
+                f"VALUES ({', '.join('?' for _ in columnas)}) "
+                f"ON CONFLICT(id) DO UPDATE SET "
+                + ', '.join(f"{c} = excluded.{c}" for c in columnas if c != 'id'))
+
+    @medido('datos.guardar')
+    def _guardar(self, tabla, registro):
+        with self._lock, self._con:
+            cursor = self._con.execute(self._sql_guardar(tabla), _valores(tabla, registro))
+        registro.setdefault('id', cursor.lastrowid)
+        return registro
+
+    def insertar_lote(self, tabla, registros):
+        """Inserta muchos registros en una sola transacción (para migraciones)."""
+        sql = self._sql_guardar(tabla)
+        filas = (_valores(tabla, r) for r in registros)
+        if tabla == 'usuarios':
+            filas = _sin_nombres_repetidos(filas)
+        with self._lock, self._con:
+            self._con.executemany(sql, filas)
+
+    @contextmanager
+    def importacion(self, coleccion):
+        if coleccion == 'libros':
+            yield self._importar_libros
+        elif coleccion == 'reseñas':
+            try:
+                yield self._importar_reseñas
+            finally:
+                self._terminar_importacion()
+        else:
+            raise ValueError(f"No se puede importar '{coleccion}'")
+
+    @medido('datos.importar_lote')
+    def _importar_libros(self, libros):
+        self.insertar_lote('libros', libros)
+        return len(libros), 0
+
+    @medido('datos.importar_lote')
+    def _importar_reseñas(self, reseñas):
+        # Las que ya existen (por id, o por libro y usuario) se actualizan
+        # con su id: el UPSERT dispara los triggers de rating con el valor
+        # viejo. El UPSERT reemplaza la fila entera, así que se parte de la
+        # guardada para conservar los campos que el archivo no trae.
+        por_id = self.reseñas_por_id([r['id'] for r in reseñas if r.get('id') is not None])
+        libro_ids = sorted({r['libro_id'] for r in reseñas if r.get('id') not in por_id})
+        existentes = {}
+        for inicio in range(0, len(libro_ids), TAMAÑO_LOTE_SQLITE):
+            lote = libro_ids[inicio:inicio + TAMAÑO_LOTE_SQLITE]
+            # Del id mayor al menor: gana la primera reseña, igual que reseña_de
+            filas = self._consultar(f"SELECT * FROM resenas "
+                                    f"WHERE libro_id IN ({', '.join('?' for _ in lote)}) "
+                                    f"ORDER BY id DESC", lote)
+            existentes.update(((f['libro_id'], f.get('usuario_id')), f) for f in filas)
+
+        registros, por_par = [], {}
+        actualizadas = 0
+        for datos in reseñas:
+            par = (datos['libro_id'], datos['usuario_id'])
+            if datos.get('id') in por_id:
+                datos = dict(por_id[datos['id']], **datos)
+                actualizadas += 1
+            elif par in existentes:
+                datos = dict(existentes[par], **{k: v for k, v in datos.items() if k != 'id'})
+                actualizadas += 1
+            elif par in por_par:
+                # Repetida dentro del lote: se queda la última versión
+                por_par[par].update(datos)
+                actualizadas += 1
+                continue
+            else:
+                datos = por_par[par] = completar_reseña(datos)
+            registros.append(datos)
+        self.insertar_lote('resenas', registros)
+        self._importar_señales(registros)
+        return len(reseñas) - actualizadas, actualizadas
+
+    def cerrar(self):
+        with self._lock:
+            self._con.close()
+
+
+# --- Cambios de otros procesos ---
+
+INTERVALO_VIGILANCIA = 1.0
+
+
+class VigilanteCambios:
+    """
+    Llama a repo.refrescar() cada `intervalo` segundos desde un hilo aparte y
+    avisa a los suscriptores cuando otro proceso cambió algo.
+    """
+
+    def __init__(self, repo, intervalo=INTERVALO_VIGILANCIA):
+        self.repo = repo
+        self.intervalo = intervalo
+        self._suscriptores = []
+        self._lock = threading.Lock()
+        self._detenido = threading.Event()
+
+    def suscribir(self, funcion):
+        """funcion(colecciones) se llama desde el hilo del vigilante."""
+        with self._lock:
+            self._suscriptores.append(funcion)
+
+    def desuscribir(self, funcion):
+        with self._lock:
+            if funcion in self._suscriptores:
+                self._suscriptores.remove(funcion)
+
+    def iniciar(self):
+        threading.Thread(target=self._vigilar, daemon=True).start()
+        return self
+
+    def detener(self):
+        self._detenido.set()
+
+    def _vigilar(self):
+        while not self._detenido.wait(self.intervalo):
+            try:
+                cambiadas = self.repo.refrescar()
+            except Exception as e:
+                print(f"Error al leer cambios: {e}")
+                continue
+            if cambiadas:
+                with self._lock:
+                    suscriptores = list(self._suscriptores)
+                for funcion in suscriptores:
+                    funcion(cambiadas)
+
+
+# --- Selección y migración ---
+
+@medido('datos.abrir')
+def abrir_repositorio(ruta_datos, backend=None):
+    """Abre el repositorio configurado (por defecto, los archivos JSON)."""
+    backend = backend or os.environ.get('READERS_BAY_BACKEND', 'json')
+    if backend == 'sqlite':
+        return RepositorioSQLite(os.path.join(ruta_datos, ARCHIVO_SQLITE))
+    if backend == 'json':
+        return RepositorioJSON(ruta_datos)
+    raise ValueError(f"Backend desconocido: {backend}")
+
+
+def migrar_json_a_sqlite(ruta_datos, ruta_db=None):
+    """Copia todos los datos JSON (snapshot + log) a una base SQLite."""
+    origen = RepositorioJSON(ruta_datos)
+    destino = RepositorioSQLite(ruta_db or os.path.join(ruta_datos, ARCHIVO_SQLITE))
+    try:
+        destino.insertar_lote('libros', origen.libros())
+        destino.insertar_lote('usuarios', origen.usuarios())
+        destino.insertar_lote('resenas', origen.reseñas())
+        destino.insertar_lote('compartidos', origen.compartidos())
+        destino.insertar_lote('buzon_leidos', origen._leidos.values())
+    finally:
+        origen.cerrar()
+        destino.cerrar()
@@ -0,0 +1,292 @@
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from readers_bay import operaciones
+from readers_bay.busqueda import PESOS_CAMPOS
+from readers_bay.instrumentacion import medido
+from readers_bay.registros import a_json
+
+# --- Servidor HTTP/JSON local ---
+# Expone las operaciones del club (readers_bay/operaciones.py) a muchos clientes a la
+# vez, sin UI. HTTP/1.1 con conexiones persistentes (keep-alive) sobre
+# asyncio, sin dependencias externas. Las operaciones trabajan sobre los
+# índices en memoria y el guardado a disco va a la cola del escritor, así
+# que las lecturas se atienden directamente en el loop; las escrituras van a
+# un hilo aparte, porque pueden esperar el flock que reparte los ids o a
+# que la cola del escritor tenga lugar. Con SQLite cada consulta va al
+# disco y todo se atiende en un grupo de hilos aparte.
+#
+#   GET  /libros?q=garcia&campos=autor&limite=30   búsqueda
+#   GET  /libros/<id>                              detalle + rating + reseñas + "también les gustó"
+#   PUT  /resenas   {"libro_id", "usuario_id", "rating", "texto"}   alta o edición
+#   POST /compartidos {"libro_id", "de_usuario_id", "a_usuario_id", "nota"}
+#   POST /lote      {"operaciones": [{"metodo", "ruta", "cuerpo"}, ...]}
+#   GET  /estadisticas                             caché de detalles y cola de escritura
+#
+# Uso: python servidor.py --datos data --puerto 8080
+
+PUERTO = 8080
+TIEMPO_INACTIVO = 30      # segundos sin pedidos antes de cerrar una conexión
+MAXIMO_CUERPO = 1 << 20
+MAXIMO_LOTE = 500
+MAXIMO_LIMITE = 500       # libros por búsqueda
+HILOS_SQLITE = 4
+# Las escrituras JSON se turnan de todos modos en el lock del repositorio
+HILOS_ESCRITURA_JSON = 1
+MOTIVOS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 413: 'Payload Too Large', 422: 'Unprocessable Entity',
+           500: 'Internal Server Error'}
+
+
+class ErrorHTTP(Exception):
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+def _entero(valor, campo):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ErrorHTTP(422, f"'{campo}' debe ser un número") from None
+
+
+def _rating(valor):
+    # int() aceptaría true o 4.9 (truncado): igual que en importacion.py, se rechazan
+    if isinstance(valor, bool) or not isinstance(valor, (int, float, str)) \
+            or (isinstance(valor, float) and not valor.is_integer()):
+        raise ErrorHTTP(422, "El rating debe ser un número entre 1 y 5")
+    return valor
+
+
+def _texto(valor, campo):
+    if valor is None:
+        return ''
+    if not isinstance(valor, str):
+        raise ErrorHTTP(422, f"'{campo}' debe ser texto")
+    return valor
+
+
+class ServidorClub:
+    """Atiende los pedidos HTTP sobre un repositorio y su índice de búsqueda."""
+
+    def __init__(self, repo, indice_busqueda, ejecutor=None, lecturas_en_loop=False):
+        self.repo = repo
+        self.indice_busqueda = indice_busqueda
+        # Con un ejecutor, despachar() corre en sus hilos en vez de en el
+        # loop; con lecturas_en_loop, solo lo que no es GET
+        self.ejecutor = ejecutor
+        self.lecturas_en_loop = lecturas_en_loop
+        self.atendidos = 0
+
+    # --- Rutas ---
+
+    @medido('servidor.despachar')
+    def despachar(self, metodo, ruta, cuerpo):
+        """Devuelve (estado, datos) para un pedido ya leído."""
+        url = urlsplit(ruta)
+        partes = [unquote(p) for p in url.path.strip('/').split('/') if p]
+        try:
+            if partes == ['libros'] and metodo == 'GET':
+                return self._buscar(parse_qs(url.query))
+            if len(partes) == 2 and partes[0] == 'libros' and metodo == 'GET':
+                detalle = operaciones.detalle_libro(self.repo, _entero(partes[1], 'id'))
+                if detalle is None:
+                    raise ErrorHTTP(404, f"No existe el libro {partes[1]}")
+                return 200, detalle
+            if partes in (['resenas'], ['reseñas']) and metodo in ('PUT', 'POST'):
+                return self._guardar_reseña(cuerpo)
+            if partes == ['compartidos'] and metodo == 'POST':
+                return self._compartir(cuerpo)
+            if partes == ['lote'] and metodo == 'POST':
+                return self._lote(cuerpo)
+            if partes == ['estadisticas'] and metodo == 'GET':
+                return 200, {'atendidos': self.atendidos,
+                             'cache_detalles': self.repo.cache_detalles.estadisticas(),
+                             'escritura': self.repo.metricas_escritura()}
+            if partes and partes[0] in ('libros', 'resenas', 'reseñas', 'compartidos', 'lote',
+                                        'estadisticas'):
+                raise ErrorHTTP(405, f"Método {metodo} no permitido en /{'/'.join(partes)}")
+            raise ErrorHTTP(404, f"Ruta desconocida: {url.path}")
+        except ErrorHTTP as e:
+            return e.estado, {'error': str(e)}
+        except ValueError as e:
+            return 422, {'error': str(e)}
+
+    def _buscar(self, parametros):
+        consulta = parametros.get('q', [''])[0]
+        campos = tuple(parametros['campos'][0].split(',')) if 'campos' in parametros else None
+        desconocidos = [campo for campo in campos or () if campo not in PESOS_CAMPOS]
+        if desconocidos:
+            raise ErrorHTTP(400, f"Campos desconocidos: {', '.join(desconocidos)} "
+                                 f"(se puede buscar por {', '.join(PESOS_CAMPOS)})")
+        limite = _entero(parametros.get('limite', ['30'])[0], 'limite')
+        if not 1 <= limite <= MAXIMO_LIMITE:
+            raise ErrorHTTP(400, f"'limite' debe estar entre 1 y {MAXIMO_LIMITE}")
+        libros = operaciones.buscar_libros(self.indice_busqueda, consulta, campos, limite)
+        promedios = self.repo.promedios([l['id'] for l in libros])
+        return 200, {'libros': [dict(l, promedio=promedios[l['id']]) for l in libros]}
+
+    def _guardar_reseña(self, cuerpo):
+        datos = self._objeto(cuerpo)
+        reseña, creada = operaciones.guardar_reseña(
+            self.repo, _entero(datos.get('libro_id'), 'libro_id'),
+            _entero(datos.get('usuario_id'), 'usuario_id'),
+            _rating(datos.get('rating')), _texto(datos.get('texto', ''), 'texto'), datos.get('fecha'))
+        return (201 if creada else 200), {'reseña': reseña}
+
+    def _compartir(self, cuerpo):
+        datos = self._objeto(cuerpo)
+        comp = operaciones.compartir_libro(
+            self.repo, _entero(datos.get('libro_id'), 'libro_id'),
+            _entero(datos.get('de_usuario_id'), 'de_usuario_id'),
+            _entero(datos.get('a_usuario_id'), 'a_usuario_id'),
+            _texto(datos.get('nota'), 'nota'), datos.get('fecha'))
+        return 201, {'compartido': comp}
+
+    def _lote(self, cuerpo):
+        """Varias operaciones en un solo pedido: un viaje de red en vez de muchos."""
+        pedidos = self._objeto(cuerpo).get('operaciones')
+        if not isinstance(pedidos, list):
+            raise ErrorHTTP(422, "'operaciones' debe ser una lista")
+        if len(pedidos) > MAXIMO_LOTE:
+            raise ErrorHTTP(413, f"Máximo {MAXIMO_LOTE} operaciones por lote")
+        resultados = []
+        for pedido in pedidos:
+            if not isinstance(pedido, dict) or str(pedido.get('ruta', '')).strip('/').startswith('lote'):
+                resultados.append({'estado': 400, 'cuerpo': {'error': "Operación inválida"}})
+                continue
+            estado, datos = self.despachar(str(pedido.get('metodo', 'GET')).upper(),
+                                           str(pedido.get('ruta', '')), pedido.get('cuerpo'))
+            resultados.append({'estado': estado, 'cuerpo': datos})
+        return 200, {'resultados': resultados}
+
+    @staticmethod
+    def _objeto(cuerpo):
+        if not isinstance(cuerpo, dict):
+            raise ErrorHTTP(400, "Se esperaba un objeto JSON")
+        return cuerpo
+
+    # --- HTTP ---
+
+    async def atender(self, lector, escritor):
+        """Una conexión: pedidos uno tras otro mientras el cliente la mantenga abierta."""
+        try:
+            while True:
+                try:
+                    cabecera = await asyncio.wait_for(lector.readuntil(b'\r\n\r\n'), TIEMPO_INACTIVO)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self._responder(escritor, 400, {'error': "Cabecera demasiado larga"}, False)
+                    return
+
+                lineas = cabecera.decode('latin-1').split('\r\n')
+                try:
+                    metodo, ruta, version = lineas[0].split(' ', 2)
+                except ValueError:
+                    await self._responder(escritor, 400, {'error': "Pedido mal formado"}, False)
+                    return
+                cabeceras = {}
+                for linea in lineas[1:]:
+                    if ':' in linea:
+                        nombre, valor = linea.split(':', 1)
+                        cabeceras[nombre.strip().lower()] = valor.strip()
+
+                conexion = cabeceras.get('connection', '').lower()
+                seguir = conexion != 'close' if version == 'HTTP/1.1' else conexion == 'keep-alive'
+
+                try:
+                    largo = int(cabeceras.get('content-length', 0) or 0)
+                except ValueError:
+                    await self._responder(escritor, 400, {'error': "Content-Length inválido"}, False)
+                    return
+                if largo > MAXIMO_CUERPO:
+                    await self._responder(escritor, 413, {'error': "Cuerpo demasiado grande"}, False)
+                    return
+                cuerpo = None
+                if largo:
+                    try:
+                        cuerpo = json.loads(await lector.readexactly(largo))
+                    except asyncio.IncompleteReadError:
+                        return
+                    except ValueError:
+                        await self._responder(escritor, 400, {'error': "JSON inválido"}, seguir)
+                        if not seguir:
+                            return
+                        continue
+
+                try:
+                    if self.ejecutor is None or (self.lecturas_en_loop and metodo.upper() == 'GET'):
+                        estado, datos = self.despachar(metodo.upper(), ruta, cuerpo)
+                    else:
+                        estado, datos = await asyncio.get_running_loop().run_in_executor(
+                            self.ejecutor, self.despachar, metodo.upper(), ruta, cuerpo)
+                except Exception as e:
+                    print(f"Error atendiendo {metodo} {ruta}: {e}")
+                    estado, datos = 500, {'error': "Error interno"}
+                self.atendidos += 1
+                await self._responder(escritor, estado, datos, seguir)
+                if not seguir:
+                    return
+        finally:
+            escritor.close()
+
+    @staticmethod
+    async def _responder(escritor, estado, datos, seguir):
+        cuerpo = json.dumps(datos, ensure_ascii=False, default=a_json).encode('utf-8')
+        escritor.write(
+            f"HTTP/1.1 {estado} {MOTIVOS.get(estado, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(cuerpo)}\r\n"
+            f"Connection: {'keep-alive' if seguir else 'close'}\r\n\r\n".encode('latin-1') + cuerpo)
+        try:
+            await escritor.drain()
+        except ConnectionError:
+            pass
+
+
+async def servir(ruta_datos, host='127.0.0.1', puerto=PUERTO, backend=None, listo=None):
+    """Carga los datos y atiende hasta que se cancele la tarea."""
+    from readers_bay.busqueda import IndiceBusqueda
+    from readers_bay.repositorio import RepositorioSQLite, VigilanteCambios, abrir_repositorio
+
+    repo = abrir_repositorio(ruta_datos, backend)
+    # main.py e interfaz.py pueden estar guardando en la misma carpeta
+    vigilante = VigilanteCambios(repo).iniciar()
+    en_disco = isinstance(repo, RepositorioSQLite)
+    ejecutor = ThreadPoolExecutor(HILOS_SQLITE if en_disco else HILOS_ESCRITURA_JSON)
+    try:
+        repo.preparar_recomendaciones()
+        servidor_club = ServidorClub(repo, IndiceBusqueda(repo.libros()), ejecutor,
+                                     lecturas_en_loop=not en_disco)
+        servidor = await asyncio.start_server(servidor_club.atender, host, puerto, backlog=1024)
+        print(f"Readers Bay API en http://{host}:{puerto}")
+        if listo is not None:
+            listo.set()
+        async with servidor:
+            await servidor.serve_forever()
+    finally:
+        vigilante.detener()
+        ejecutor.shutdown()
+        repo.cerrar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor HTTP/JSON del club de libros.")
+    parser.add_argument('--datos', default='data')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=PUERTO)
+    parser.add_argument('--backend', choices=('json', 'sqlite'))
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(servir(args.datos, args.host, args.puerto, args.backend))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
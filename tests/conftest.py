@@ -0,0 +1,49 @@
+import json
+import os
+import sys
+
+import pytest
+
+# Los tests importan readers_bay y servidor.py desde la raíz del repositorio
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+LIBROS = [
+    {"id": 1, "titulo": "Cien Años de Soledad", "autor": "Gabriel García Márquez", "anio": 1967, "genero": "Realismo Mágico"},
+    {"id": 2, "titulo": "Rayuela", "autor": "Julio Cortázar", "anio": 1963, "genero": "Novela"},
+    {"id": 3, "titulo": "Doña Bárbara", "autor": "Rómulo Gallegos", "anio": 1929, "genero": "Novela"},
+]
+USUARIOS = [
+    {"id": 1, "nombre": "Ana", "email": "ana@email.com", "password": "123"},
+    {"id": 2, "nombre": "Beto", "email": "beto@email.com", "password": "456"},
+    {"id": 3, "nombre": "Ñañez", "email": "nanez@email.com", "password": "789"},
+    {"id": 4, "nombre": "Dora", "email": "dora@email.com", "password": "000"},
+]
+RESEÑAS = [
+    {"id": 1, "libro_id": 1, "usuario_id": 1, "rating": 5, "texto": "Me encantó", "fecha": "2025-01-01"},
+    {"id": 2, "libro_id": 1, "usuario_id": 2, "rating": 4, "texto": "Muy bueno", "fecha": "2025-01-02"},
+    {"id": 3, "libro_id": 2, "usuario_id": 1, "rating": 2, "texto": "Regular", "fecha": "2025-01-03"},
+]
+# Como en data/: compartidos viejos sin id, con nombres en vez de ids
+COMPARTIDOS = [
+    {"id": 1, "de_usuario_id": 1, "a_usuario_id": 4, "libro_id": 1, "fecha": "2025-01-04", "nota": "hola"},
+    {"remitente": "Beto", "destinatario": "Dora", "libro_titulo": "Rayuela", "mensaje": "léelo",
+     "fecha": "05/01/2025 10:00"},
+    {"remitente": "Ana", "destinatario": "Dora", "libro_titulo": "Rayuela", "mensaje": "léelo",
+     "fecha": "05/01/2025 10:00"},
+]
+
+
+def escribir_datos(ruta):
+    os.makedirs(ruta, exist_ok=True)
+    for archivo, registros in (('libros.json', LIBROS), ('usuarios.json', USUARIOS),
+                               ('reseñas.json', RESEÑAS), ('compartidos.json', COMPARTIDOS)):
+        with open(os.path.join(ruta, archivo), 'w', encoding='utf-8') as f:
+            json.dump(registros, f, ensure_ascii=False, indent=4)
+    return str(ruta)
+
+
+@pytest.fixture
+def ruta_datos(tmp_path):
+    return escribir_datos(tmp_path / 'data')
@@ -0,0 +1,139 @@
+import json
+import os
+import subprocess
+import sys
+
+from conftest import RAIZ
+
+from readers_bay.almacen import AlmacenLog
+from readers_bay.repositorio import RepositorioJSON
+
+
+def correr(codigo, *argumentos):
+    """Corre `codigo` en otro proceso de Python, como otra ventana o main.py."""
+    subprocess.run([sys.executable, '-c', codigo, *map(str, argumentos)], check=True, cwd=RAIZ)
+
+
+def leer(ruta):
+    with open(ruta, encoding='utf-8') as f:
+        return json.load(f)
+
+
+AGREGAR_COMPARTIDO_Y_COMPACTAR = """
+import sys
+from readers_bay.repositorio import RepositorioJSON
+repo = RepositorioJSON(sys.argv[1])
+repo.guardar_compartido({'de_usuario_id': 2, 'a_usuario_id': 4, 'libro_id': 3, 'nota': 'otro proceso'})
+repo.sincronizar()
+repo._almacenes['compartidos'].compactar()
+repo.cerrar()
+"""
+
+EDITAR_RESEÑA_Y_COMPACTAR = """
+import sys
+from readers_bay.repositorio import RepositorioJSON
+repo = RepositorioJSON(sys.argv[1])
+reseña = repo.reseña_de(int(sys.argv[2]), int(sys.argv[3]))
+reseña['rating'] = int(sys.argv[4])
+repo.guardar_reseña(reseña)
+repo.sincronizar()
+repo._almacenes['reseñas'].compactar()
+repo.cerrar()
+"""
+
+AGREGAR_REGISTROS = """
+import sys
+from readers_bay.almacen import AlmacenLog
+almacen = AlmacenLog(sys.argv[1], minimo_compactacion=10)
+almacen.cargar()
+for i in range(int(sys.argv[3])):
+    registro = {'id': almacen.nuevo_id(), 'proceso': sys.argv[2], 'orden': i}
+    almacen.datos.append(registro)
+    almacen.guardar(registro)
+almacen.cerrar()
+"""
+
+
+def test_los_registros_sin_id_reciben_uno_al_cargar(ruta_datos):
+    repo = RepositorioJSON(ruta_datos)
+    try:
+        ids = [c['id'] for c in repo.compartidos()]
+        assert len(ids) == 3 and len(set(ids)) == 3
+        # Quedan en disco: otro proceso ve los mismos ids
+        assert [c['id'] for c in leer(os.path.join(ruta_datos, 'compartidos.json'))] == ids
+    finally:
+        repo.cerrar()
+
+
+def test_compactacion_de_otro_proceso_no_duplica(ruta_datos):
+    repo = RepositorioJSON(ruta_datos)
+    try:
+        buzon_antes = len(repo.buzon(4))
+        correr(AGREGAR_COMPARTIDO_Y_COMPACTAR, ruta_datos)
+        assert repo.refrescar() == {'compartidos'}
+        assert len(repo.compartidos()) == 4
+        assert len(repo.buzon(4)) == buzon_antes + 1
+
+        # Una compactación propia después no arrastra copias
+        repo.guardar_compartido({'de_usuario_id': 1, 'a_usuario_id': 4, 'libro_id': 2})
+        repo.sincronizar()
+        repo._almacenes['compartidos'].compactar()
+        guardados = leer(os.path.join(ruta_datos, 'compartidos.json'))
+        assert len(guardados) == 5
+        assert len({c['id'] for c in guardados}) == 5
+    finally:
+        repo.cerrar()
+
+
+def test_cambios_de_otro_proceso_llegan_a_los_agregados(ruta_datos):
+    repo = RepositorioJSON(ruta_datos)
+    try:
+        assert repo.rating_de(2)['promedio'] == 2
+        detalle_viejo = repo.cache_detalles.obtener(2, lambda: 'viejo')
+        assert detalle_viejo == 'viejo'
+        correr(EDITAR_RESEÑA_Y_COMPACTAR, ruta_datos, 2, 1, 5)
+        repo.refrescar()
+        assert repo.reseña_de(2, 1)['rating'] == 5
+        assert repo.rating_de(2)['cantidad'] == 1
+        assert repo.rating_de(2)['promedio'] == 5
+        # El detalle del libro se invalidó
+        assert repo.cache_detalles.obtener(2, lambda: 'nuevo') == 'nuevo'
+    finally:
+        repo.cerrar()
+
+
+def test_escritura_propia_gana_y_se_avisa(ruta_datos):
+    # Otro proceso edita la misma reseña antes de que se escriba la nuestra:
+    # en memoria queda lo nuestro y los agregados lo reflejan
+    repo = RepositorioJSON(ruta_datos, escritura_en_fondo=False)
+    try:
+        reseña = repo.reseña_de(1, 2)
+        correr(EDITAR_RESEÑA_Y_COMPACTAR, ruta_datos, 1, 2, 1)
+        reseña['rating'] = 3
+        repo.guardar_reseña(reseña)
+        assert repo.reseña_de(1, 2)['rating'] == 3
+        assert repo.rating_de(1)['suma'] == 5 + 3
+    finally:
+        repo.cerrar()
+
+
+def test_varios_procesos_agregan_mientras_se_compacta(tmp_path):
+    ruta = str(tmp_path / 'registros.json')
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write('[]')
+    procesos = [subprocess.Popen([sys.executable, '-c', AGREGAR_REGISTROS, ruta, nombre, '60'], cwd=RAIZ)
+                for nombre in ('a', 'b', 'c')]
+    for proceso in procesos:
+        assert proceso.wait() == 0
+
+    almacen = AlmacenLog(ruta)
+    try:
+        datos = almacen.cargar()
+        assert len(datos) == 180
+        assert len({r['id'] for r in datos}) == 180
+        for nombre in ('a', 'b', 'c'):
+            assert sorted(r['orden'] for r in datos if r['proceso'] == nombre) == list(range(60))
+        # Con minimo_compactacion=10 hubo compactaciones en el medio
+        assert almacen._leer_meta()['generacion'] > 0
+    finally:
+        almacen.cerrar()
@@ -0,0 +1,78 @@
+import pytest
+
+from conftest import LIBROS
+
+from readers_bay import busqueda
+from readers_bay.busqueda import IndiceBusqueda, normalizar, tokenizar
+
+
+@pytest.fixture
+def indice():
+    return IndiceBusqueda(LIBROS)
+
+
+def ids(libros):
+    return [libro['id'] for libro in libros]
+
+
+def test_normalizar_sin_tildes_ni_mayusculas():
+    assert normalizar('MÁRQUEZ Ñandú') == 'marquez nandu'
+    assert tokenizar('Cien Años, de   soledad') == ['cien', 'anos', 'de', 'soledad']
+
+
+@pytest.mark.parametrize('consulta, esperados', [
+    ('garc', [1]),             # prefijo
+    ('marquez', [1]),          # sin tilde
+    ('GALLEGOS doña', [3]),    # todas las palabras, en cualquier campo
+    ('novela', [2, 3]),
+    ('rayuela gallegos', []),
+])
+def test_prefijos_y_todas_las_palabras(indice, consulta, esperados):
+    assert sorted(ids(indice.buscar(consulta))) == esperados
+
+
+def test_relevancia_por_campo_y_palabra_exacta():
+    indice = IndiceBusqueda([
+        {'id': 1, 'titulo': 'Otro', 'autor': 'Ana', 'genero': 'Marina'},
+        {'id': 2, 'titulo': 'Otro', 'autor': 'Marcos Pérez', 'genero': ''},
+        {'id': 3, 'titulo': 'Marea', 'autor': 'Ana', 'genero': ''},
+        {'id': 4, 'titulo': 'Mar', 'autor': 'Ana', 'genero': ''},
+    ])
+    # Título (3) > autor (2) > género (1); la palabra completa suma 1
+    assert ids(indice.buscar('mar')) == [4, 3, 2, 1]
+    assert ids(indice.buscar('marcos')) == [2]
+    assert ids(indice.buscar('mar', limite=2)) == [4, 3]
+    assert ids(indice.buscar('mar', campos=('autor', 'genero'))) == [2, 1]
+
+
+def test_empate_por_orden_de_alta(indice):
+    assert ids(indice.buscar('novela')) == [2, 3]
+
+
+def test_consulta_vacia_devuelve_el_catalogo(indice):
+    assert ids(indice.buscar('  ')) == [1, 2, 3]
+    assert ids(indice.buscar('', limite=1)) == [1]
+
+
+def test_alta_edicion_y_baja(indice):
+    indice.agregar_libro({'id': 4, 'titulo': 'Ficciones', 'autor': 'Jorge Luis Borges'})
+    assert ids(indice.buscar('borg')) == [4]
+    indice.agregar_libro({'id': 4, 'titulo': 'El Aleph', 'autor': 'Jorge Luis Borges'})
+    assert indice.buscar('ficciones') == []
+    indice.quitar_libro(4)
+    assert indice.buscar('borges') == [] and len(indice) == 3
+
+
+def test_palabras_mas_largas_que_el_prefijo_indexado():
+    indice = IndiceBusqueda([{'id': 1, 'titulo': 'Otorrinolaringología'},
+                             {'id': 2, 'titulo': 'Otorrinolaringólogo'}], largo_maximo_prefijo=5)
+    assert ids(indice.buscar('otorrinolaringolog')) == [1, 2]
+    assert ids(indice.buscar('otorrinolaringologia')) == [1]
+
+
+def test_cache_se_vacia_al_cambiar_el_catalogo(indice, monkeypatch):
+    monkeypatch.setattr(busqueda, 'MINIMO_CANDIDATOS_CACHE', 1)
+    assert ids(indice.buscar('novela')) == [2, 3]
+    assert indice._cache
+    indice.agregar_libro({'id': 4, 'titulo': 'Otra', 'genero': 'Novela'})
+    assert ids(indice.buscar('novela')) == [2, 3, 4]
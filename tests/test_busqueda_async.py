@@ -0,0 +1,63 @@
+import asyncio
+import threading
+from collections import Counter
+
+import pytest
+
+from readers_bay import busqueda_async
+from readers_bay.busqueda_async import BusquedaDiferida
+
+
+@pytest.fixture
+def metricas(monkeypatch):
+    contadores, tiempos = Counter(), Counter()
+    monkeypatch.setattr(busqueda_async, 'contar', lambda nombre, cantidad=1: contadores.update({nombre: cantidad}))
+    monkeypatch.setattr(busqueda_async, 'registrar_tiempo', lambda nombre, segundos: tiempos.update([nombre]))
+    return contadores, tiempos
+
+
+def test_solo_busca_la_ultima_tecla(metricas):
+    buscadas, mostradas = [], []
+
+    def buscar(consulta):
+        buscadas.append(consulta)
+        return [consulta.upper()]
+
+    async def escribir():
+        diferida = BusquedaDiferida(buscar, mostradas.append, espera=0.05)
+        for consulta in ('g', 'ga', 'gar'):
+            tarea = diferida.programar(consulta)
+            await asyncio.sleep(0.01)
+        await tarea
+
+    asyncio.run(escribir())
+    assert buscadas == ['gar']
+    assert mostradas == [['GAR']]
+    contadores, tiempos = metricas
+    assert contadores == {'busqueda_ui.consultas': 3, 'busqueda_ui.canceladas': 2, 'busqueda_ui.mostradas': 1}
+    assert tiempos == {'busqueda_ui.filtro': 1, 'busqueda_ui.latencia': 1}
+
+
+def test_descarta_el_resultado_de_una_busqueda_vieja(metricas):
+    mostradas = []
+    empezo, seguir = threading.Event(), threading.Event()
+
+    def buscar(consulta):
+        if consulta == 'vieja':
+            empezo.set()
+            seguir.wait(5)  # sigue filtrando en su hilo aunque se cancele la tarea
+        return [consulta]
+
+    async def escribir():
+        diferida = BusquedaDiferida(buscar, mostradas.append, espera=0)
+        vieja = diferida.programar('vieja')
+        await asyncio.to_thread(empezo.wait, 5)
+        nueva = diferida.programar('nueva')
+        seguir.set()
+        await nueva
+        with pytest.raises(asyncio.CancelledError):
+            await vieja
+
+    asyncio.run(escribir())
+    assert mostradas == [['nueva']]
+    assert metricas[0]['busqueda_ui.mostradas'] == 1
@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+from readers_bay.buzon import Buzones
+from readers_bay.repositorio import ARCHIVO_SQLITE, RepositorioJSON, RepositorioSQLite, migrar_json_a_sqlite
+
+
+def compartido(id_, a_usuario_id=1, **campos):
+    return {'id': id_, 'de_usuario_id': 9, 'a_usuario_id': a_usuario_id, 'libro_id': 1, **campos}
+
+
+def test_pagina_del_mas_nuevo_al_mas_viejo():
+    buzones = Buzones([compartido(i) for i in range(1, 6)])
+    assert [c['id'] for c in buzones.pagina(1, 0, 2)] == [5, 4]
+    assert [c['id'] for c in buzones.pagina(1, 2, 2)] == [1]
+    assert buzones.pagina(1, 3, 2) == []
+    assert buzones.pagina(2) == []
+
+
+def test_destinatario_por_nombre():
+    buzones = Buzones([{'id': 1, 'destinatario': 'Dora'}], {'Dora': 4}.get)
+    assert buzones.total(4) == 1
+
+
+def test_no_leidos_segun_la_marca():
+    buzones = Buzones([compartido(1), compartido(2), compartido(3, a_usuario_id=2)], leidos={1: 1})
+    assert (buzones.no_leidos(1), buzones.no_leidos(2)) == (1, 1)
+    assert buzones.marcar_leidos(1) == 2
+    assert buzones.no_leidos(1) == 0
+    assert buzones.marcar_leidos(1) is None  # nada nuevo: no hay que guardar
+    buzones.agregar(compartido(4))
+    assert buzones.no_leidos(1) == 1
+
+
+def test_marca_de_otro_proceso():
+    buzones = Buzones([compartido(i) for i in range(1, 5)])
+    buzones.fijar_leido(1, 3)
+    assert buzones.no_leidos(1) == 1
+    buzones.fijar_leido(1, 2)  # una marca vieja no retrocede
+    assert buzones.no_leidos(1) == 1
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def abrir(request, ruta_datos):
+    abiertos = []
+    if request.param == 'sqlite':
+        migrar_json_a_sqlite(ruta_datos)
+
+    def abrir():
+        if request.param == 'json':
+            repo = RepositorioJSON(ruta_datos)
+        else:
+            repo = RepositorioSQLite(os.path.join(ruta_datos, ARCHIVO_SQLITE))
+        abiertos.append(repo)
+        return repo
+    yield abrir
+    for repo in abiertos:
+        repo.cerrar()
+
+
+def test_lo_leido_se_conserva_al_reabrir(abrir):
+    repo = abrir()
+    # Nada se da por leído solo por estar guardado
+    assert repo.no_leidos(4) == 3
+    repo.marcar_leidos(4)
+    assert repo.no_leidos(4) == 0
+    repo.guardar_compartido({'de_usuario_id': 1, 'a_usuario_id': 4, 'libro_id': 2})
+    repo.sincronizar()
+    repo.cerrar()
+
+    repo = abrir()
+    assert repo.no_leidos(4) == 1
+    assert repo.no_leidos(1) == 0
+    repo.marcar_leidos(4)
+    repo.sincronizar()
+    repo.cerrar()
+    assert abrir().no_leidos(4) == 0
@@ -0,0 +1,67 @@
+import pytest
+
+from readers_bay import operaciones
+from readers_bay.cache_detalles import CacheDetalles
+from readers_bay.repositorio import RepositorioJSON
+
+
+def test_lru_acotada():
+    cache = CacheDetalles(tamaño=2)
+    armados = []
+
+    def armar(libro_id):
+        return lambda: armados.append(libro_id) or {'id': libro_id}
+
+    for libro_id in (1, 2, 1, 3, 2):
+        cache.obtener(libro_id, armar(libro_id))
+    # El 2 salió al entrar el 3 (el 1 se había usado hace menos)
+    assert armados == [1, 2, 3, 2]
+    assert cache.estadisticas() == {'aciertos': 1, 'fallos': 4, 'tasa_aciertos': 0.2,
+                                    'invalidaciones': 0, 'desalojos': 2, 'entradas': 2,
+                                    'capacidad': 2}
+
+
+def test_no_guarda_libros_inexistentes_ni_con_tamaño_cero():
+    cache = CacheDetalles()
+    assert cache.obtener(1, lambda: None) is None
+    assert cache.obtener(1, lambda: 'armado') == 'armado'
+    sin_cache = CacheDetalles(tamaño=0)
+    sin_cache.obtener(1, lambda: 'a')
+    assert sin_cache.obtener(1, lambda: 'b') == 'b'
+
+
+def test_invalidar_durante_el_armado_no_guarda_lo_viejo():
+    cache = CacheDetalles()
+
+    def armar():
+        cache.invalidar(1)  # llega una reseña mientras se arma
+        return 'viejo'
+
+    assert cache.obtener(1, armar) == 'viejo'
+    assert cache.obtener(1, lambda: 'nuevo') == 'nuevo'
+    cache.vaciar()
+    assert cache.obtener(1, lambda: 'otra vez') == 'otra vez'
+
+
+@pytest.fixture
+def repo(ruta_datos):
+    repo = RepositorioJSON(ruta_datos)
+    yield repo
+    repo.cerrar()
+
+
+def test_el_repositorio_invalida_al_guardar(repo):
+    # detalle_libro agrega los vecinos a una copia: lo cacheado son sus listas
+    def reseñas(libro_id):
+        return operaciones.detalle_libro(repo, libro_id)['reseñas']
+
+    antes, otro = reseñas(2), reseñas(1)
+    assert reseñas(2) is antes
+
+    operaciones.guardar_reseña(repo, 2, 2, 5, 'Genial')
+    assert [r['usuario'] for r in reseñas(2)] == ['Ana', 'Beto']
+    assert reseñas(1) is otro
+
+    # Un nombre de usuario aparece en todos los detalles
+    repo.guardar_usuario(dict(repo.usuario(1), nombre='Anita'))
+    assert reseñas(1)[0]['usuario'] == 'Anita'
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from readers_bay.carga_streaming import CargaCatalogo, EscrituraArregloJSON, iterar_json
+
+REGISTROS = [{'id': 1, 'titulo': 'Cien Años de Soledad', 'notas': [1.5, -2e3, None, True]},
+             {'id': 22, 'titulo': 'con "comillas", comas y ]corchetes['},
+             12345678901234567890, 'texto suelto', [], {}]
+
+
+def escribir(ruta, texto):
+    ruta.write_text(texto, encoding='utf-8')
+    return str(ruta)
+
+
+@pytest.mark.parametrize('tamaño_bloque', [1, 3, 7, 64 * 1024])
+def test_iterar_json_con_bloques_de_cualquier_tamaño(tmp_path, tamaño_bloque):
+    ruta = escribir(tmp_path / 'datos.json', json.dumps(REGISTROS, ensure_ascii=False, indent=4))
+    assert list(iterar_json(ruta, tamaño_bloque)) == REGISTROS
+
+
+@pytest.mark.parametrize('texto, esperados', [
+    ('', []),
+    ('  [ ]  ', []),
+    ('{"no": "es un arreglo"}', []),
+    ('[{"id": 1}, {"id": 2}, {"id":', [{'id': 1}, {'id': 2}]),   # truncado: lo leído
+    ('[1, 2 3]', [1, 2]),
+])
+def test_iterar_json_casos_borde(tmp_path, texto, esperados):
+    assert list(iterar_json(escribir(tmp_path / 'datos.json', texto), 4)) == esperados
+
+
+def test_iterar_json_archivo_inexistente(tmp_path):
+    assert list(iterar_json(str(tmp_path / 'no_existe.json'))) == []
+
+
+@pytest.mark.parametrize('indentar', [None, 4])
+def test_escritura_arreglo(tmp_path, indentar):
+    ruta = str(tmp_path / 'salida.json')
+    with EscrituraArregloJSON(ruta, indentar=indentar) as archivo:
+        for registro in REGISTROS:
+            archivo.escribir(registro)
+    assert archivo.escritos == len(REGISTROS)
+    with open(ruta, encoding='utf-8') as f:
+        assert json.load(f) == REGISTROS
+
+
+def test_escritura_conservando_lo_que_habia(tmp_path):
+    ruta = escribir(tmp_path / 'salida.json', '\n  [ {"id": 1},\n {"id": 2} ]  \n')
+    with EscrituraArregloJSON(ruta, conservar=True, tamaño_bloque=2) as archivo:
+        archivo.escribir({'id': 3})
+    assert list(iterar_json(ruta)) == [{'id': 1}, {'id': 2}, {'id': 3}]
+
+    vacio = escribir(tmp_path / 'vacio.json', '[]')
+    with EscrituraArregloJSON(vacio, conservar=True) as archivo:
+        archivo.escribir({'id': 1})
+    assert list(iterar_json(vacio)) == [{'id': 1}]
+
+
+def test_escritura_con_error_no_toca_el_archivo(tmp_path):
+    ruta = escribir(tmp_path / 'salida.json', '[{"id": 1}]')
+    with pytest.raises(RuntimeError):
+        with EscrituraArregloJSON(ruta) as archivo:
+            archivo.escribir({'id': 2})
+            raise RuntimeError("corte")
+    assert list(iterar_json(ruta)) == [{'id': 1}]
+    assert not (tmp_path / 'salida.json.tmp').exists()
+
+    invalido = escribir(tmp_path / 'invalido.json', '{"id": 1}')
+    with pytest.raises(ValueError):
+        with EscrituraArregloJSON(invalido, conservar=True):
+            pass
+
+
+def test_carga_catalogo_avisa_por_lotes():
+    leidos, avisos = [], []
+    carga = CargaCatalogo(({'id': i} for i in range(10)), leidos.append, primer_lote=2, tamaño_lote=5)
+    carga.suscribir(lambda: avisos.append(carga.leidos))
+    carga.iniciar()
+    assert carga.terminada.wait(5)
+    assert [libro['id'] for libro in leidos] == list(range(10))
+    assert avisos == [2, 7, 10]
@@ -0,0 +1,79 @@
+import hashlib
+
+import pytest
+
+from readers_bay.credenciales import Credenciales, UsuarioDuplicado, es_hash
+from readers_bay.repositorio import RepositorioJSON
+
+
+@pytest.fixture
+def credenciales():
+    return Credenciales(iteraciones=1000)
+
+
+@pytest.fixture
+def repo(ruta_datos):
+    repo = RepositorioJSON(ruta_datos)
+    yield repo
+    repo.cerrar()
+
+
+def test_hash_con_sal_propia(credenciales):
+    primero, segundo = credenciales.hashear('secreta'), credenciales.hashear('secreta')
+    assert es_hash(primero) and primero != segundo
+    assert 'secreta' not in primero
+    assert credenciales.verificar(primero, 'secreta')
+    assert not credenciales.verificar(primero, 'otra')
+    assert not credenciales.verificar('pbkdf2_sha256$roto', 'secreta')
+    assert not credenciales.verificar(None, 'secreta')
+
+
+def test_texto_plano_de_datos_viejos(credenciales):
+    assert credenciales.verificar(123, '123')
+    assert not credenciales.verificar('123', '1234')
+
+
+def test_cache_de_verificaciones(credenciales, monkeypatch):
+    guardado = credenciales.hashear('secreta')
+    assert credenciales.verificar(guardado, 'secreta')
+    llamadas = []
+    original = hashlib.pbkdf2_hmac
+    monkeypatch.setattr(hashlib, 'pbkdf2_hmac', lambda *args: llamadas.append(args) or original(*args))
+    # Lo ya verificado no vuelve a derivar el hash; lo incorrecto sí
+    assert credenciales.verificar(guardado, 'secreta')
+    assert not llamadas
+    credenciales.verificar(guardado, 'otra')
+    assert llamadas
+
+
+def test_cache_acotada():
+    credenciales = Credenciales(iteraciones=1000, tamaño_cache=2)
+    for password in ('a', 'b', 'c'):
+        assert credenciales.verificar(credenciales.hashear(password), password)
+    assert len(credenciales._cache) == 2
+
+
+def test_login_convierte_texto_plano_y_pocas_iteraciones(credenciales, repo):
+    assert credenciales.autenticar(repo, 'ana', '123')['id'] == 1
+    assert es_hash(repo.usuario(1)['password'])
+
+    viejo = Credenciales(iteraciones=500).hashear('456')
+    repo.guardar_usuario(dict(repo.usuario(2), password=viejo))
+    assert credenciales.necesita_rehash(viejo)
+    assert credenciales.autenticar(repo, 'Beto', '456') is not None
+    assert repo.usuario(2)['password'] != viejo
+    assert not credenciales.necesita_rehash(repo.usuario(2)['password'])
+
+
+def test_login_incorrecto(credenciales, repo):
+    assert credenciales.autenticar(repo, 'ana', 'mal') is None
+    assert credenciales.autenticar(repo, 'nadie', '123') is None
+    assert repo.usuario(1)['password'] == '123'
+
+
+def test_registrar(credenciales, repo):
+    usuario = credenciales.registrar(repo, {'nombre': 'Eva', 'password': 'clave'})
+    assert usuario['id'] > 4 and es_hash(usuario['password'])
+    assert credenciales.autenticar(repo, 'eva', 'clave')['id'] == usuario['id']
+    with pytest.raises(UsuarioDuplicado):
+        credenciales.registrar(repo, {'nombre': 'EVA', 'password': 'x'})
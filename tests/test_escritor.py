@@ -0,0 +1,94 @@
+import threading
+
+import pytest
+
+from readers_bay.escritor import EscritorFondo
+
+
+class Destino:
+    """Destino de prueba: anota los lotes; con `trabar`, el primero espera a que se suelte."""
+
+    def __init__(self, trabar=False):
+        self.lotes = []
+        self.empezo = threading.Event()
+        self.soltar = threading.Event()
+        if not trabar:
+            self.soltar.set()
+
+    def escribir_lote(self, datos):
+        self.empezo.set()
+        self.soltar.wait(5)
+        self.lotes.append(list(datos))
+
+
+@pytest.fixture
+def escritor():
+    escritor = EscritorFondo(maximo_pendientes=3)
+    yield escritor
+    escritor.cerrar()
+
+
+def test_combina_el_mismo_registro_y_agrupa_por_destino(escritor):
+    primero, segundo = Destino(trabar=True), Destino()
+    escritor.enviar(primero, 0, 'ocupa el hilo')
+    assert primero.empezo.wait(5)
+    # Mientras el hilo escribe, lo nuevo se acumula
+    escritor.enviar(primero, 1, 'v1')
+    escritor.enviar(segundo, 1, 'otro destino')
+    escritor.enviar(primero, 1, 'v2')
+    escritor.enviar(primero, None, 'sin clave')
+    primero.soltar.set()
+    assert escritor.vaciar(5)
+    assert primero.lotes == [['ocupa el hilo'], ['v2', 'sin clave']]
+    assert segundo.lotes == [['otro destino']]
+    metricas = escritor.metricas()
+    assert (metricas['encoladas'], metricas['combinadas'], metricas['escritas']) == (5, 1, 4)
+    assert metricas['profundidad'] == 0
+
+
+def test_cola_llena_espera_lugar(escritor):
+    destino = Destino(trabar=True)
+    escritor.enviar(destino, 0, 'ocupa el hilo')
+    assert destino.empezo.wait(5)
+    for clave in (1, 2, 3):
+        escritor.enviar(destino, clave, clave)
+    enviado = threading.Event()
+    hilo = threading.Thread(target=lambda: (escritor.enviar(destino, 4, 4), enviado.set()))
+    hilo.start()
+    assert not enviado.wait(0.2)
+    # Reemplazar uno que ya está en la cola no espera
+    escritor.enviar(destino, 2, 'dos')
+    destino.soltar.set()
+    assert enviado.wait(5)
+    hilo.join()
+    assert escritor.vaciar(5)
+    assert destino.lotes[1] == [1, 'dos', 3]
+    assert escritor.metricas()['profundidad_maxima'] == 3
+
+
+def test_errores_no_detienen_el_hilo(escritor, capsys):
+    class Roto:
+        def escribir_lote(self, datos):
+            raise OSError("disco lleno")
+
+    destino = Destino()
+    escritor.enviar(Roto(), 1, 'x')
+    assert escritor.vaciar(5)
+    escritor.enviar(destino, 1, 'y')
+    assert escritor.vaciar(5)
+    assert destino.lotes == [['y']]
+    assert escritor.metricas()['errores'] == 1
+    assert "disco lleno" in capsys.readouterr().out
+
+
+def test_cerrar_escribe_lo_pendiente():
+    escritor = EscritorFondo()
+    destino = Destino(trabar=True)
+    escritor.enviar(destino, 0, 'primero')
+    assert destino.empezo.wait(5)
+    escritor.enviar(destino, 1, 'pendiente')
+    destino.soltar.set()
+    escritor.cerrar()
+    assert destino.lotes == [['primero'], ['pendiente']]
+    with pytest.raises(RuntimeError):
+        escritor.enviar(destino, 2, 'tarde')
@@ -0,0 +1,93 @@
+import datetime
+import json
+import os
+
+import pytest
+
+from readers_bay import operaciones
+from readers_bay.importacion import exportar, importar
+from readers_bay.repositorio import ARCHIVO_SQLITE, RepositorioJSON, RepositorioSQLite, migrar_json_a_sqlite
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def repo(request, ruta_datos):
+    if request.param == 'json':
+        repo = RepositorioJSON(ruta_datos)
+    else:
+        migrar_json_a_sqlite(ruta_datos)
+        repo = RepositorioSQLite(os.path.join(ruta_datos, ARCHIVO_SQLITE))
+    yield repo
+    repo.cerrar()
+
+
+def escribir_jsonl(ruta, registros):
+    with open(ruta, 'w', encoding='utf-8') as f:
+        for registro in registros:
+            f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+    return str(ruta)
+
+
+def test_reseñas_nuevas_y_actualizadas(repo, tmp_path):
+    ruta = escribir_jsonl(tmp_path / 'reseñas.jsonl', [
+        {"libro_id": 3, "usuario_id": 2, "rating": 4, "texto": "Buena"},
+        {"libro_id": 1, "usuario_id": 1, "rating": 3},
+        {"id": 2, "libro_id": 1, "usuario_id": 2, "rating": 1},
+    ])
+    resumen = importar(repo, 'reseñas', ruta, procesos=1)
+    assert (resumen['importados'], resumen['actualizados'], resumen['rechazados']) == (1, 2, 0)
+
+    nueva = repo.reseña_de(3, 2)
+    assert (nueva['rating'], nueva['texto'], nueva['fecha']) == (4, "Buena", datetime.date.today().isoformat())
+    assert nueva['id'] > 3
+    # Lo que la fila no trae queda como estaba
+    assert [(r['id'], r['rating'], r['texto'], r['fecha']) for r in repo.reseñas_de(1)] == [
+        (1, 3, "Me encantó", "2025-01-01"), (2, 1, "Muy bueno", "2025-01-02")]
+    assert repo.rating_de(1)['cantidad'] == 2
+
+
+def test_ids_de_reseña_que_no_existen_o_cambian_de_par(repo, tmp_path):
+    ruta = escribir_jsonl(tmp_path / 'reseñas.jsonl', [
+        {"id": 50, "libro_id": 3, "usuario_id": 2, "rating": 4},
+        {"id": 1, "libro_id": 3, "usuario_id": 1, "rating": 4},
+        {"libro_id": 9, "usuario_id": 1, "rating": 4},
+        {"libro_id": 3, "usuario_id": 1, "rating": 7},
+    ])
+    resumen = importar(repo, 'reseñas', ruta, procesos=1)
+    assert resumen['importados'] + resumen['actualizados'] == 0
+    assert [error['linea'] for error in resumen['errores']] == [1, 2, 3, 4]
+    assert repo.reseñas_de(3) == []
+    assert [r['id'] for r in repo.reseñas_de(1)] == [1, 2]
+    # Los ids siguen saliendo del repositorio
+    reseña, _ = operaciones.guardar_reseña(repo, 3, 2, 4)
+    assert reseña['id'] == 4
+
+
+@pytest.mark.parametrize('extension', ['csv', 'jsonl', 'json'])
+def test_exportar_e_importar_de_vuelta(repo, tmp_path, extension):
+    ruta = str(tmp_path / f'reseñas.{extension}')
+    assert exportar(repo, 'reseñas', ruta) == 3
+    resumen = importar(repo, 'reseñas', ruta, procesos=1)
+    assert (resumen['importados'], resumen['actualizados'], resumen['rechazados']) == (0, 3, 0)
+    assert [(r['id'], r['texto'], r['fecha']) for r in repo.reseñas_de(1)] == [
+        (1, "Me encantó", "2025-01-01"), (2, "Muy bueno", "2025-01-02")]
+
+
+def test_libros_con_id_repetido(repo, tmp_path):
+    ruta = tmp_path / 'libros.csv'
+    ruta.write_text('id,titulo,autor,anio\n'
+                    '1,Otro,Alguien,2000\n'
+                    '10,"Nuevo, con coma",Alguien,2001\n'
+                    '10,Repetido,Alguien,2002\n'
+                    ',Sin id,Alguien,\n', encoding='utf-8')
+    resumen = importar(repo, 'libros', str(ruta), procesos=1)
+    assert (resumen['importados'], resumen['rechazados']) == (2, 2)
+    assert [error['linea'] for error in resumen['errores']] == [2, 4]
+    assert repo.libro(10)['titulo'] == "Nuevo, con coma"
+    assert repo.libro(1)['titulo'] == "Cien Años de Soledad"
+
+
+def test_solo_validar_no_guarda(repo, tmp_path):
+    ruta = escribir_jsonl(tmp_path / 'reseñas.jsonl', [{"libro_id": 3, "usuario_id": 2, "rating": 4}])
+    resumen = importar(repo, 'reseñas', ruta, procesos=1, solo_validar=True)
+    assert resumen['validos'] == 1
+    assert repo.reseñas_de(3) == []
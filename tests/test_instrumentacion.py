@@ -0,0 +1,95 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+from conftest import RAIZ
+
+from readers_bay import instrumentacion
+from readers_bay.instrumentacion import Medicion, Registro, percentil
+
+
+def test_medicion_y_percentiles_por_casilla():
+    medicion = Medicion()
+    for segundos in [0.001] * 98 + [0.1, 0.5]:
+        medicion.registrar(segundos)
+    datos = medicion.como_dict()
+    assert datos['llamadas'] == 100 and datos['max_ms'] == 500
+    # Cota superior de la casilla log2 en µs: 1000 µs cae en la de 1024
+    assert datos['p50_ms'] == 1.024
+    assert datos['p99_ms'] == 131.072
+    assert datos['histograma_us'] == {'<=1024': 98, '<=131072': 1, '<=524288': 1}
+    assert Medicion().como_dict()['medio_ms'] == 0.0
+
+
+def test_percentil_de_una_lista():
+    assert percentil([], 50) == 0.0
+    assert percentil(list(range(1, 101)), 95) == 95
+    assert percentil([7], 99) == 7
+
+
+def test_registro_y_volcado(tmp_path):
+    registro = Registro()
+    with registro.medir('datos.guardar'):
+        pass
+    registro.contar('busqueda_ui.consultas', 3)
+    registro.contar('busqueda_ui.consultas')
+    ruta = str(tmp_path / 'perfil.json')
+    registro.volcar(ruta)
+    with open(ruta, encoding='utf-8') as f:
+        resumen = json.load(f)
+    assert resumen['contadores'] == {'busqueda_ui.consultas': 4}
+    assert resumen['tiempos']['datos.guardar']['llamadas'] == 1
+    assert not os.path.exists(ruta + '.prof')
+
+
+def test_perfil_solo_del_hilo_principal_y_region_externa(tmp_path):
+    registro = Registro(perfilar=True)
+    with registro.medir('externa'):
+        with registro.medir('anidada'):
+            assert registro._perfil_activo
+    assert not registro._perfil_activo
+
+    perfilando = []
+
+    def en_hilo():
+        with registro.medir('en_hilo'):
+            perfilando.append(registro._perfil_activo)
+
+    hilo = threading.Thread(target=en_hilo)
+    hilo.start()
+    hilo.join()
+    # Otros hilos solo se cronometran
+    assert perfilando == [False]
+    assert registro.mediciones['en_hilo'].llamadas == 1
+
+    ruta = str(tmp_path / 'perfil.json')
+    registro.volcar(ruta)
+    assert os.path.exists(ruta + '.prof')
+
+
+def test_apagada_no_envuelve_nada():
+    if instrumentacion.ACTIVA:
+        return  # corrida con READERS_BAY_INSTRUMENTAR: no aplica
+
+    def funcion():
+        pass
+
+    assert instrumentacion.medido('x')(funcion) is funcion
+    assert instrumentacion.medir('x') is instrumentacion.medir('y')
+
+
+def test_variable_de_entorno_vuelca_al_salir(tmp_path):
+    ruta = tmp_path / 'perfil.{pid}.json'
+    codigo = ("from readers_bay.instrumentacion import medido, contar\n"
+              "f = medido('prueba.region')(lambda: None)\n"
+              "f(); f(); contar('prueba.contador')\n")
+    entorno = dict(os.environ, READERS_BAY_INSTRUMENTAR=str(ruta))
+    entorno.pop('READERS_BAY_PERFILAR', None)
+    subprocess.run([sys.executable, '-c', codigo], check=True, cwd=RAIZ, env=entorno)
+    volcados = list(tmp_path.glob('perfil.*.json'))
+    assert len(volcados) == 1
+    resumen = json.loads(volcados[0].read_text(encoding='utf-8'))
+    assert resumen['tiempos']['prueba.region']['llamadas'] == 2
+    assert resumen['contadores'] == {'prueba.contador': 1}
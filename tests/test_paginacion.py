@@ -0,0 +1,60 @@
+import pytest
+
+from readers_bay.paginacion import ListaPaginada
+
+
+class Fabrica:
+    """crear_controles de prueba: cada control es (libro_id, número de creación)."""
+
+    def __init__(self):
+        self.creados = 0
+        self.pedidos = []
+
+    def __call__(self, libros):
+        self.pedidos.append([libro['id'] for libro in libros])
+        controles = []
+        for libro in libros:
+            self.creados += 1
+            controles.append((libro['id'], self.creados))
+        return controles
+
+
+def libros(*ids):
+    return [{'id': i} for i in ids]
+
+
+@pytest.fixture
+def fabrica():
+    return Fabrica()
+
+
+def test_paginas_a_medida_que_se_pide(fabrica):
+    lista = ListaPaginada(fabrica, tamaño_pagina=2)
+    assert [c[0] for c in lista.mostrar(libros(1, 2, 3, 4, 5))] == [1, 2]
+    assert [c[0] for c in lista.cargar_mas()] == [3, 4]
+    assert [c[0] for c in lista.cargar_mas()] == [5]
+    assert not lista.hay_mas()
+    assert lista.cargar_mas() == []
+    assert fabrica.pedidos == [[1, 2], [3, 4], [5]]
+
+
+def test_busqueda_nueva_reutiliza_los_controles_visibles(fabrica):
+    lista = ListaPaginada(fabrica, tamaño_pagina=3)
+    primeros = lista.mostrar(libros(1, 2, 3))
+    segundos = lista.mostrar(libros(3, 9, 1))
+    assert segundos[0] is primeros[2] and segundos[2] is primeros[0]
+    assert fabrica.pedidos[-1] == [9]
+    # Solo se reutiliza lo de la búsqueda anterior, no lo de todas
+    lista.mostrar(libros(9))
+    assert lista.mostrar(libros(2))[0] != primeros[1]
+
+
+def test_rehacer_solo_los_mostrados(fabrica):
+    lista = ListaPaginada(fabrica, tamaño_pagina=2)
+    anteriores = lista.mostrar(libros(1, 2, 3))
+    reemplazos = lista.rehacer([2, 3])  # el 3 todavía no se mostró
+    assert [(viejo, nuevo[0]) for viejo, nuevo in reemplazos] == [(anteriores[1], 2)]
+    assert lista.rehacer([7]) == []
+    assert [viejo for viejo, _ in lista.rehacer()] == [anteriores[0], reemplazos[0][1]]
+    # La página siguiente sigue donde estaba
+    assert [c[0] for c in lista.cargar_mas()] == [3]
@@ -0,0 +1,81 @@
+import pytest
+
+from readers_bay.recomendaciones import MotorRecomendaciones
+
+# Ana (1) y Beto (2) disfrutaron los libros 1 y 2; Dora (4), el 1 y el 3
+RESEÑAS = [
+    {'id': 1, 'libro_id': 1, 'usuario_id': 1, 'rating': 5},
+    {'id': 2, 'libro_id': 2, 'usuario_id': 1, 'rating': 4},
+    {'id': 3, 'libro_id': 1, 'usuario_id': 2, 'rating': '4'},
+    {'id': 4, 'libro_id': 3, 'usuario_id': 4, 'rating': 5},
+    {'id': 5, 'libro_id': 3, 'usuario_id': 2, 'rating': 2},   # no le gustó: no es señal
+]
+COMPARTIDOS = [
+    {'id': 1, 'de_usuario_id': 2, 'a_usuario_id': 3, 'libro_id': 2},
+    {'id': 2, 'de_usuario_id': 4, 'a_usuario_id': 1, 'libro_id': 1},
+]
+
+
+@pytest.fixture
+def motor():
+    motor = MotorRecomendaciones(RESEÑAS, COMPARTIDOS)
+    motor.calcular()
+    return motor
+
+
+def test_coseno_entre_lectores(motor):
+    # Lectores: libro 1 {1, 2, 4}, libro 2 {1, 2}, libro 3 {4}
+    assert motor.vecinos_de(1) == [(2, 0.8165), (3, 0.5774)]
+    assert motor.vecinos_de(2) == [(1, 0.8165)]
+    assert motor.vecinos_de(3) == [(1, 0.5774)]
+    assert motor.vecinos_de(9) == []
+
+
+def test_k_vecinos_y_desempate_por_id():
+    reseñas = [{'id': i, 'libro_id': i, 'usuario_id': 1, 'rating': 5} for i in range(1, 6)]
+    motor = MotorRecomendaciones(reseñas, k=2)
+    motor.calcular()
+    assert motor.vecinos_de(3) == [(1, 1.0), (2, 1.0)]
+
+
+def test_sin_calcular_no_hay_vecinos():
+    motor = MotorRecomendaciones(RESEÑAS)
+    assert not motor.listo
+    assert motor.vecinos_de(1) == []
+    motor.registrar_reseña({'id': 9, 'libro_id': 3, 'usuario_id': 1, 'rating': 5})
+    motor.calcular()
+    assert motor.vecinos_de(3)
+
+
+def test_incremental_como_el_calculo_completo(motor):
+    nueva = {'id': 6, 'libro_id': 3, 'usuario_id': 1, 'rating': 5}
+    motor.registrar_reseña(nueva)
+    completo = MotorRecomendaciones(RESEÑAS + [nueva], COMPARTIDOS)
+    completo.calcular()
+    assert motor.vecinos_de(3) == completo.vecinos_de(3)
+    # En los otros libros del lector se corrige el par con el libro tocado
+    assert dict(motor.vecinos_de(1))[3] == dict(completo.vecinos_de(1))[3]
+
+    # Editar la reseña a un rating bajo deshace la señal
+    motor.registrar_reseña(dict(nueva, rating=1))
+    assert motor.vecinos_de(3) == [(1, 0.5774)]
+
+
+def test_reseña_y_compartido_del_mismo_libro_son_una_señal(motor):
+    antes = motor.firma()
+    motor.registrar_compartido({'id': 3, 'de_usuario_id': 1, 'a_usuario_id': 2, 'libro_id': 1})
+    assert motor.firma() == antes
+
+
+def test_archivo_con_firma(motor, tmp_path):
+    ruta = str(tmp_path / 'recomendaciones.json')
+    motor.guardar(ruta)
+    otro = MotorRecomendaciones(RESEÑAS, COMPARTIDOS)
+    assert otro.cargar(ruta)
+    assert otro.vecinos == motor.vecinos
+
+    # Con una señal más, el archivo quedó viejo
+    distinto = MotorRecomendaciones(RESEÑAS + [{'id': 7, 'libro_id': 2, 'usuario_id': 4, 'rating': 5}])
+    assert not distinto.cargar(ruta)
+    assert not distinto.listo
+    assert not MotorRecomendaciones().cargar(str(tmp_path / 'no_existe.json'))
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from readers_bay.registros import Compartido, Libro, Reseña, a_json
+
+
+def test_se_usa_como_un_dict():
+    datos = {'id': 1, 'libro_id': 2, 'usuario_id': 3, 'rating': 5, 'texto': 'Me encantó',
+             'fecha': '2025-01-01'}
+    reseña = Reseña.desde_dict(datos)
+    assert reseña == datos and dict(reseña) == datos
+    assert reseña['rating'] == 5 and reseña.get('nota', 'no') == 'no'
+    assert 'texto' in reseña and 'nota' not in reseña
+    assert len(reseña) == 6 and list(reseña) == list(datos)
+
+    reseña['rating'] = 4
+    reseña.update(texto='Bueno')
+    del reseña['fecha']
+    assert reseña.como_dict() == {'id': 1, 'libro_id': 2, 'usuario_id': 3, 'rating': 4, 'texto': 'Bueno'}
+    assert 'fecha' not in reseña and reseña.get('fecha') is None
+    with pytest.raises(KeyError):
+        reseña['fecha']
+    with pytest.raises(KeyError):
+        del reseña['fecha']
+
+
+def test_campos_desconocidos_van_aparte():
+    # Compartidos viejos: traen otro formato
+    comp = Compartido({'remitente': 'Beto', 'mensaje': 'léelo', 'leido': True})
+    assert comp['leido'] is True
+    assert comp.como_dict() == {'remitente': 'Beto', 'mensaje': 'léelo', 'leido': True}
+    del comp['leido']
+    assert 'leido' not in comp
+    with pytest.raises(KeyError):
+        comp['otro']
+
+
+def test_desde_dict_no_copia_un_registro():
+    libro = Libro({'id': 1, 'titulo': 'Rayuela'})
+    assert Libro.desde_dict(libro) is libro
+    # Mutable, como un dict: no se puede usar de clave
+    with pytest.raises(TypeError):
+        hash(libro)
+
+
+def test_internado_de_campos_repetidos():
+    genero = ''.join(['Nove', 'la'])
+    primero, segundo = Libro({'genero': genero}), Libro({'genero': 'Novela'})
+    assert primero['genero'] is segundo['genero']
+
+
+def test_serializa_a_json():
+    libro = Libro({'id': 1, 'titulo': 'Cien Años', 'edicion': 2})
+    assert json.loads(json.dumps([libro], default=a_json, ensure_ascii=False)) == [
+        {'id': 1, 'titulo': 'Cien Años', 'edicion': 2}]
+    with pytest.raises(TypeError):
+        json.dumps(object(), default=a_json)
@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+from readers_bay import operaciones
+from readers_bay.credenciales import UsuarioDuplicado
+from readers_bay.repositorio import ARCHIVO_SQLITE, RepositorioJSON, RepositorioSQLite, migrar_json_a_sqlite
+
+# Los mismos datos abiertos con cada backend tienen que responder igual
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def repo(request, ruta_datos):
+    if request.param == 'json':
+        repo = RepositorioJSON(ruta_datos)
+    else:
+        migrar_json_a_sqlite(ruta_datos)
+        repo = RepositorioSQLite(os.path.join(ruta_datos, ARCHIVO_SQLITE))
+    yield repo
+    repo.cerrar()
+
+
+@pytest.mark.parametrize('nombre', ['Ñañez', 'ñañez', 'ÑAÑEZ', '  ñañez '])
+def test_usuario_por_nombre_sin_distinguir_mayusculas(repo, nombre):
+    assert repo.usuario_por_nombre(nombre)['id'] == 3
+
+
+def test_usuario_por_nombre_inexistente(repo):
+    assert repo.usuario_por_nombre('Nanez') is None
+
+
+@pytest.mark.parametrize('nombre', ['ÑAÑEZ', 'ana'])
+def test_nombre_repetido(repo, nombre):
+    with pytest.raises(UsuarioDuplicado):
+        repo.guardar_usuario({'nombre': nombre, 'password': 'x'})
+
+
+def test_renombrar_libera_el_nombre(repo):
+    usuario = dict(repo.usuario(3), nombre='Eva')
+    repo.guardar_usuario(usuario)
+    assert repo.usuario_por_nombre('eva')['id'] == 3
+    assert repo.usuario_por_nombre('ñañez') is None
+    assert repo.guardar_usuario({'nombre': 'Ñañez', 'password': 'x'})['id'] > 4
+
+
+def test_una_reseña_por_usuario_y_libro(repo):
+    _, creada = operaciones.guardar_reseña(repo, 3, 2, 4, 'bueno')
+    assert creada
+    reseña, creada = operaciones.guardar_reseña(repo, 3, 2, '2', 'mejor no')
+    assert not creada
+    assert [(r['usuario_id'], r['rating'], r['texto']) for r in repo.reseñas_de(3)] == [(2, 2, 'mejor no')]
+    assert repo.reseña_de(3, 2)['id'] == reseña['id']
+
+
+@pytest.mark.parametrize('rating', [0, 6, 'cinco', None])
+def test_rating_invalido(repo, rating):
+    with pytest.raises(ValueError):
+        operaciones.guardar_reseña(repo, 3, 2, rating)
+    assert repo.reseñas_de(3) == []
+
+
+def test_agregados(repo):
+    assert repo.rating_de(1) == {'cantidad': 2, 'suma': 9, 'promedio': 4.5,
+                                 'histograma': {1: 0, 2: 0, 3: 0, 4: 1, 5: 1}}
+    operaciones.guardar_reseña(repo, 1, 2, 1)   # edita la de Beto: 4 -> 1
+    operaciones.guardar_reseña(repo, 1, 4, 3)
+    assert repo.rating_de(1) == {'cantidad': 3, 'suma': 9, 'promedio': 3.0,
+                                 'histograma': {1: 1, 2: 0, 3: 1, 4: 0, 5: 1}}
+    assert repo.promedios([1, 2, 3]) == {1: 3.0, 2: 2.0, 3: 0}
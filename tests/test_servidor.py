@@ -0,0 +1,117 @@
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from readers_bay.busqueda import IndiceBusqueda
+from readers_bay.repositorio import RepositorioJSON
+from servidor import MAXIMO_LIMITE, ServidorClub
+
+
+@pytest.fixture
+def servidor(ruta_datos):
+    repo = RepositorioJSON(ruta_datos)
+    yield ServidorClub(repo, IndiceBusqueda(repo.libros()))
+    repo.cerrar()
+
+
+def test_busqueda(servidor):
+    estado, datos = servidor.despachar('GET', '/libros?q=rayuela&campos=titulo,autor&limite=5', None)
+    assert estado == 200
+    assert [l['id'] for l in datos['libros']] == [2]
+
+
+@pytest.mark.parametrize('consulta', ['campos=foo', 'campos=titulo,foo', 'limite=0', 'limite=-1',
+                                      f'limite={MAXIMO_LIMITE + 1}'])
+def test_busqueda_invalida(servidor, consulta):
+    estado, datos = servidor.despachar('GET', f'/libros?{consulta}', None)
+    assert estado == 400
+    assert 'error' in datos
+
+
+def test_limite_no_numerico(servidor):
+    assert servidor.despachar('GET', '/libros?limite=diez', None)[0] == 422
+
+
+@pytest.mark.parametrize('cuerpo', [
+    {'libro_id': 3, 'usuario_id': 2, 'rating': True},
+    {'libro_id': 3, 'usuario_id': 2, 'rating': 4.9},
+    {'libro_id': 3, 'usuario_id': 2, 'rating': [5]},
+    {'libro_id': 3, 'usuario_id': 2, 'rating': 9},
+    {'libro_id': 3, 'usuario_id': 2, 'rating': 4, 'texto': 5},
+    {'libro_id': 'tres', 'usuario_id': 2, 'rating': 4},
+    {'libro_id': 99, 'usuario_id': 2, 'rating': 4},
+])
+def test_reseña_invalida(servidor, cuerpo):
+    estado, _ = servidor.despachar('PUT', '/resenas', cuerpo)
+    assert estado == 422
+    assert servidor.repo.reseña_de(3, 2) is None
+
+
+def test_reseña_se_crea_y_se_edita(servidor):
+    assert servidor.despachar('PUT', '/resenas', {'libro_id': 3, 'usuario_id': 2, 'rating': 4})[0] == 201
+    estado, datos = servidor.despachar('PUT', '/resenas', {'libro_id': 3, 'usuario_id': 2, 'rating': 5.0,
+                                                          'texto': 'mejor'})
+    assert estado == 200
+    assert datos['reseña']['rating'] == 5
+
+
+def test_cuerpo_que_no_es_objeto(servidor):
+    assert servidor.despachar('PUT', '/resenas', [1, 2])[0] == 400
+
+
+def test_lote_aisla_los_errores(servidor):
+    estado, datos = servidor.despachar('POST', '/lote', {'operaciones': [
+        {'metodo': 'GET', 'ruta': '/libros?campos=foo'},
+        {'metodo': 'GET', 'ruta': '/libros/1'},
+        {'metodo': 'POST', 'ruta': '/lote', 'cuerpo': {}},
+    ]})
+    assert estado == 200
+    assert [r['estado'] for r in datos['resultados']] == [400, 200, 400]
+
+
+@pytest.mark.parametrize('nota', [5, ['hola'], {'texto': 'hola'}])
+def test_nota_invalida(servidor, nota):
+    estado, _ = servidor.despachar('POST', '/compartidos',
+                                   {'libro_id': 2, 'de_usuario_id': 1, 'a_usuario_id': 4, 'nota': nota})
+    assert estado == 422
+    assert len(servidor.repo.buzon(4)) == 3
+
+
+def test_escrituras_fuera_del_loop(servidor):
+    hilos = {}
+    despachar = servidor.despachar
+
+    def registrar(metodo, ruta, cuerpo):
+        hilos[metodo] = threading.current_thread()
+        return despachar(metodo, ruta, cuerpo)
+
+    servidor.despachar = registrar
+    servidor.ejecutor = ThreadPoolExecutor(1)
+    servidor.lecturas_en_loop = True
+
+    async def pedir(puerto, metodo, ruta, cuerpo=None):
+        lector, escritor = await asyncio.open_connection('127.0.0.1', puerto)
+        datos = json.dumps(cuerpo).encode('utf-8') if cuerpo is not None else b''
+        escritor.write(f"{metodo} {ruta} HTTP/1.1\r\nConnection: close\r\n"
+                       f"Content-Length: {len(datos)}\r\n\r\n".encode('latin-1') + datos)
+        respuesta = await lector.read()
+        escritor.close()
+        return int(respuesta.split(b' ', 2)[1])
+
+    async def probar():
+        servidor_tcp = await asyncio.start_server(servidor.atender, '127.0.0.1', 0)
+        puerto = servidor_tcp.sockets[0].getsockname()[1]
+        async with servidor_tcp:
+            assert await pedir(puerto, 'GET', '/libros/1') == 200
+            assert await pedir(puerto, 'PUT', '/resenas', {'libro_id': 3, 'usuario_id': 2, 'rating': 4}) == 201
+        return threading.current_thread()
+
+    try:
+        hilo_loop = asyncio.run(probar())
+    finally:
+        servidor.ejecutor.shutdown()
+    assert hilos['GET'] is hilo_loop
+    assert hilos['PUT'] is not hilo_loop